@@ -0,0 +1,279 @@
+"""再実行（rerun）のレイテンシ計測
+
+streamlit.testing.v1.AppTest で pachilog_app.py と pachi_app/pachilog.py をヘッドレスで動かし、
+主な操作ごとに1回の rerun にかかった時間とピークメモリを計測して JSON に保存する。
+
+    python benchmarks/bench_reruns.py                       # pachilog/ ディレクトリから実行
+    python benchmarks/bench_reruns.py --sizes 10 100 --repeat 3
+    python benchmarks/bench_reruns.py --baseline benchmarks/results/前回.json
+
+計測する操作:
+    start_session     : 店名を入力して「実践開始 ▶」
+    invest            : 「1000円」ボタン
+    rows_N            : N行の記録があるセッションの復元・投資ボタン・1行追加
+    history_N         : N件のアーカイブがある状態で「実践一覧」を開く
+    border            : タブ1の「ボーダーラインを計算」
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, APP_DIR)
+
+import streamlit as st  # noqa: E402
+from streamlit.testing.v1 import AppTest  # noqa: E402
+
+from pachilog_core import aggregates, archive, play  # noqa: E402
+from pachilog_core.rounds import RoundDistribution  # noqa: E402
+from pachilog_core.store import SessionStore  # noqa: E402
+
+RECORD_APP = os.path.join(APP_DIR, "pachi_app", "pachilog.py")
+TAB_APP = os.path.join(APP_DIR, "pachilog_app.py")
+RESULTS_DIR = os.path.join(APP_DIR, "benchmarks", "results")
+TIMEOUT = 600
+# 前回の結果と比べてこの割合以上遅くなったら回帰として表示する
+REGRESSION_RATIO = 1.2
+# 実践記録アプリを開くときのプレイヤー名（?player=）。準備したセッションもこのプレイヤーに書き込む
+PLAYER = "bench"
+
+@contextmanager
+def workdir():
+    """データファイルを一時ディレクトリに作り、キャッシュ済みのストアを破棄する"""
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        st.cache_resource.clear()
+        st.cache_data.clear()
+        try:
+            yield tmp
+        finally:
+            os.chdir(cwd)
+
+
+def record_app():
+    """実践記録アプリ（?player= を付けて開く。付けないと実行ごとに別のプレイヤーになる）"""
+    at = AppTest.from_file(RECORD_APP, default_timeout=TIMEOUT)
+    at.query_params["player"] = PLAYER
+    return at
+
+
+def button(at, label):
+    return next(b for b in at.button if b.label == label)
+
+
+class Timer:
+    """rerun ごとの時間を記録する
+
+    run() は再実行後の AppTest を返す。st.rerun() でページが変わると前の要素ツリーは使えないため、
+    次に操作するウィジェットは必ず返された AppTest から探し直す。
+    """
+
+    def __init__(self):
+        self.samples = []
+
+    def run(self, widget_or_app):
+        start = time.perf_counter()
+        at = widget_or_app.run(timeout=TIMEOUT)
+        self.samples.append(time.perf_counter() - start)
+        if at.exception:
+            raise RuntimeError(f"app raised: {[e.message for e in at.exception]}")
+        return at
+
+
+# --- データの準備 ---
+
+def seed_session(n_rows):
+    """N行の記録を持つ実行中セッションを SQLite に書き込む"""
+    info = {"店名": "ベンチ店", "台番号": 1, "交換率": "4円", "持ち玉": 0, "現金投資額": 0,
+            "貸し玉可能残金": 0, "実践開始時間": "10:00", "is_active": True}
+    records = [
+        play.build_record("10:00", 250, i * 18, i * 18 + 18, 0, 0, 0, "4円")
+        for i in range(n_rows)
+    ]
+    aggregates.rebuild(info, records)
+    SessionStore("pachilog.db", PLAYER).save({"records": records, "machine_info": info, "is_active": True})
+
+
+def seed_archive(n_sessions):
+    start = datetime(2024, 1, 1)
+    archive.append_sessions(
+        {"日付": (start + timedelta(days=i % 700)).strftime("%Y-%m-%d"), "店名": f"店{i % 5}",
+         "台番号": i % 500, "実践時間": "3時間0分", "総回転数": 1000, "現金投資総額": 10000,
+         "レート": "4円", "総使用持ち玉": 0, "期待値": 0.0, "仕事量": 0.0}
+        for i in range(n_sessions)
+    )
+
+
+# --- 計測する操作 ---
+
+def flow_start_session(repeat):
+    timer = Timer()
+    for _ in range(repeat):
+        with workdir():
+            at = record_app().run()
+            at.text_input[0].input("ベンチ店")
+            timer.run(button(at, "実践開始 ▶").click())
+    return timer.samples
+
+
+def flow_invest(repeat):
+    timer = Timer()
+    with workdir():
+        seed_session(0)
+        at = record_app().run()
+        for _ in range(repeat):
+            at = timer.run(button(at, "1000円").click())
+    return timer.samples
+
+
+def flow_rows(n_rows, repeat):
+    restore, invest, add_row = Timer(), Timer(), Timer()
+    with workdir():
+        seed_session(n_rows)
+        for _ in range(repeat):
+            st.cache_resource.clear()
+            at = restore.run(record_app())
+        for _ in range(repeat):
+            at = invest.run(button(at, "1000円").click())
+        for _ in range(repeat):
+            at = add_row.run(button(at, "➕ 行を追加").click())
+            at.number_input(key="add_row_end_rot").set_value(18)
+            at = add_row.run(button(at, "✅ 確定").click())
+    return {"restore": restore.samples, "invest": invest.samples, "add_row": add_row.samples}
+
+
+def flow_history(n_sessions, repeat):
+    timer = Timer()
+    with workdir():
+        seed_archive(n_sessions)
+        for _ in range(repeat):
+            at = AppTest.from_file(TAB_APP, default_timeout=TIMEOUT)
+            at = timer.run(at)
+            # 期間をアーカイブ全体に広げて再実行
+            at.date_input(key="history_period").set_value((datetime(2024, 1, 1).date(), datetime(2026, 12, 31).date()))
+            at = timer.run(at)
+    return timer.samples
+
+
+def flow_border(repeat):
+    timer = Timer()
+    with workdir():
+        at = AppTest.from_file(TAB_APP, default_timeout=TIMEOUT)
+        at.session_state["normal_dist"] = RoundDistribution.from_entries(
+            [{"ラウンド": 10, "割合": 50.0, "ステータス": "確変"}, {"ラウンド": 3, "割合": 50.0, "ステータス": "時短"}])
+        at.session_state["rush_dist"] = RoundDistribution.from_entries(
+            [{"ラウンド": 10, "割合": 100.0, "ステータス": "確変"}])
+        at.session_state["mode_selection_state"] = "ST"
+        at.run(timeout=TIMEOUT)
+        for _ in range(repeat):
+            at = timer.run(button(at, "ボーダーラインを計算").click())
+    return timer.samples
+
+
+# --- 集計と保存 ---
+
+def summarize(samples):
+    samples_ms = [s * 1000 for s in samples]
+    return {
+        "reruns": len(samples_ms),
+        "mean_ms": statistics.fmean(samples_ms),
+        "p50_ms": statistics.median(samples_ms),
+        "max_ms": max(samples_ms),
+    }
+
+
+def measure(name, func, *args, memory=True):
+    """操作を実行して時間を集計し、別途1回だけ tracemalloc でピークメモリを測る"""
+    print(f"  {name} ...", end="", flush=True)
+    result = func(*args)
+    groups = result if isinstance(result, dict) else {"": result}
+    entries = {}
+    for key, samples in groups.items():
+        entries[f"{name}.{key}" if key else name] = summarize(samples)
+    if memory:
+        tracemalloc.start()
+        func(*args[:-1], 1)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        for entry in entries.values():
+            entry["peak_mib"] = peak / 2**20
+    print(" " + ", ".join(f"{k}: {v['p50_ms']:.1f}ms" for k, v in entries.items()))
+    return entries
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=APP_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline_path):
+    """前回の結果と p50 を比べ、遅くなったものを表示する"""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)["results"]
+    regressions = []
+    for name, entry in results.items():
+        before = baseline.get(name)
+        if before and entry["p50_ms"] > before["p50_ms"] * REGRESSION_RATIO:
+            regressions.append(name)
+            print(f"  ⚠️ {name}: {before['p50_ms']:.1f}ms → {entry['p50_ms']:.1f}ms")
+    if not regressions:
+        print("  回帰はありません")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000, 10000],
+                        help="記録行数 / アーカイブ件数")
+    parser.add_argument("--repeat", type=int, default=5, help="操作ごとの rerun 回数")
+    parser.add_argument("--no-memory", action="store_true", help="ピークメモリを計測しない")
+    parser.add_argument("--out", help="結果の JSON の保存先（既定: benchmarks/results/<日時>.json）")
+    parser.add_argument("--baseline", help="比較する前回の結果の JSON")
+    args = parser.parse_args(argv)
+    memory = not args.no_memory
+
+    print("rerun ベンチマーク")
+    results = {}
+    results.update(measure("start_session", flow_start_session, args.repeat, memory=memory))
+    results.update(measure("invest", flow_invest, args.repeat, memory=memory))
+    for n in args.sizes:
+        results.update(measure(f"rows_{n}", flow_rows, n, args.repeat, memory=memory))
+    for n in args.sizes:
+        results.update(measure(f"history_{n}", flow_history, n, args.repeat, memory=memory))
+    results.update(measure("border", flow_border, args.repeat, memory=memory))
+
+    report = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "streamlit": st.__version__,
+        "platform": platform.platform(),
+        "repeat": args.repeat,
+        "results": results,
+    }
+    out = args.out or os.path.join(RESULTS_DIR, datetime.now().strftime("%Y%m%d-%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"結果を保存しました: {out}")
+
+    if args.baseline:
+        return 1 if compare(results, args.baseline) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,38 +1,138 @@
 import streamlit as st
 import pandas as pd
 from datetime import datetime
-import json
 import os
+import sys
+import uuid
+
+# pachilog_core パッケージ（一つ上のディレクトリ）を読み込めるようにする
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from pachilog_core import aggregates, events, fileio, importer, play, rotation
+from pachilog_core.paging import list_page
+from pachilog_core.journal import Journal
+from pachilog_core.persister import WriteBehind, WriterPool
+from pachilog_core.store import SessionStore
+import pachilog_ui as ui
 
 # 永続化ファイルの定義
-DATA_FILE = "pachilog_data.json"
+# 既定は全セッションの履歴を残す SQLite。PACHILOG_STORE=journal で従来の JSON（スナップショット + ジャーナル）を使う
+# 保存先のディレクトリは PACHILOG_DATA_DIR で変更できる（既定はカレントディレクトリ）
+DATA_DIR = os.environ.get("PACHILOG_DATA_DIR", ".")
+DB_FILE = os.path.join(DATA_DIR, "pachilog.db")
+DATA_FILE = os.path.join(DATA_DIR, "pachilog_data.json")
+# 再試行しても保存できなかった変更の退避先（JSON Lines）
+DEAD_LETTER_FILE = os.path.join(DATA_DIR, "pachilog_deadletter.jsonl")
+STORE_KIND = os.environ.get("PACHILOG_STORE", "sqlite")
+
+# プレイヤー（URL の ?player=名前 → 環境変数 PACHILOG_PLAYER → ブラウザのセッションごとの ID の順）
+# 同じサーバーを複数人で使うときは、プレイヤーごとに実践中のセッションと保存ファイルを分ける
+PLAYER_ID_LENGTH = 12
+# 1つのプロセスで同時に書き込みスレッドを持つプレイヤーの数
+MAX_PLAYERS = 32
+# 旧形式の保存ファイルを移した後に付ける拡張子
+MIGRATED_SUFFIX = ".migrated"
+
+def current_player():
+    """このブラウザのプレイヤー名（指定が無ければ ID を作り、再読み込みしても同じになるよう URL に残す）"""
+    player = fileio.safe_name(st.query_params.get("player", "") or os.environ.get("PACHILOG_PLAYER", ""))
+    if not player:
+        player = uuid.uuid4().hex[:PLAYER_ID_LENGTH]
+        st.query_params["player"] = player
+    return player
+
+PLAYER = current_player()
+
+def migrate_legacy(store):
+    """プレイヤーの区別が無い旧形式の DATA_FILE に実践中のデータが残っていれば、store に移す
+
+    旧ファイルは先に名前を変えてから読むため、同時に開いた別のプレイヤーに二重に移ることはない。
+    """
+    if store.load() is not None or not os.path.exists(DATA_FILE):
+        return
+    legacy = Journal(DATA_FILE)
+    claimed = f"{DATA_FILE}.{uuid.uuid4().hex[:PLAYER_ID_LENGTH]}{MIGRATED_SUFFIX}"
+    try:
+        os.rename(DATA_FILE, claimed)
+    except FileNotFoundError:
+        return
+    claimed_journal = claimed + ".journal"
+    if os.path.exists(legacy.journal_path):
+        os.rename(legacy.journal_path, claimed_journal)
+    state = Journal(claimed, journal_path=claimed_journal).load()
+    if state and state.get("is_active", False):
+        store.save(state)
+
+def open_store(kind, player):
+    """プレイヤーの保存先を開く（ボタン操作ごとの書き込みは WriteBehind がバックグラウンドでまとめて行う）"""
+    if kind == "journal":
+        store = Journal(fileio.keyed_path(DATA_FILE, player))
+    else:
+        store = SessionStore(DB_FILE, player)
+    migrate_legacy(store)
+    return WriteBehind(store, dead_letter_path=fileio.keyed_path(DEAD_LETTER_FILE, player))
+
+@st.cache_resource
+def get_writers(kind):
+    """プレイヤーごとのストア（プロセス内で1つの WriterPool にまとめ、数を MAX_PLAYERS までに抑える）"""
+    return WriterPool(lambda player: open_store(kind, player), MAX_PLAYERS)
+
+STORE = get_writers(STORE_KIND).get(PLAYER)
 
 def load_data():
-    """保存されたJSONファイルを読み込み、存在しない場合はNoneを返す"""
-    if os.path.exists(DATA_FILE):
-        try:
-            with open(DATA_FILE, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                return data
-        except Exception as e:
-            # ファイルが存在するが読み込みに失敗した場合
-            st.warning(f"データ読み込み中にエラーが発生しました。初期設定で再開します。エラー: {e}")
-            return None
-    return None
+    """実行中のセッションを復元し、存在しない場合はNoneを返す"""
+    try:
+        with PROFILER.stage("load_data"):
+            return STORE.load()
+    except Exception as e:
+        # ファイルが存在するが読み込みに失敗した場合
+        st.warning(f"データ読み込み中にエラーが発生しました。初期設定で再開します。エラー: {e}")
+        return None
 
 def save_data(data):
-    """現在の全データをJSONファイルに保存する"""
+    """未書き込みの変更を書き切ってから、現在の全データを保存する（実践開始・終了時のみ）"""
+    try:
+        with PROFILER.stage("save_data"):
+            STORE.save(data)
+        return True
+    except Exception as e:
+        st.error(f"データの保存中にエラーが発生しました: {e}")
+        return False
+
+def record_event(*changes):
+    """変更分のイベントを書き込み待ちのキューに入れる（ボタン操作ごとの保存。ディスクは待たない）"""
     try:
-        # datetimeオブジェクトは直列化できないため、文字列に変換してから保存
-        with open(DATA_FILE, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=4)
+        with PROFILER.stage("save_data"):
+            STORE.append(*changes)
         return True
     except Exception as e:
         st.error(f"データの保存中にエラーが発生しました: {e}")
         return False
 
+def dispatch(*session_events):
+    """型付きイベント（投資・貸し玉・行確定など）を画面の状態に適用し、同じイベントを保存する
+
+    保存側も同じ events.apply() でイベントを適用するため、再接続時には下書きの途中まで復元される。
+    """
+    state = {
+        "records": st.session_state.records,
+        "machine_info": st.session_state.machine_info,
+        "is_active": True,
+        "draft": st.session_state.get("draft"),
+    }
+    for event in session_events:
+        events.apply(state, event)
+    st.session_state.draft = state["draft"]
+    return record_event(*session_events)
+
+def clear_draft_inputs():
+    """行入力画面の入力欄の状態を消す（次に開いたときに下書きの値で作り直す）"""
+    for key in ("add_row_new_balls", "add_row_start_rot", "add_row_end_rot"):
+        st.session_state.pop(key, None)
+
 st.set_page_config(page_title="PachiLog", layout="centered")
 st.title("🎰 PachiLog")
+# 計測モード（PACHILOG_PROFILE=1 または ?profile=1）のときだけ各段階の時間を記録する
+PROFILER = ui.profiler("pachilog")
 
 # ====== セッション初期化とデータ復元 ======
 if "page" not in st.session_state:
@@ -43,27 +143,26 @@ if "page" not in st.session_state:
         # 実行中のデータがあればセッション状態を復元し、メイン画面から再開
         st.session_state.records = loaded_data.get("records", [])
         st.session_state.machine_info = loaded_data.get("machine_info", {})
-        st.session_state.page = "main" 
-        st.info("💾 前回の実践データが復元されました。メイン画面から再開します。")
+        # 集計値を持たない古いデータは、復元時に一度だけ記録行から作り直す
+        if not aggregates.has_totals(st.session_state.machine_info):
+            aggregates.rebuild(st.session_state.machine_info, st.session_state.records)
+        if rotation.STATS_KEY not in st.session_state.machine_info:
+            rotation.rebuild(st.session_state.machine_info, st.session_state.records)
+        # 入力途中の行（貸し玉・大当たりを含む）があれば、行入力画面から再開する
+        st.session_state.draft = loaded_data.get("draft")
+        if st.session_state.draft is not None:
+            st.session_state.edit_index = st.session_state.draft["index"]
+            st.session_state.page = "add_row"
+            st.info("💾 前回の実践データが復元されました。入力途中の行から再開します。")
+        else:
+            st.session_state.page = "main"
+            st.info("💾 前回の実践データが復元されました。メイン画面から再開します。")
     else:
         # データがない、または前回終了済みの場合、初期値を設定
         st.session_state.records = []
         st.session_state.machine_info = {}
+        st.session_state.draft = None
         st.session_state.page = "select"
-        
-    # 他のセッション状態の初期化
-    if "last_hit_payout" not in st.session_state:
-        st.session_state.last_hit_payout = 0
-    if "last_hit_round" not in st.session_state:
-        st.session_state.last_hit_round = 0
-    if "last_payout_per_round" not in st.session_state:
-        st.session_state.last_payout_per_round = 0
-    if "hit_records" not in st.session_state:
-        st.session_state.hit_records = []
-    
-    # 💡 貸し玉追跡変数の初期化
-    if "loaned_balls_in_row" not in st.session_state:
-        st.session_state["loaned_balls_in_row"] = 0
 
 # ====== ページ1：店名・台番号・レート ======
 if st.session_state.page == "select":
@@ -95,63 +194,126 @@ if st.session_state.page == "select":
             machine_info["貸し玉可能残金"] = 0 # 初期化
             machine_info["実践開始時間"] = now_time.strftime("%H:%M")
             machine_info["is_active"] = True # 実践中のフラグ
+            aggregates.rebuild(machine_info, st.session_state.records) # 集計値の初期化
+            rotation.rebuild(machine_info, st.session_state.records)
             
-            # データ保存 (リフレッシュ対策)
-            save_data({"records": st.session_state.records, "machine_info": machine_info, "is_active": True})
-
-            st.session_state.page = "main"
-            st.rerun()
+            # データ保存 (リフレッシュ対策)。保存できなければエラーを表示したまま、この画面に留まる
+            if save_data({"records": st.session_state.records, "machine_info": machine_info, "is_active": True}):
+                st.session_state.page = "main"
+                st.rerun()
         else:
              st.warning("店名と台番号を正しく入力してください。")
 
+    # 過去の記録の一括取り込み（履歴を残す SQLite に保存しているときだけ）
+    if isinstance(STORE.store, SessionStore):
+        with st.expander("📥 過去の記録を取り込む（CSV / Excel）", expanded=False):
+            st.caption("日付・店名・台番号・レートの列が無いファイルは、この日付と上で入力した値で取り込みます。")
+            import_date = st.date_input("日付", key="import_date")
+            uploaded = st.file_uploader("ファイルを選択", type=["csv", "xlsx"], key="import_file")
+            if uploaded is not None and st.button("取り込む"):
+                defaults = {
+                    "日付": import_date.strftime("%Y-%m-%d"),
+                    "店名": machine_info["店名"],
+                    "台番号": machine_info["台番号"],
+                    "交換率": machine_info["交換率"],
+                }
+                try:
+                    with st.spinner("取り込み中..."):
+                        result = importer.import_file(STORE.store, uploaded, name=uploaded.name, defaults=defaults)
+                except Exception as e:
+                    st.error(f"取り込みに失敗しました: {e}")
+                else:
+                    skipped = f"（{result.skipped} 行をスキップ）" if result.skipped else ""
+                    st.success(f"✅ {result.sessions} セッション / {result.rows} 行を取り込みました{skipped}")
+
+        # 実践終了のたびに更新している集計を読むだけなので、履歴の件数によらずすぐ開ける
+        with st.expander("📈 店舗・台・月別の集計", expanded=False):
+            dims = {"店名別": "shop", "台番号別": "machine", "月別": "month"}
+            dim = st.radio("集計の単位", list(dims), horizontal=True, key="rollup_dim")
+            with PROFILER.stage("rollups"):
+                rows = STORE.store.rollups(dims[dim])
+            if rows:
+                st.dataframe(
+                    pd.DataFrame(rows),
+                    column_config={
+                        "平均回転率": st.column_config.NumberColumn(format="%.2f"),
+                        "1R出玉": st.column_config.NumberColumn(format="%.1f 玉"),
+                        "平均投資": st.column_config.NumberColumn(format="%d 円"),
+                        "総投資": st.column_config.NumberColumn(format="%d 円"),
+                        "平均実践時間": st.column_config.NumberColumn(format="%.1f 時間"),
+                        "総実践時間": st.column_config.NumberColumn(format="%.1f 時間"),
+                    },
+                    hide_index=True,
+                    use_container_width=True,
+                )
+            else:
+                st.info("終了した実践がまだありません。")
+
 
 # ====== ページ2：メイン画面 ======
 elif st.session_state.page == "main":
 
     info = st.session_state.machine_info
-    df = pd.DataFrame(st.session_state.records)
-
-    # 集計系
-    total_used_balls = df["使用玉数"].sum() if not df.empty else 0
-    total_rotations = df["通常回転"].sum() if not df.empty else 0
-    total_payout_balls = df["獲得玉数"].sum() if not df.empty else 0
-    total_invest = info.get("現金投資額", 0)
-    current_balls = info.get("持ち玉", 0)
-    
+
     st.subheader(f"🏠 {info.get('店名', '未設定')} - 台番号 {info.get('台番号', '未設定')}")
     st.caption(f"開始時刻: {info.get('実践開始時間', '---')} / レート: {info.get('交換率', '---')}")
 
+    # 💰 投資ボタンと、それで変わるメトリクスだけを部分的に再実行する（記録一覧の表は作り直さない）
+    @ui.fragment(PROFILER, "invest_panel")
+    def invest_panel():
+        # フラグメントだけの rerun でも最新の値を読むよう、セッション状態から取り直す
+        info = st.session_state.machine_info
 
-    # 平均回転率
-    if total_used_balls > 0:
-        rate_unit = 1000 if info.get("交換率") == "1円" else 250
-        avg_rotation = total_rotations / total_used_balls * rate_unit
-    else:
-        avg_rotation = 0
-
-    # メトリクス表示
-    st.divider()
-    
-    col_kane, col_ball, col_rot = st.columns(3)
-    col_kane.metric("現金投資総額", f"{total_invest:,} 円")
-    col_ball.metric("現在持ち玉数", f"{current_balls:,} 玉")
-    col_rot.metric("平均回転率", f"{avg_rotation:.2f} 回/K")
-    st.metric("総通常回転", f"{total_rotations:,} 回転")
-
-    # 💰 投資ボタン
-    col1, col2, col3, col4 = st.columns([4,1,1,1])
-    invest_actions = {
-        "1000円": 1000, "5000円": 5000, "10000円": 10000
-    }
+        # 💰 投資ボタン（表示はメトリクスの下だが、先に処理して押した分をメトリクスに反映する）
+        metrics_area = st.container()
+        invest_actions = {
+            "1000円": 1000, "5000円": 5000, "10000円": 10000
+        }
     
-    for i, (label, amount) in enumerate(invest_actions.items()):
-        if st.columns([4,1,1,1])[i+1].button(label):
-            info["現金投資額"] = total_invest + amount
-            info["貸し玉可能残金"] = info.get("貸し玉可能残金", 0) + amount
-            
-            # データ保存 (リフレッシュ対策)
-            save_data({"records": st.session_state.records, "machine_info": info, "is_active": True})
-            st.rerun()
+        for i, (label, amount) in enumerate(invest_actions.items()):
+            if st.columns([4,1,1,1])[i+1].button(label):
+                # 状態の更新とデータ保存 (リフレッシュ対策)
+                dispatch(events.invest(amount))
+
+        # 集計系（行の確定ごとに machine_info で差分更新している合計を使う）
+        total_rotations = info.get("総通常回転", 0)
+        total_invest = info.get("現金投資額", 0)
+        current_balls = info.get("持ち玉", 0)
+
+        # 平均回転率
+        avg_rotation = aggregates.average_rotation(info)
+
+        # メトリクス表示
+        with metrics_area, PROFILER.stage("metrics"):
+            st.divider()
+            col_kane, col_ball, col_rot = st.columns(3)
+            col_kane.metric("現金投資総額", f"{total_invest:,} 円")
+            col_ball.metric("現在持ち玉数", f"{current_balls:,} 玉")
+            col_rot.metric("平均回転率", f"{avg_rotation:.2f} 回/K")
+            st.metric("総通常回転", f"{total_rotations:,} 回転")
+
+            # 回転率の不確かさ（95% 信頼区間）と、ボーダーを超えているかの逐次検定
+            col_stats, col_border = st.columns([3, 1])
+            border = col_border.number_input("ボーダー（回/K）", min_value=0.0, step=0.1, format="%.1f",
+                                             value=float(info.get("ボーダー", 0.0)), key="rotation_border")
+            if border != info.get("ボーダー", 0.0):
+                info["ボーダー"] = border
+                record_event({"op": "info", "values": {"ボーダー": border}})
+            summary = rotation.summarize(info.get(rotation.STATS_KEY), border)
+            with col_stats:
+                if summary.low is None:
+                    st.caption("回転率の信頼区間は、使用玉数のある行が2行以上になると表示します。")
+                else:
+                    st.caption(f"95%信頼区間: {summary.low:.2f} 〜 {summary.high:.2f} 回/K"
+                               f"（{summary.n} 行、行ごとのばらつき ±{summary.std:.2f}）")
+                    if summary.decision == "above":
+                        st.success(f"✅ ボーダー（{border:.1f}）超えと判定できます")
+                    elif summary.decision == "below":
+                        st.error(f"⚠️ ボーダー（{border:.1f}）未満と判定できます")
+                    elif summary.llr is not None:
+                        st.info(f"⏳ 判定中（ボーダー ±{rotation.INDIFFERENCE:.0f} 回/K を見分けるには、もう少し回す必要があります）")
+
+    invest_panel()
     
     st.divider()
     
@@ -164,32 +326,35 @@ elif st.session_state.page == "main":
             st.session_state.edit_index = None
             st.session_state.page = "add_row"
             
-            # ✅ 新しい行を追加する際は、前回の大当たり記録をリセットする (ここでリセットするのが正しい)
-            st.session_state.last_hit_payout = 0
-            st.session_state.last_hit_round = 0
-            st.session_state.last_payout_per_round = 0
-            st.session_state.hit_records = [] # 当たり記録の詳細もリセット
+            # ✅ 新しい行の下書きを始める（前回の大当たり記録・借りた玉数はここでリセットされる）
+            clear_draft_inputs()
+            dispatch(events.start_row())
             
             st.rerun()
 
-    # 一覧表示
-    if not df.empty:
-        # 💡 st.dataframeを使用し、見やすく改善
-        display_df = df.copy()
-        display_df['使用玉数'] = display_df['使用玉数'].apply(lambda x: f"{x:,} 玉")
-        display_df['獲得玉数'] = display_df['獲得玉数'].apply(lambda x: f"{x:,} 玉")
-        display_df['1Rあたり獲得出玉'] = display_df['1Rあたり獲得出玉'].round(2)
-        display_df['回転率'] = display_df['回転率'].round(2)
+    # 一覧表示（表示するページの行だけを DataFrame にして整形する）
+    if st.session_state.records:
+        records = st.session_state.records
+        newest_first = st.radio("並び順", ["新しい順", "古い順"], horizontal=True, key="records_order") == "新しい順"
+        page = ui.pager("records", len(records))
+        with PROFILER.stage("dataframe"):
+            display_df = pd.DataFrame(list_page(records, page, newest_first))
+            # 💡 st.dataframeを使用し、見やすく改善
+            display_df['使用玉数'] = display_df['使用玉数'].map("{:,} 玉".format)
+            display_df['獲得玉数'] = display_df['獲得玉数'].map("{:,} 玉".format)
+            display_df['1Rあたり獲得出玉'] = display_df['1Rあたり獲得出玉'].round(2)
+            display_df['回転率'] = display_df['回転率'].round(2)
         
-        st.dataframe(
-            display_df[[
-                "時間", "使用玉数", "打ち始め", "打ち終わり", "通常回転", "回転率", "獲得玉数", "ラウンド数", "1Rあたり獲得出玉"
-            ]].rename(columns={
-                "通常回転": "回転数", "1Rあたり獲得出玉": "1R出玉"
-            }),
-            use_container_width=True,
-            hide_index=True
-        )
+        with PROFILER.stage("table"):
+            st.dataframe(
+                display_df[[
+                    "時間", "使用玉数", "打ち始め", "打ち終わり", "通常回転", "回転率", "獲得玉数", "ラウンド数", "1Rあたり獲得出玉"
+                ]].rename(columns={
+                    "通常回転": "回転数", "1Rあたり獲得出玉": "1R出玉"
+                }),
+                use_container_width=True,
+                hide_index=True
+            )
     else:
         st.info("まだデータがありません。")
         
@@ -197,207 +362,121 @@ elif st.session_state.page == "main":
         
     if st.button("🏁 実践終了"):
         # ⚠️ 実践終了処理：データを保存し、is_activeフラグをFalseに
-        info["is_active"] = False
-        save_data({"records": st.session_state.records, "machine_info": info, "is_active": False})
-        
-        # セッション状態を初期化してページ移動
-        st.session_state.records = []
-        st.session_state.machine_state = {}
-        st.session_state.page = "select"
-        st.rerun()
+        # 保存できなかったときは画面の記録を残し、エラーを表示したままにする
+        if save_data({"records": st.session_state.records, "machine_info": dict(info, is_active=False),
+                      "is_active": False}):
+            info["is_active"] = False
+            # セッション状態を初期化してページ移動
+            st.session_state.records = []
+            st.session_state.machine_state = {}
+            st.session_state.page = "select"
+            st.rerun()
 
 
 # ====== ページ3：行追加 ======
 elif st.session_state.page == "add_row":
-    is_edit = st.session_state.get("edit_index") is not None
-    info = st.session_state.machine_info
-    
-    # 💡 持ち玉: 前の行の確定値 = この行の開始時の持ち玉
-    start_of_row_balls = int(info.get("持ち玉", 0)) 
-    new_invest_money = int(info.get("貸し玉可能残金", 0))
-
-    # --- 状態保持のための初期化: 既に値があれば保持し、なければ初期値を設定 ---
+    if st.session_state.get("draft") is None:
+        dispatch(events.start_row(st.session_state.get("edit_index")))
+    draft = st.session_state.draft
     
-    # 1. 持ち玉入力 (add_row_new_balls): 
-    # セッションに値がなければ、この行の開始時の持ち玉で初期化
+    # --- 入力欄の状態: 無ければ下書きの値で初期化する（復元時も入力途中の値から再開） ---
     if "add_row_new_balls" not in st.session_state:
-        st.session_state["add_row_new_balls"] = start_of_row_balls
-        
-    # 2. 回転数入力 (add_row_start_rot / add_row_end_rot):
-    # セッションに値がなければ、新規時は0、編集時は既存レコードの値で初期化
+        st.session_state["add_row_new_balls"] = draft["持ち玉"]
     if "add_row_start_rot" not in st.session_state:
-        if is_edit and "edit_index" in st.session_state:
-            record = st.session_state.records[st.session_state.edit_index]
-            st.session_state["add_row_start_rot"] = record["打ち始め"]
-        else:
-            st.session_state["add_row_start_rot"] = 0
-            
+        st.session_state["add_row_start_rot"] = draft["打ち始め"]
     if "add_row_end_rot" not in st.session_state:
-        if is_edit and "edit_index" in st.session_state:
-            record = st.session_state.records[st.session_state.edit_index]
-            st.session_state["add_row_end_rot"] = record["打ち終わり"]
-        else:
-            st.session_state["add_row_end_rot"] = 0
-    
-    # 3. 貸し玉記録用の初期化: この行で何玉借りたか
-    if "loaned_balls_in_row" not in st.session_state:
-        st.session_state["loaned_balls_in_row"] = 0
+        st.session_state["add_row_end_rot"] = draft["打ち終わり"]
             
     st.subheader("📝 記録入力")
-    
-    # 貸し玉ボタン
-    col1, col2 = st.columns([4,1])
-    with col1:
-        st.metric("貸し玉可能残金", f"{new_invest_money} 円")
-    with col2:
-        selected_rate = info.get("交換率", "4円")
-        min_money = 500 if selected_rate == "4円" else 200
-        added_balls_per_loan = 125 if selected_rate == "4円" else 200
-
-        zero_invest_money = (new_invest_money < min_money)
-                           
-        if st.button("貸し玉", disabled=zero_invest_money):
-            
-            # ✅ 修正: 貸し玉ボタンは、借りた玉数を追跡する変数のみを更新します。
-            st.session_state["loaned_balls_in_row"] += added_balls_per_loan 
-            
-            # 貸し玉可能残金を更新
-            info["貸し玉可能残金"] = new_invest_money - min_money
+
+    # 貸し玉・入力欄・大当たりの追加と、それで変わる使用玉数・獲得玉数だけを部分的に再実行する
+    @ui.fragment(PROFILER, "row_panel")
+    def row_panel():
+        info = st.session_state.machine_info
+        draft = st.session_state.draft
+        # 💡 持ち玉: 前の行の確定値 = この行の開始時の持ち玉（下書きを始めたときに記録済み）
+
+        # 貸し玉ボタン（先に処理して、借りた分を残金の表示に反映する）
+        col1, col2 = st.columns([4,1])
+        with col2:
+            if st.button("貸し玉", disabled=not play.can_lend(info)):
             
-            # データ保存 (リフレッシュ対策)
-            save_data({"records": st.session_state.records, "machine_info": info, "is_active": True})
-            st.rerun()
+                # 貸し玉可能残金を更新し、✅ 借りた玉数はこの行の下書きにだけ加算します。
+                dispatch(events.lend())
+        with col1:
+            st.metric("貸し玉可能残金", f"{int(info.get('貸し玉可能残金', 0))} 円")
+
+        # 現在の持ち玉数入力 (keyにより値が保持される)
+        st.number_input(
+            "現在の持ち玉数を入力", 
+            min_value=0, 
+            step=50, 
+            key="add_row_new_balls"
+        )
 
-    # 現在の持ち玉数入力 (keyにより値が保持される)
-    # value引数は初期化ブロックで設定したセッション状態を参照するため、ここでは不要
-    st.number_input(
-        "現在の持ち玉数を入力", 
-        min_value=0, 
-        step=50, 
-        key="add_row_new_balls"
-    )
-    new_current_balls = st.session_state["add_row_new_balls"]
-    
-    # 💡 修正: 使用玉数自動計算: (行開始時の持ち玉 + この行で借りた玉) - 最終残数
-    total_balls_available = start_of_row_balls + st.session_state["loaned_balls_in_row"]
-    used_balls = max(total_balls_available - new_current_balls, 0)
-
-    # 回転数入力 (keyにより値が保持される) - value引数は初期化ブロックで設定したセッション状態を参照するため、ここでは不要
-    st.number_input("打ち始め回転数", min_value=0, step=1, key="add_row_start_rot")
-    st.number_input("打ち終わり回転数", min_value=0, step=1, key="add_row_end_rot")    
-    start_rot = st.session_state["add_row_start_rot"]
-    end_rot = st.session_state["add_row_end_rot"]
-    
-    # セッション状態に新しい記録を追加
-    st.session_state.hit_records.append({"打ち始め": start_rot, "打ち終わり": end_rot})
+        # 回転数入力 (keyにより値が保持される)
+        st.number_input("打ち始め回転数", min_value=0, step=1, key="add_row_start_rot")
+        st.number_input("打ち終わり回転数", min_value=0, step=1, key="add_row_end_rot")    
 
-    st.divider()
+        # 入力欄が変わったら下書きに反映する（変わった項目だけをイベントにする）
+        inputs = {
+            "持ち玉": st.session_state["add_row_new_balls"],
+            "打ち始め": st.session_state["add_row_start_rot"],
+            "打ち終わり": st.session_state["add_row_end_rot"],
+        }
+        changed = {k: v for k, v in inputs.items() if draft[k] != v}
+        if changed:
+            dispatch(events.draft(**changed))
     
-    # 獲得玉数表示
-    payout_from_hit = st.session_state.get("last_hit_payout", 0)
-    payout_from_round = st.session_state.get("last_hit_round", 0)
-    payout_from_per_round = st.session_state.get("last_payout_per_round", 0)
-    gained_balls = payout_from_hit
+        # 💡 修正: 使用玉数自動計算: (行開始時の持ち玉 + この行で借りた玉) - 最終残数
+        used_balls = events.used_balls(draft)
     
-    # データフレームの初期化
-    hit_df = pd.DataFrame(st.session_state.get("hit_records", []), columns=["ラウンド", "獲得出玉"])
-    # 💡 ラウンド数と出玉の入力を追加
-    with st.form("hit_input_form", clear_on_submit=True):
-        col_r, col_ball = st.columns(2)
-        new_round = col_r.number_input("ラウンド数 (R)", min_value=0, step=1)
-        new_balls = col_ball.number_input("獲得出玉 (玉)", min_value=0, step=1)
-        if st.form_submit_button("➕ 記録を追加"):
-            if new_round > 0 or new_balls > 0:
-                # セッション状態に新しい記録を追加
-                st.session_state.hit_records.append({"ラウンド": new_round, "獲得出玉": new_balls})
-                st.rerun()
-            else:
-                st.warning("ラウンド数と獲得出玉を入力してください。")      
-                
-    if not hit_df.empty:
-        # 3. 合計値の算出
-        total_round = hit_df["ラウンド"].sum()
-        total_payout = hit_df["獲得出玉"].sum()
-        # 4. 1Rあたりの獲得出玉の計算
-        if total_round > 0:
-            payout_per_round = total_payout / total_round
-        else:
-            payout_per_round = 0
-
-    # 各数値を add_row 画面に渡す (リセットされないよう保持)
-    st.session_state.last_hit_round = total_round
-    st.session_state.last_hit_payout = total_payout
-    st.session_state.last_payout_per_round = payout_per_round
+        st.divider()
+    
+        # 💡 ラウンド数と出玉の入力を追加
+        with st.form("hit_input_form", clear_on_submit=True):
+            col_r, col_ball = st.columns(2)
+            new_round = col_r.number_input("ラウンド数 (R)", min_value=0, step=1)
+            new_balls = col_ball.number_input("獲得出玉 (玉)", min_value=0, step=1)
+            if st.form_submit_button("➕ 記録を追加"):
+                if new_round > 0 or new_balls > 0:
+                    # 下書きに新しい大当たりを追加（合計は追加のたびに更新）
+                    dispatch(events.hit(new_round, new_balls))
+                else:
+                    st.warning("ラウンド数と獲得出玉を入力してください。")      
+
+        # 獲得玉数表示（大当たりの合計は追加のたびに更新済み）
+        total_round = draft["大当たり"].total_round
+        total_payout = draft["大当たり"].total_payout
         
-    st.divider()
-    st.write(f"使用玉数: {used_balls} 玉")
-    st.write(f"獲得玉数: {total_payout} 玉 (合計 {total_round}R)")
+        st.divider()
+        st.write(f"使用玉数: {used_balls} 玉")
+        st.write(f"獲得玉数: {total_payout} 玉 (合計 {total_round}R)")
 
-    
-    # 最終持ち玉計算
-    final_balls = new_current_balls + gained_balls
+    row_panel()
 
     # 確定処理
     if st.button("✅ 確定"):
-        normal_rot = max(end_rot - start_rot, 0)
-        selected_rate = info.get("交換率", "4円")
-        rate_unit = 250 if selected_rate == "4円" else 1000
-        
-        if used_balls > 0:
-            rotation_rate = (normal_rot / used_balls * rate_unit)
-        else:
-            rotation_rate = 0
-
-        now = datetime.now().strftime("%H:%M")
-        
-        # 編集モードの場合、元のレコードの時間を保持
-        time_to_use = st.session_state.records[st.session_state.edit_index]["時間"] if is_edit and st.session_state.get("edit_index") is not None else now
-
-
-        new_record = {
-            "時間": time_to_use,
-            "使用玉数": used_balls, # ✅ 修正後の正確な使用玉数を記録
-            "打ち始め": start_rot,
-            "打ち終わり": end_rot,
-            "通常回転": normal_rot,
-            "回転率": round(rotation_rate, 2),
-            "獲得玉数": gained_balls,
-            "ラウンド数": payout_from_round,
-            "1Rあたり獲得出玉": round(payout_from_per_round, 2),
-        }
-
-        if is_edit and st.session_state.get("edit_index") is not None:
-            st.session_state.records[st.session_state.edit_index] = new_record
-        else:
-            st.session_state.records.append(new_record)
-
-        # ✅ 現在持ち玉更新 (確定後の持ち玉)
-        st.session_state.machine_info["持ち玉"] = final_balls
+        # 記録行の作成・合計と統計量の差分更新 (O(1))・持ち玉の更新は events.apply() が行う
+        # 編集モードの場合は元のレコードの時間を保持する
+        dispatch(events.commit_row(datetime.now().strftime("%H:%M")))
 
         # 💡 add_row 画面の状態をリセット（次の行追加のために）
-        del st.session_state["add_row_new_balls"]
-        del st.session_state["add_row_start_rot"]
-        del st.session_state["add_row_end_rot"]
-        del st.session_state["loaned_balls_in_row"] # ✅ NEW: 借りた玉数もリセット
-        
-        # データ保存 (リフレッシュ対策)
-        save_data({"records": st.session_state.records, "machine_info": st.session_state.machine_info, "is_active": True})
+        clear_draft_inputs()
         
         st.session_state.page = "main"
+        st.session_state.edit_index = None
         st.rerun()
 
     if st.button("⬅ 戻る"):
+        dispatch(events.cancel_row())
         st.session_state.page = "main"
         st.session_state.edit_index = None
         
         # 💡 戻る時も add_row の状態をリセット
-        if "add_row_new_balls" in st.session_state:
-            del st.session_state["add_row_new_balls"]
-        if "add_row_start_rot" in st.session_state:
-            del st.session_state["add_row_start_rot"]
-        if "add_row_end_rot" in st.session_state:
-            del st.session_state["add_row_end_rot"]
-        if "loaned_balls_in_row" in st.session_state:
-            del st.session_state["loaned_balls_in_row"] # ✅ NEW: 借りた玉数もリセット
+        clear_draft_inputs()
             
-        st.rerun()
\ No newline at end of file
+        st.rerun()
+
+# ====== 計測結果（計測モードのときだけサイドバーに表示） ======
+ui.profiling_panel(PROFILER)
@@ -1,14 +1,48 @@
 import streamlit as st
+import altair as alt
 import pandas as pd
+import numpy as np
+import os
+import tempfile
 from datetime import datetime
 from typing import List
 
+from pachilog_core import archive, catalog, expected, export, fileio, play
+from pachilog_core.border import border_lines, sensitivity_grid
+from pachilog_core.markov import markov_border, solve_chain
+from pachilog_core.paging import list_page
+from pachilog_core.rounds import RoundDistribution
+from pachilog_core.payout import first_hit_rounds_pmf, session_distribution
+from pachilog_core.simulate import SimulationSpec, simulate, summarize
+import pachilog_ui as ui
+
 
 #streamlit run pachilog_app.py
 
 st.set_page_config(page_title="PachiLog", layout="centered")
 
 st.title("🎰 PachiLog")
+# 計測モード（PACHILOG_PROFILE=1 または ?profile=1）のときだけ各段階の時間を記録する
+PROFILER = ui.profiler("pachilog_app")
+
+# プレイヤー（URL の ?player=名前 → 環境変数 PACHILOG_PLAYER の順）ごとにアーカイブを分ける
+PLAYER = fileio.safe_name(st.query_params.get("player", os.environ.get("PACHILOG_PLAYER", "")))
+ARCHIVE_DIR = fileio.keyed_path(os.path.join(os.environ.get("PACHILOG_DATA_DIR", "."), archive.ARCHIVE_DIR), PLAYER)
+# 機種スペックのカタログはプレイヤーによらず共通
+CATALOG_FILE = os.path.join(os.environ.get("PACHILOG_DATA_DIR", "."), catalog.CATALOG_FILE)
+# 画面からダウンロードできるエクスポートの大きさの上限（超えるときはコマンドで書き出す）
+DOWNLOAD_MAX_BYTES = 100 * 2**20
+
+
+@st.cache_resource
+def get_catalog(path):
+    """機種スペックのカタログ（プロセス内で1つだけ生成し、機種名の索引をメモリに持つ）"""
+    return catalog.SpecCatalog(path)
+
+
+CATALOG = get_catalog(CATALOG_FILE)
+# 別のプロセスが保存した機種があれば読み直す（ファイルの更新時刻を見るだけ）
+CATALOG.refresh()
 
 # ====== タブの作成 ======
 tab1, tab2, tab3, = st.tabs(["📐 ボーダー・期待値計算", "📊 実践記録", "📕実践一覧"])
@@ -39,6 +73,59 @@ with tab1:
         st.session_state.mode_selection_state = "確変ループ"
     if 'rate_select_state' not in st.session_state:
         st.session_state.rate_select_state = "等価"
+    # スペックの入力欄の初期値（カタログから読み込むときはこのキーに値を入れる）
+    for field, default in catalog.DEFAULT_SPEC.items():
+        if field != "mode" and f"spec_{field}" not in st.session_state:
+            st.session_state[f"spec_{field}"] = default
+
+    def apply_spec(name: str):
+        """カタログの機種を入力欄とラウンド振り分けに読み込む（ウィジェットを描く前に呼ぶコールバック）"""
+        spec = CATALOG.get(name)
+        if spec is None:
+            return
+        st.session_state.spec_name = spec["機種名"]
+        for field in catalog.DEFAULT_SPEC:
+            key = "mode_selection_state" if field == "mode" else f"spec_{field}"
+            st.session_state[key] = spec[field]
+        for kind in catalog.DIST_KINDS:
+            entries = []
+            for entry in spec["distributions"].get(kind, []):
+                st.session_state.entry_id_counter += 1
+                entry = dict(entry, id=st.session_state.entry_id_counter)
+                # 次フローの selectbox は先頭（確変）が初期値なので、時短の行は値を入れておく
+                st.session_state[f"{kind}_state_{entry['id']}"] = entry["ステータス"]
+                entries.append(entry)
+            st.session_state[f"{kind}_entries"] = entries
+            if entries:
+                st.session_state[f"{kind}_dist"] = RoundDistribution.from_entries(entries)
+            else:
+                st.session_state.pop(f"{kind}_dist", None)
+
+    def on_machine_name_change():
+        # 登録済みの機種名（表記ゆれを含む）を入力したら、そのまま読み込む
+        apply_spec(st.session_state.spec_name)
+
+    # 感度分析の格子（換金率は 等価・28玉・30玉・33玉・35玉・40玉 交換）
+    GRID_EXCHANGE = (4.0, 3.57, 3.33, 3.03, 2.86, 2.5)
+    GRID_SUPPORT = (0, 5, 10, 15, 20, 25, 30)
+
+    @st.cache_data(show_spinner=False, max_entries=32)
+    def sensitivity_frames(spec, first, rush, support, rate_range, spins_per_hour, hours):
+        """1機種分の感度分析の表（スペック・振り分け・格子が同じなら計算し直さない）
+
+        spec は (通常時確率, 突入率, 継続率, カウント数, アタッカー賞球)、first / rush は (ラウンド数, 割合) の組。
+        """
+        rates = np.arange(rate_range[0], rate_range[1] + 0.25, 0.5)
+        grid = sensitivity_grid(*spec, first[0], first[1], rush[0], rush[1], GRID_EXCHANGE, support, rates,
+                                spins_per_hour=spins_per_hour, hours=hours)
+        e, s = np.meshgrid(grid.exchange_money, grid.support_reduction, indexing="ij")
+        border = pd.DataFrame({"換金率": e.ravel(), "電サポ減算（％）": s.ravel(), "ボーダー": grid.border.ravel()})
+        e, s, r = np.meshgrid(grid.exchange_money, grid.support_reduction, grid.rotation_rate, indexing="ij")
+        value = pd.DataFrame({
+            "換金率": e.ravel(), "電サポ減算（％）": s.ravel(), "回転率": r.ravel(),
+            "単価": grid.unit_value.ravel(), "時給": grid.hourly.ravel(), "仕事量": grid.work.ravel(),
+        })
+        return border.round(2), value.round(2)
         
     def raund_check(prefix: str):
         display_map = {'normal': '通常時',
@@ -142,28 +229,9 @@ with tab1:
         else:
             st.success(f"合計: {total_percent:.1f}% (OK)")
 
-        # --- 4. 表を作成して保存 ---
+        # --- 4. 型付きの振り分けとして保存（文字列への整形は表示時のみ） ---
         if entries:
-            # 表示用のリストを作成
-            display_data = []
-            
-            # ヘッダー行を作成（idは含めない）
-            header = ['ラウンド (R)', '割合 (%)', 'ステータス'] 
-            display_data.append(header)
-            
-            for entry in entries:
-                # 単位を付与し、idは含めない
-                row = [
-                    f"{entry['ラウンド']}R",
-                    f"{entry['割合']:.1f}%",
-                    entry.get('ステータス', '---') # ステータスの値を利用
-                ]
-                display_data.append(row)
-                
-            # 💡 修正点: DataFrameを作成し、df_display に代入
-            df_display = pd.DataFrame(display_data[1:], columns=display_data[0])
-            
-            st.session_state[f'{prefix}_display_df'] = df_display
+            st.session_state[f'{prefix}_dist'] = RoundDistribution.from_entries(entries)
         else:
             st.info("データがありません。ラウンド数ボタンを押して追加してください。")
                 
@@ -174,88 +242,44 @@ with tab1:
         entries_key = f'{prefix}_entries'
         return st.session_state.get(entries_key, [])
     
-    def extract_and_clean_data(df_key: str) -> pd.DataFrame:
-        """
-        セッション状態から整形済みデータを取り出し、計算用に整形する。
-        """
-        # DataFrameをセッション状態から取得
-        if df_key not in st.session_state:
-            st.warning(f"キー '{df_key}' にデータが見つかりません。")
-            return pd.DataFrame()
-
-        df_display = st.session_state[df_key].copy()
-        
-        if df_display.empty:
-            return pd.DataFrame()
-
-        # 1. 'ラウンド (R)' から 'R' を取り除き、整数に変換
-        # 💡 例: '10R' -> 10
-        if 'ラウンド (R)' in df_display.columns:
-            df_display['ラウンド_数値'] = df_display['ラウンド (R)'].str.replace('R', '', regex=False).astype(int)
-        
-        # 2. '割合 (%)' から '%' を取り除き、小数に変換 (例: 50.0% -> 0.50)
-        # 💡 例: '50.0%' -> 50.0 -> 0.50
-        if '割合 (%)' in df_display.columns:
-            # まず '%' を削除し、float型に変換
-            df_display['割合_数値'] = df_display['割合 (%)'].str.replace('%', '', regex=False).astype(float)
-            # 100で割って確率（0.0～1.0）にする
-            df_display['割合_数値'] = df_display['割合_数値'] / 100.0
-            
-        # 抜き取りたいカラムのみを選択（例: ラウンド数、確率、ステータス）
-        if 'ステータス' in df_display.columns:
-            df_clean = df_display[['ラウンド_数値', '割合_数値','ステータス']].rename(
-                columns={'ラウンド_数値': 'ラウンド (R)', '割合_数値': '割合 (%)','ステータス':'ステータス'}
-            )
-        else:
-            df_clean = df_display[['ラウンド_数値', '割合_数値']].rename(
-                columns={'ラウンド_数値': 'ラウンド (R)', '割合_数値': '割合 (%)'}
-            )
-            
-
-        return df_clean
-    
     def list_half():
         
         return
     
-    def calculation_boder(rush_continue,A_count,B_count):
-        return_data = []
-        
-        
-        #RUSH平均連チャン数
-        
-        return_data.append(1/(1-rush_continue/100))
-        #RUSH中継続時の平均純増出玉
-        return_data.append(A_count)
-        return_data.append(B_count)
-        #1度のRUSH突入で得られる平均純増出玉
-        
-        #初当たり平均純増出玉
-        
-        #トータル純増期待出玉
-        
-        #千円あたりの出玉価値
-        
-        #ボーダーラインの算出
-        
-        return return_data
-
     # === ページ1：機種ボーダー・期待値計算 ===
     if st.session_state.page == "select":
         st.title("📘 基本スペック入力")
-        calculation_list = []
+        # 計算に使うラウンド振り分け（初当たり時 / RUSH継続時の確変行）
+        first_dist = None
+        rush_dist = None
+        # マルコフ連鎖モデル用の振り分け（次フローを含む全行）
+        first_rows = None
+        rush_rows = None
             
-        machine_name = st.text_input("機種名")
+        machine_name = st.text_input("機種名", key="spec_name", on_change=on_machine_name_change)
+        saved_spec = CATALOG.get(machine_name) if machine_name else None
+        if machine_name and saved_spec is None:
+            # 入力途中の機種名から、前方一致・あいまい一致の候補を出す
+            candidates = CATALOG.search(machine_name)
+            if candidates:
+                st.caption("カタログの候補（押すと読み込みます）")
+                for col, name in zip(st.columns(len(candidates)), candidates):
+                    col.button(name, key=f"spec_candidate_{name}", on_click=apply_spec, args=(name,))
+        if saved_spec is not None and saved_spec.get("borders"):
+            with st.expander("保存済みのボーダー（換金率別）", expanded=False):
+                # 以前のバージョンで保存した参考値（次フローモデル）の列は表示しない
+                st.dataframe(pd.DataFrame(saved_spec["borders"])[["換金率", "ボーダー"]],
+                             use_container_width=True, hide_index=True)
         col1, col2, col3 = st.columns(3)
         with col1:
-            prob_normal = st.number_input("大当たり確率（通常時）", value=319.7, step=0.1, format="%.1f")
-            prob_rush = st.number_input("大当たり確率（RUSH中）", value=99.9, step=0.1, format="%.1f")
+            prob_normal = st.number_input("大当たり確率（通常時）", step=0.1, format="%.1f", key="spec_prob_normal")
+            prob_rush = st.number_input("大当たり確率（RUSH中）", step=0.1, format="%.1f", key="spec_prob_rush")
         with col2:
-            rush_entry = st.number_input("RUSH突入率（％）", value=50, step=1)
-            rush_continue = st.number_input("RUSH継続率（％）", value=80, step=1)
+            rush_entry = st.number_input("RUSH突入率（％）", step=1, key="spec_rush_entry")
+            rush_continue = st.number_input("RUSH継続率（％）", step=1, key="spec_rush_continue")
         with col3:
-            count_num = st.number_input("カウント数", value=10, step=1)
-            attacker_ball = st.number_input("アタッカー賞球", value=10, step=1)
+            count_num = st.number_input("カウント数", step=1, key="spec_count_num")
+            attacker_ball = st.number_input("アタッカー賞球", step=1, key="spec_attacker_ball")
 
         raund_ball = count_num * attacker_ball
 
@@ -276,21 +300,13 @@ with tab1:
                         st.session_state.page = "raund_select"
                         st.rerun()
             
-            if 'normal_rush_display_df' in st.session_state:
-                    #st.dataframe(st.session_state.normal_rush_display_df, use_container_width=True, hide_index=True)
-                    #表の中の数値を受け取る
-                    rush_key = 'normal_rush_display_df' 
-                    normal_rush = extract_and_clean_data(rush_key)
-                    if not normal_rush.empty:
-                       st.dataframe(st.session_state.normal_rush_display_df, use_container_width=True, hide_index=True) 
-                       
-                       df_normal_rush = normal_rush[normal_rush['ステータス'] == '確変'].copy()
-                       #RUSH中継続時の平均純増出玉
-                       raund_ball_per_percent = (raund_ball * df_normal_rush['ラウンド (R)']) * (1 - df_normal_rush['割合 (%)'])
-                       C_count = raund_ball_per_percent.sum()
-                                              
-                    
-                                        
+            normal_rush = st.session_state.get('normal_rush_dist')
+            if normal_rush is not None:
+                st.dataframe(normal_rush.display(), use_container_width=True, hide_index=True)
+                # 確変ループは初当たり・RUSH中とも共通の振り分けを使う
+                first_dist = normal_rush
+                rush_dist = normal_rush.kakuhen_only()
+                first_rows = rush_rows = normal_rush.rows()
             else:
                 st.info("データを入力してください")
 
@@ -306,13 +322,11 @@ with tab1:
                     st.session_state.page = "raund_select"
                     st.rerun()
                 
-            if 'normal_display_df' in st.session_state:
-                normal_key = "normal_display_df"
-                normal = extract_and_clean_data(normal_key)
-                if not normal.empty:
-                    st.dataframe(st.session_state.normal_display_df, use_container_width=True, hide_index=True)
-                    df_normal = normal.copy()
-                    
+            normal = st.session_state.get('normal_dist')
+            if normal is not None:
+                st.dataframe(normal.display(), use_container_width=True, hide_index=True)
+                first_dist = normal
+                first_rows = normal.rows()
             else:
                 st.info("通常時のデータを入力してください")
 
@@ -326,13 +340,11 @@ with tab1:
                     st.session_state.page = "raund_select"
                     st.rerun()
                 
-            if 'rush_display_df' in st.session_state:
-                rush_key = "rush_display_df"
-                rush = extract_and_clean_data(rush_key)
-                if not rush.empty:
-                    st.dataframe(st.session_state.rush_display_df, use_container_width=True, hide_index=True)
-                    df_rush = rush[rush['ステータス'] == '確変'].copy()
-                    
+            rush = st.session_state.get('rush_dist')
+            if rush is not None:
+                st.dataframe(rush.display(), use_container_width=True, hide_index=True)
+                rush_dist = rush.kakuhen_only()
+                rush_rows = rush.rows()
             else:
                 st.info("RUSH時のデータを入力してください")
                 
@@ -344,30 +356,178 @@ with tab1:
                 exchange_ball = st.number_input("交換率", value=4.00, step=0.01, format="%.2f")
                 exchange_money = st.number_input("換金率", value=3.57, step=0.01, format="%.2f")
             
-            suport_par = st.number_input("電サポ減算割合（％）", min_value=0, value=10, step=1 )
+            suport_par = st.number_input("電サポ減算割合（％）", min_value=0, step=1, key="spec_support_reduction")
             suport_par_col = (100 - suport_par) / 100
             if suport_par_col == 0:
                 st.info("電サポ割合を修正してください")
+            jitan_continue = st.number_input("時短引き戻し率（％）", min_value=0.0, max_value=99.9, step=0.1, format="%.1f",
+                                             key="spec_jitan_continue")
+
+        # 入力中のスペックとラウンド振り分けをカタログに保存（ボーダーは保存時に計算しておく）
+        if st.button("💾 この機種をカタログに保存"):
+            spec = {field: st.session_state[f"spec_{field}"] for field in catalog.DEFAULT_SPEC if field != "mode"}
+            spec["mode"] = mode
+            spec["distributions"] = {kind: st.session_state.get(f"{kind}_entries", []) for kind in catalog.DIST_KINDS}
+            try:
+                saved = CATALOG.save(machine_name, spec)
+            except ValueError as e:
+                st.warning(str(e))
+            else:
+                st.success(f"「{saved['機種名']}」をカタログに保存しました（{len(CATALOG)} 機種）")
                
-        #通常時電サポ割合込みのラウンドあたりの玉数 
-        A_raund_par_suport = (raund_ball * df_normal['ラウンド (R)']) * suport_par_col
-        #   通常時の純増出玉
-        if (df_normal['割合 (%)']).all() == 1.0:
-            A_raund_ball_per_percent = A_raund_par_suport * (df_normal['割合 (%)'])
-            A_count = A_raund_ball_per_percent.sum()
-        else:
-            A_raund_ball_per_percent = A_raund_par_suport * (df_normal['割合 (%)'])
-            A_count = A_raund_ball_per_percent.sum()
-                
-        #RUSH中電サポ割合込みのラウンドあたりの玉数        
-        B_raund_par_suport = (raund_ball * df_rush['ラウンド (R)']) * suport_par_col
-        #RUSH中継続時の平均純増出玉
-        if (df_rush['割合 (%)']).all() == 1.0:
-            B_raund_ball_per_percent = B_raund_par_suport * 1
-            B_count = B_raund_ball_per_percent.sum()
-        else:
-            B_raund_ball_per_percent = B_raund_par_suport * (df_rush['割合 (%)'])
-            B_count = B_raund_ball_per_percent.sum()
+        # ボーダーライン計算
+        if st.button("ボーダーラインを計算"):
+            if first_dist is None or rush_dist is None:
+                st.warning("ラウンド振り分けを入力してください")
+            else:
+                with PROFILER.stage("border"):
+                    result = border_lines(
+                        prob_normal, rush_entry, rush_continue, count_num, attacker_ball,
+                        first_dist.rounds, first_dist.ratios,
+                        rush_dist.rounds, rush_dist.ratios,
+                        exchange_money=exchange_money, support_reduction=suport_par,
+                    )
+                st.write(f"平均連チャン数は→　{round(result.renchan[0],3)}")
+                st.write(f"初当たり(非突入)平均純増出玉→　{result.normal_payout[0]}")
+                st.write(f"RUSH中継続時の平均純増出玉→　{result.rush_payout[0]}")
+                st.write(f"1度のRUSH突入で得られる平均純増出玉→　{round(result.rush_total[0],3)}")
+                st.write(f"初当たり（Rush突入）平均純増出玉→　{round(result.rush_first_hit[0],3)}")
+                st.write(f"トータル純増期待出玉→　{round(result.total_payout[0],2)}")
+                st.write(f"千円当たりの出玉価値→　{round(result.balls_per_1000[0],2)}")
+                st.write(f"ボーダーライン→　{round(result.border[0],2)}")
+
+                # 参考: 次フロー（確変/時短）から突入率・連チャン数を求めるマルコフ連鎖モデル
+                if first_rows and rush_rows:
+                    st.markdown(f"#### 参考：次フローから求めたモデル（{mode}）")
+                    st.caption("期待値・カタログ・感度分析に使うのは上のボーダーライン（入力した突入率・継続率から計算）です。"
+                               "このモデルは振り分けの次フローと時短引き戻し率から突入率・連チャン数を求めるため、"
+                               "入力した突入率・継続率と食い違うとボーダーも異なります。")
+                    try:
+                        with PROFILER.stage("border"):
+                            chain = solve_chain(mode, first_rows, rush_rows, rush_continue, jitan_continue)
+                    except ValueError as e:
+                        st.warning(str(e))
+                    else:
+                        markov = markov_border(chain, prob_normal, count_num * attacker_ball,
+                                               support_reduction=suport_par, exchange_money=exchange_money)
+                        st.dataframe(pd.DataFrame({
+                            "項目": ["RUSH突入率", "平均連チャン数", "トータル純増期待出玉", "ボーダーライン"],
+                            "入力した突入率・継続率": [f"{rush_entry:.1f}%", f"{result.renchan[0]:.3f}",
+                                                  f"{result.total_payout[0]:.2f}", f"{result.border[0]:.2f}"],
+                            "次フローから（参考）": [f"{chain.entry_rate:.1%}", f"{chain.mean_rush_hits:.3f}",
+                                                f"{markov.total_payout:.2f}", f"{markov.border:.2f}"],
+                        }), use_container_width=True, hide_index=True)
+                        st.write(f"初当たり1回あたりの平均当たり回数（参考）→　{round(chain.mean_hits,3)}")
+                        renchan = chain.renchan_pmf[:30]
+                        st.bar_chart(pd.DataFrame({"確率": renchan}, index=range(1, len(renchan) + 1)))
+
+        # 感度分析（換金率 × 電サポ減算 × 回転率を一度に計算し、ヒートマップで比べる）
+        with st.expander("🌡 感度分析（換金率 × 電サポ × 回転率）", expanded=False):
+            if first_dist is None or rush_dist is None:
+                st.info("ラウンド振り分けを入力してください")
+            else:
+                col1, col2, col3 = st.columns(3)
+                with col1:
+                    rate_range = st.slider("回転率の範囲（回/K）", 10.0, 35.0, (14.0, 26.0), step=0.5,
+                                           key="grid_rate_range")
+                with col2:
+                    spins_per_hour = st.number_input("1時間の通常回転数", min_value=1, value=200, step=10,
+                                                     key="grid_spins_per_hour")
+                with col3:
+                    hours = st.number_input("実践時間（時間）", min_value=0.5, value=8.0, step=0.5, key="grid_hours")
+                support_axis = tuple(sorted(set(GRID_SUPPORT) | {suport_par}))
+                with PROFILER.stage("border"):
+                    border_df, value_df = sensitivity_frames(
+                        (prob_normal, rush_entry, rush_continue, count_num, attacker_ball),
+                        (tuple(first_dist.rounds.tolist()), tuple(first_dist.ratios.tolist())),
+                        (tuple(rush_dist.rounds.tolist()), tuple(rush_dist.ratios.tolist())),
+                        support_axis, rate_range, spins_per_hour, hours,
+                    )
+
+                st.markdown("#### ボーダーライン（換金率 × 電サポ減算）")
+                base = alt.Chart(border_df).encode(
+                    x=alt.X("電サポ減算（％）:O"), y=alt.Y("換金率:O", sort="descending"),
+                )
+                st.altair_chart(
+                    base.mark_rect().encode(
+                        color=alt.Color("ボーダー:Q", scale=alt.Scale(scheme="redyellowgreen", reverse=True)),
+                        tooltip=["換金率", "電サポ減算（％）", "ボーダー"],
+                    ) + base.mark_text(fontSize=10).encode(text=alt.Text("ボーダー:Q", format=".1f")),
+                    use_container_width=True,
+                )
+
+                col1, col2 = st.columns(2)
+                with col1:
+                    metric = st.radio("表示する値", ["時給", "仕事量", "単価"], horizontal=True, key="grid_metric")
+                with col2:
+                    support = st.select_slider("電サポ減算（％）", support_axis, value=suport_par, key="grid_support")
+                st.markdown(f"#### {metric}（換金率 × 回転率、電サポ減算 {support}％）")
+                st.altair_chart(
+                    alt.Chart(value_df[value_df["電サポ減算（％）"] == support]).mark_rect().encode(
+                        x=alt.X("回転率:O"), y=alt.Y("換金率:O", sort="descending"),
+                        color=alt.Color(f"{metric}:Q", scale=alt.Scale(scheme="redyellowgreen", domainMid=0)),
+                        tooltip=["換金率", "回転率", "単価", "時給", "仕事量"],
+                    ),
+                    use_container_width=True,
+                )
+
+        # 収支シミュレーション
+        with st.expander("🎲 収支シミュレーション", expanded=False):
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                sim_spins = st.number_input("通常回転数", min_value=1, value=3000, step=100)
+            with col2:
+                sim_rate = st.number_input("回転率（回/K）", min_value=1.0, value=18.0, step=0.5, format="%.1f")
+            with col3:
+                sim_trials = st.number_input("試行回数", min_value=1000, value=100000, step=10000)
+
+            def show_risk(summary, counts, edges):
+                """差玉分布の要約とヒストグラムを表示する"""
+                col_mean, col_lose = st.columns(2)
+                col_mean.metric("平均差玉", f"{summary['平均']:,.0f} 玉")
+                col_lose.metric("負ける確率", f"{summary['負ける確率']:.1%}")
+                st.dataframe(
+                    pd.DataFrame([{k: round(v) for k, v in summary.items() if k.endswith("点") or k == "標準偏差"}]),
+                    use_container_width=True, hide_index=True,
+                )
+                st.bar_chart(pd.DataFrame({"確率": counts / counts.sum()}, index=np.round(edges[:-1]).astype(int)))
+
+            col_mc, col_exact = st.columns(2)
+            run_mc = col_mc.button("シミュレーション実行")
+            run_exact = col_exact.button("厳密計算 (FFT)")
+            if run_mc or run_exact:
+                if first_dist is None or rush_dist is None:
+                    st.warning("ラウンド振り分けを入力してください")
+                elif rush_continue >= 100:
+                    st.warning("RUSH継続率は100%未満で入力してください")
+                elif run_mc:
+                    spec = SimulationSpec(
+                        prob_normal, rush_entry, rush_continue, count_num * attacker_ball,
+                        first_dist.rounds, first_dist.ratios,
+                        rush_dist.rounds, rush_dist.ratios,
+                        support_reduction=suport_par, n_spins=int(sim_spins), rotation_rate=sim_rate,
+                    )
+                    try:
+                        with st.spinner("シミュレーション中..."):
+                            net = simulate(spec, n_trials=int(sim_trials))
+                    except ValueError as e:
+                        st.warning(str(e))
+                    else:
+                        show_risk(summarize(net), *np.histogram(net, bins=50))
+                else:
+                    # 初当たり1回の総ラウンド数の分布を FFT で合成し、N回転分の差玉分布を求める
+                    try:
+                        first_hit = first_hit_rounds_pmf(
+                            first_dist.rounds, first_dist.ratios,
+                            rush_dist.rounds, rush_dist.ratios,
+                            rush_entry, rush_continue,
+                        )
+                    except ValueError as e:
+                        st.warning(str(e))
+                    else:
+                        dist = session_distribution(first_hit, prob_normal, int(sim_spins), count_num * attacker_ball,
+                                                    support_reduction=suport_par, rotation_rate=sim_rate)
+                        show_risk(dist.summary(), *np.histogram(dist.balls, bins=50, weights=dist.pmf))
             
     # === ページ2：ラウンド数の入力 ===       
     if st.session_state.page == "raund_select":
@@ -383,24 +543,6 @@ with tab1:
             st.session_state.edit_index = None # 不要なキーをリセット
             st.rerun()  
 
-    # ボーダーライン計算
-    if st.button("ボーダーラインを計算"):
-        #cal_lis = calculation_boder(rush_continue,A_count,B_count)
-        renchan = (1/(1-rush_continue/100))
-        st.write(f"平均連チャン数は→　{round(renchan,3)}")
-        st.write(f"初当たり(非突入)平均純増出玉→　{A_count}")
-        st.write(f"RUSH中継続時の平均純増出玉→　{B_count}")
-        dedamaHope = B_count*renchan
-        st.write(f"1度のRUSH突入で得られる平均純増出玉→　{round(dedamaHope,3)}")
-        new_lucky = A_count + dedamaHope
-        st.write(f"初当たり（Rush突入）平均純増出玉→　{round(new_lucky,3)}")
-        total_hope_ball = (A_count*0.41) + (new_lucky*0.59)
-        st.write(f"トータル純増期待出玉→　{round(total_hope_ball,2)}")
-        thousand_par_money = 1000 / exchange_money
-        st.write(f"千円当たりの出玉価値→　{round(thousand_par_money,2)}")
-        borderLine = (prob_normal * thousand_par_money) / total_hope_ball
-        st.write(f"ボーダーライン→　{round(borderLine,2)}")
-        #st.rerun()
 
 # =============================
 # 📊 タブ2：実践記録
@@ -426,11 +568,24 @@ with tab2:
         with st.expander("持ち玉あり", expanded=False):
             current_balls = st.number_input("現在の持ち玉数（玉）", min_value=0, step=50, key="current_balls_input")
 
+        # 期待値・仕事量の計算に使う機種（カタログに保存した機種から選ぶ）
+        col_spec, col_exchange = st.columns([2, 1])
+        with col_spec:
+            spec_name = st.selectbox("機種（期待値の計算用）", ["（なし）"] + CATALOG.names(), key="record_spec")
+        with col_exchange:
+            record_exchange = st.number_input("換金率（円/玉）", min_value=0.01, step=0.01, format="%.2f",
+                                              value=4.0 if machine_info["rate"] == "4円" else 1.0,
+                                              key=f"record_exchange_{machine_info['rate']}")
+
         if st.button("実践開始 ▶"):
             #現在時刻を取得
             now = datetime.now()
             machine_info["current_balls"] = int(current_balls)
             machine_info["total_invest"] = 0
+            # スペックから1回転あたりの期待出玉を一度だけ求めておき、合計は行の確定ごとに差分で更新する
+            spec = CATALOG.get(spec_name) if spec_name != "（なし）" else None
+            machine_info["spec"] = expected.link_spec(spec, record_exchange) if spec else None
+            machine_info.update(dict.fromkeys(expected.TOTAL_KEYS, 0))
             # 🎯 実践開始時刻を保存
             machine_info["start_time"] = now.strftime("%H:%M")
             st.session_state.page = "main"
@@ -441,35 +596,44 @@ with tab2:
         st.title("📊 PachiLog - 実践記録")
 
         info = st.session_state.machine_info
-        df = pd.DataFrame(st.session_state.records)
-
-        # === 集計系 ===
-        total_used_balls = df["使用玉数"].sum() if not df.empty else 0
-        total_invest = info.get("total_invest", 0)
-        current_balls = info.get("current_balls", 0)
-
-        # === 平均回転率 ===
-        if not df.empty and total_used_balls > 0:
-            total_rotations = df["通常回転"].sum()
-            rate_unit = 1000 if info.get("rate") == "1円" else 250
-            avg_rotation = total_rotations / total_used_balls * rate_unit
-        else:
-            avg_rotation = 0
+        with PROFILER.stage("dataframe"):
+            # === 集計系（行の確定ごとに差分で更新した合計を読むだけ） ===
+            total_used_balls = info.get("used_balls_total", 0)
+            total_invest = info.get("total_invest", 0)
+            current_balls = info.get("current_balls", 0)
+
+            # === 平均回転率 ===
+            if total_used_balls > 0:
+                avg_rotation = play.rotation_rate(info.get("total_spins", 0), total_used_balls, info.get("rate"))
+            else:
+                avg_rotation = 0
 
         # === メトリクス表示 ===
-        col1, col2, col3 = st.columns(3)
+        with PROFILER.stage("metrics"):
+            col1, col2, col3 = st.columns(3)
 
-        with col1:
-            st.metric("現金投資総額", f"{total_invest:,} 円")
-        with col2:
-            st.metric("現在持ち玉数", f"{current_balls:,} 玉")
-        with col3:
-            st.metric("平均回転率", f"{avg_rotation:.2f} 回/K")
+            with col1:
+                st.metric("現金投資総額", f"{total_invest:,} 円")
+            with col2:
+                st.metric("現在持ち玉数", f"{current_balls:,} 玉")
+            with col3:
+                st.metric("平均回転率", f"{avg_rotation:.2f} 回/K")
+
+            spec = info.get("spec")
+            if spec:
+                col1, col2, col3 = st.columns(3)
+                with col1:
+                    st.metric("期待値（単価）", f"{info.get('expected_value', 0):,.2f} 円/回転")
+                with col2:
+                    st.metric("仕事量", f"{info.get('work_value', 0):,.0f} 円")
+                with col3:
+                    st.metric("ボーダー", f"{spec['ボーダー']:.2f} 回/K",
+                              delta=f"{avg_rotation - spec['ボーダー']:+.2f}" if total_used_balls > 0 else None)
+                st.caption(f"機種: {spec['機種名']} / 換金率 {spec['換金率']:.2f} 円")
 
         # === 💰 投資ボタン ===
         if st.button("500円"):
-            selected_rate = info.get("rate", "4円")
-            added_balls = 125 if selected_rate == "4円" else 500
+            added_balls = play.balls_for_money(500, info.get("rate", "4円"))
 
             info["current_balls"] = current_balls + added_balls
             info["total_invest"] = total_invest + 500
@@ -488,37 +652,36 @@ with tab2:
                 st.rerun()
 
         # === 一覧表示 ===
-        if not df.empty:
-            header_cols = st.columns([2, 2, 2, 2, 2])
-            for col, title in zip(header_cols, ["時間", "使用玉数", "打ち始め", "打ち終わり", "回転率"]):
-                col.write(title)
-
-            for i, record in enumerate(st.session_state.records):
-                cols = st.columns([2, 2, 2, 2, 2])
-
-                cols[0].write(record["時間"])
-                cols[1].write(f"{record['使用玉数']:,} 玉")
-                cols[2].write(record["打ち始め"])
-                cols[3].write(record["打ち終わり"])
-                cols[4].write(f"{record['回転率']:.2f}")
+        if st.session_state.records:
+            # 表示するページの行だけウィジェットを作る
+            page = ui.pager("tab2_records", len(st.session_state.records))
+            with PROFILER.stage("table"):
+                header_cols = st.columns([2, 2, 2, 2, 2])
+                for col, title in zip(header_cols, ["時間", "使用玉数", "打ち始め", "打ち終わり", "回転率"]):
+                    col.write(title)
+
+                for record in list_page(st.session_state.records, page):
+                    cols = st.columns([2, 2, 2, 2, 2])
+
+                    cols[0].write(record["時間"])
+                    cols[1].write(f"{record['使用玉数']:,} 玉")
+                    cols[2].write(record["打ち始め"])
+                    cols[3].write(record["打ち終わり"])
+                    cols[4].write(f"{record['回転率']:.2f}")
         else:
             st.info("まだデータがありません。")
             
         st.divider()
             
         if st.button("🏁 実践終了"):
-            end_time = datetime.now()
-            start_time = datetime.strptime(st.session_state.machine_info["start_time"], "%H:%M")
-            elapsed = end_time - start_time
-
             # 実践時間（例: 3時間15分）
-            hours, remainder = divmod(elapsed.seconds, 3600)
-            minutes = remainder // 60
-            elapsed_str = f"{hours}時間{minutes}分"
+            elapsed_str = play.elapsed_str(st.session_state.machine_info["start_time"])
 
             # 集計データ作成
             record = {
                 "日付": datetime.now().strftime("%Y-%m-%d"),
+                "店名": st.session_state.machine_info.get("shop_name", ""),
+                "台番号": st.session_state.machine_info.get("table_number", 0),
                 "実践時間": elapsed_str,
                 "総回転数": st.session_state.machine_info.get("total_spins", 0),
                 "現金投資総額": st.session_state.machine_info.get("total_invest", 0),
@@ -528,10 +691,10 @@ with tab2:
                 "仕事量": st.session_state.machine_info.get("work_value", 0),
             }
 
-            # セッションに保存（一覧用）
-            if "records" not in st.session_state:
-                st.session_state["records"] = []
-            st.session_state["records"].append(record)
+            # アーカイブに保存（一覧用）し、このセッションの記録行はリセット
+            with PROFILER.stage("save_data"):
+                archive.append_session(record, ARCHIVE_DIR)
+            st.session_state["records"] = []
 
             st.success("✅ 実践結果を一覧に追加しました！")
             st.session_state.page = "select"  # ← ページ1の識別名に合わせて変更
@@ -575,9 +738,7 @@ with tab2:
         # === 確定処理 ===
         if st.button("✅ 確定"):
             normal_rot = max(end_rot - start_rot, 0)
-            selected_rate = info.get("rate", "4円")
-            rate_unit = 250 if selected_rate == "4円" else 1000
-            rotation_rate = (normal_rot / used_balls * rate_unit) if used_balls > 0 else 0
+            rotation_rate = play.rotation_rate(normal_rot, used_balls, info.get("rate", "4円"))
 
             now = datetime.now().strftime("%H:%M")
 
@@ -591,9 +752,13 @@ with tab2:
             }
 
             if is_edit:
+                old_record = st.session_state.records[st.session_state.edit_index]
                 st.session_state.records[st.session_state.edit_index] = new_record
             else:
+                old_record = None
                 st.session_state.records.append(new_record)
+            # ✅ 総回転数・仕事量・期待値をこの行の分だけ更新
+            expected.apply_row(info, new_record, old_record)
 
             # ✅ 現在持ち玉更新
             st.session_state.machine_info["current_balls"] = final_balls
@@ -614,10 +779,69 @@ with tab2:
 with tab3:
     st.header("📊 実践一覧")
 
-    if "records" not in st.session_state or len(st.session_state["records"]) == 0:
+    @st.cache_data(show_spinner=False)
+    def load_archive(base_dir, columns, date_from, date_to, shops, version):
+        """必要なカラム・期間・店舗だけをアーカイブから読み込む（version が変わるまで再利用）"""
+        return archive.scan(base_dir, columns=list(columns), date_from=date_from, date_to=date_to,
+                            shops=list(shops) or None)
+
+    with PROFILER.stage("load_data"):
+        archive_version = archive.version(ARCHIVE_DIR)
+    if not archive_version:
         st.info("まだ実践データがありません。")
     else:
-        df = pd.DataFrame(st.session_state["records"])
-        #df = df.sort_values(by="日付", ascending=True)
-        st.dataframe(df, use_container_width=True)
-
+        today = datetime.now().date()
+        col_date, col_shop = st.columns(2)
+        with col_date:
+            period = st.date_input("期間", value=(today.replace(day=1), today), key="history_period")
+        with col_shop:
+            shops = st.multiselect("店名", archive.list_shops(ARCHIVE_DIR), key="history_shops")
+        default_columns = ["日付", "店名", "台番号", "実践時間", "総回転数", "現金投資総額", "期待値", "仕事量"]
+        columns = st.multiselect("表示する項目", [c for c in archive.SCHEMA.names if c != "年月"],
+                                 default=default_columns, key="history_columns")
+
+        date_from = period[0].strftime("%Y-%m-%d") if len(period) > 0 else None
+        date_to = period[1].strftime("%Y-%m-%d") if len(period) > 1 else date_from
+        selected_columns = tuple(columns or default_columns)
+        with PROFILER.stage("load_data"):
+            table = load_archive(ARCHIVE_DIR, selected_columns, date_from, date_to, tuple(shops), archive_version)
+        if table.num_rows == 0:
+            st.info("条件に合う実践データがありません。")
+        else:
+            # 並べ替えとページの切り出しは Arrow の表のまま行い、表示する行だけをブラウザに送る
+            col_sort, col_order = st.columns([2, 1])
+            sort_by = col_sort.selectbox("並べ替え", table.column_names, key="history_sort",
+                                         index=table.column_names.index("日付") if "日付" in table.column_names else 0)
+            descending = col_order.radio("順序", ["降順", "昇順"], horizontal=True, key="history_order") == "降順"
+            page = ui.pager("history", table.num_rows)
+            with PROFILER.stage("table"):
+                st.dataframe(archive.sort_page(table, page.start, page.stop - page.start, sort_by, descending),
+                             use_container_width=True, hide_index=True)
+
+        # === エクスポート（表示中の条件で、アーカイブから少しずつ読みながら書き出す） ===
+        with st.expander("📤 エクスポート", expanded=False):
+            export_format = st.radio("形式", list(export.FORMATS), horizontal=True, key="history_export_format",
+                                     format_func={"csv": "CSV", "xlsx": "Excel", "parquet": "Parquet"}.get)
+            if st.button("ファイルを作成", key="history_export_build"):
+                try:
+                    # 小さいうちはメモリ上、大きくなったら一時ファイルに書き出す
+                    with tempfile.SpooledTemporaryFile(max_size=32 * 2**20) as f:
+                        # st.download_button はファイル全体をメモリに載せるため、DOWNLOAD_MAX_BYTES を上限にする
+                        rows = export.export(
+                            export.archive_batches(list(selected_columns), date_from, date_to, list(shops) or None,
+                                                   base_dir=ARCHIVE_DIR),
+                            export.archive_schema(list(selected_columns)), export_format,
+                            export.LimitedSink(f, DOWNLOAD_MAX_BYTES),
+                        )
+                        f.seek(0)
+                        # ファイルの中身は session_state に残さず、作成した実行でだけボタンに渡す
+                        # （ダウンロードしても再実行しないので、ボタンは次の操作まで表示される）
+                        mime, ext = export.FORMATS[export_format]
+                        st.download_button(f"⬇ ダウンロード（{rows:,} 行）", f.read(),
+                                           file_name=f"実践一覧_{date_from}_{date_to}{ext}", mime=mime,
+                                           on_click="ignore")
+                except ValueError as e:
+                    st.warning(str(e))
+
+# ====== 計測結果（計測モードのときだけサイドバーに表示） ======
+ui.profiling_panel(PROFILER)
@@ -0,0 +1,43 @@
+"""PachiLog のロジック部分（Streamlit に依存しない処理）をまとめたパッケージ
+
+Streamlit を起動せずにバッチ処理やベンチマークから使えるよう、画面描画は含めない。
+サブモジュールは最初に参照されたときに読み込み、pandas は DataFrame が必要な関数の中でだけ読み込む。
+
+    aggregates : 実践記録の合計・平均回転率の差分更新
+    archive    : 終了したセッションの Parquet アーカイブ
+    border     : ボーダーライン計算（NumPy によるベクトル化）
+    catalog    : 機種スペックのカタログと機種名の索引
+    events     : 実践中の操作の型付きイベントと状態への適用
+    expected   : 実践中の期待値・仕事量の差分更新
+    export     : 実践履歴の CSV / Excel / Parquet への書き出し
+    fileio     : ファイルの原子的な書き込みとロック
+    hits       : 大当たり台帳
+    importer   : CSV / Excel の実践記録の一括取り込み
+    journal    : スナップショット + 追記専用ジャーナルによる保存
+    markov     : 確変ループ / ST の吸収マルコフ連鎖モデル
+    paging     : 表のページ分割
+    payout     : 出玉分布の厳密計算（FFT）
+    persister  : 書き込みの遅延実行（バックグラウンドでまとめて書き込む）
+    play       : 投資・貸し玉・使用玉数・回転率の計算
+    profiling  : rerun ごとの処理時間の計測
+    rollups    : 店名・台番号・年月ごとの集計の差分更新
+    rotation   : 回転率の逐次統計・信頼区間・ボーダーの逐次検定
+    rounds     : ラウンド振り分けの型付き表現
+    simulate   : 収支のモンテカルロシミュレーション
+    store      : SQLite による全セッションの保存
+"""
+import importlib
+
+__all__ = [
+    "aggregates", "archive", "border", "catalog", "events", "expected", "export", "fileio", "hits", "importer",
+    "journal", "markov", "paging", "payout", "persister", "play", "profiling", "rollups", "rotation", "rounds",
+    "simulate", "store",
+]
+
+
+def __getattr__(name):
+    if name in __all__:
+        module = importlib.import_module(f".{name}", __name__)
+        globals()[name] = module
+        return module
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
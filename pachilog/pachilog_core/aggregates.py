@@ -0,0 +1,54 @@
+"""実践記録の集計値（合計・平均回転率）を machine_info に持ち、行の確定・編集ごとに差分で更新する"""
+from typing import Iterable, Optional
+
+# 記録行のキー → machine_info に保持する合計のキー
+TOTAL_KEYS = {
+    "使用玉数": "総使用玉数",
+    "通常回転": "総通常回転",
+    "獲得玉数": "総獲得玉数",
+}
+
+
+def rate_unit(rate: Optional[str]) -> int:
+    """回転率の基準玉数（4円: 250玉 = 千円、1円: 1000玉 = 千円）"""
+    return 1000 if rate == "1円" else 250
+
+
+def _num(value):
+    # pandas / numpy の集計値が混ざっても JSON に保存できるよう Python の数値にそろえる
+    value = value.item() if hasattr(value, "item") else value
+    return value or 0
+
+
+def apply_row(info: dict, new: dict, old: Optional[dict] = None) -> dict:
+    """1行の確定（old があれば編集）を合計に反映し、更新したキーと値を返す"""
+    changes = {}
+    for row_key, total_key in TOTAL_KEYS.items():
+        delta = _num(new.get(row_key, 0)) - (_num(old.get(row_key, 0)) if old else 0)
+        changes[total_key] = _num(info.get(total_key, 0)) + delta
+    if old is None:
+        changes["記録行数"] = info.get("記録行数", 0) + 1
+    info.update(changes)
+    return changes
+
+
+def rebuild(info: dict, records: Iterable[dict]) -> dict:
+    """記録行から合計を作り直す（合計を持たない古いデータの復元時に使う）"""
+    changes = {total_key: 0 for total_key in TOTAL_KEYS.values()}
+    changes["記録行数"] = 0
+    info.update(changes)
+    for record in records:
+        apply_row(info, record)
+    return {key: info[key] for key in changes}
+
+
+def has_totals(info: dict) -> bool:
+    return all(key in info for key in TOTAL_KEYS.values())
+
+
+def average_rotation(info: dict) -> float:
+    """平均回転率（回/K）"""
+    used = info.get("総使用玉数", 0)
+    if used <= 0:
+        return 0
+    return info.get("総通常回転", 0) / used * rate_unit(info.get("交換率"))
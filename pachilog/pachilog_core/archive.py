@@ -0,0 +1,255 @@
+"""終了したセッションの Parquet アーカイブ
+
+年月・店名でパーティション分割したデータセット（hive 形式）に1セッション1行で保存する。
+一覧表示では必要なカラムとパーティションだけを述語プッシュダウンで読み込む。
+
+ファイルは "." 始まりの一時ファイルに書いてから、ロック中に本来の名前へ置き換える（読み込みは "." 始まりを無視する）。
+コンパクションは置き換える元のファイルを目印ファイルに書いてから進め、途中で落ちても次の書き込み時に続きから完了させる。
+"""
+import json
+import os
+import uuid
+from functools import lru_cache
+from typing import Iterable, Iterator, List, Optional
+from urllib.parse import unquote
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from .fileio import atomic_write, file_lock, fsync_dir
+
+ARCHIVE_DIR = "pachilog_archive"
+PARTITION_COLS = ["年月", "店名"]
+# 1つのパーティション内のファイル数がこれを超えたら1ファイルにまとめる
+COMPACT_FILES = 32
+# コンパクション中の目印ファイルの拡張子（"." + まとめたファイル名 + これ。置き換える元のファイル名を持つ）
+REPLACES_SUFFIX = ".replaces"
+
+SCHEMA = pa.schema([
+    ("日付", pa.string()),
+    ("店名", pa.string()),
+    ("台番号", pa.int64()),
+    ("実践時間", pa.string()),
+    ("総回転数", pa.int64()),
+    ("現金投資総額", pa.int64()),
+    ("レート", pa.string()),
+    ("総使用持ち玉", pa.int64()),
+    ("期待値", pa.float64()),
+    ("仕事量", pa.float64()),
+    ("年月", pa.string()),
+])
+
+
+@lru_cache(maxsize=None)
+def _partitioning():
+    # pyarrow.dataset は読み込み時に pandas も読み込むため、使うときまで import しない
+    import pyarrow.dataset as ds
+
+    return ds.partitioning(pa.schema([(col, SCHEMA.field(col).type) for col in PARTITION_COLS]), flavor="hive")
+
+
+def _normalize(summary: dict) -> dict:
+    """1セッション分の集計データをスキーマに合わせて整える"""
+    row = {}
+    for field in SCHEMA:
+        value = summary.get(field.name)
+        if field.name == "年月":
+            value = str(summary.get("日付", ""))[:7]
+        elif value is None:
+            value = "" if pa.types.is_string(field.type) else 0
+        elif pa.types.is_string(field.type):
+            value = str(value)
+        elif pa.types.is_integer(field.type):
+            value = int(value)
+        else:
+            value = float(value)
+        row[field.name] = value
+    return row
+
+
+def _partition_dir(base_dir: str, row: dict) -> str:
+    import pyarrow.dataset as ds
+
+    # pyarrow の hive パーティションはパス要素を URL エンコードして書き出す
+    part_dir, _ = _partitioning().format((ds.field("年月") == row["年月"]) & (ds.field("店名") == row["店名"]))
+    return os.path.join(base_dir, part_dir)
+
+
+def _write_hidden(table: pa.Table, part_dir: str) -> str:
+    """"." 始まりの一時ファイルに書いて fsync し、本来のファイル名を返す"""
+    name = f"{uuid.uuid4().hex}-0.parquet"
+    tmp_path = os.path.join(part_dir, "." + name)
+    pq.write_table(table, tmp_path)
+    with open(tmp_path, "rb") as f:
+        os.fsync(f.fileno())
+    return name
+
+
+def _publish(part_dir: str, name: str) -> None:
+    os.replace(os.path.join(part_dir, "." + name), os.path.join(part_dir, name))
+    fsync_dir(os.path.join(part_dir, name))
+
+
+def _parts(part_dir: str) -> List[str]:
+    return [f for f in os.listdir(part_dir) if f.endswith(".parquet") and not f.startswith(".")]
+
+
+def append_sessions(summaries: Iterable[dict], base_dir: str = ARCHIVE_DIR) -> None:
+    """終了したセッションの集計データをアーカイブに追加する"""
+    rows = [_normalize(s) for s in summaries]
+    if not rows:
+        return
+    groups = {}
+    for row in rows:
+        groups.setdefault(_partition_dir(base_dir, row), []).append(row)
+    # パーティションの列はディレクトリ名で表すため、ファイルには書かない（write_to_dataset と同じ）
+    file_schema = pa.schema([field for field in SCHEMA if field.name not in PARTITION_COLS])
+    os.makedirs(base_dir, exist_ok=True)
+    # 書き込み・公開・コンパクション・目印の更新は、複数のプロセスが同時に行わないようロック中に行う
+    # （ロック中に残っている一時ファイルは、途中で落ちた書き込みのものだけになる）
+    with file_lock(os.path.join(base_dir, "_archive")):
+        _recover(base_dir)
+        for part_dir, part_rows in groups.items():
+            os.makedirs(part_dir, exist_ok=True)
+            _publish(part_dir, _write_hidden(pa.Table.from_pylist(part_rows, schema=file_schema), part_dir))
+        for part_dir in groups:
+            files = _parts(part_dir)
+            if len(files) > COMPACT_FILES:
+                _compact_partition(part_dir, files)
+        # 読み込み側のキャッシュを無効化するための目印
+        atomic_write(os.path.join(base_dir, "_version"), uuid.uuid4().hex)
+
+
+def append_session(summary: dict, base_dir: str = ARCHIVE_DIR) -> None:
+    append_sessions([summary], base_dir)
+
+
+def _compact_partition(part_dir: str, files: List[str]) -> None:
+    """パーティション内の小さなファイルを1つにまとめる（ロック中に呼ぶ）
+
+    まとめたファイルを書いてから、置き換える元のファイルを目印ファイルに記録し、
+    元のファイルを消してからまとめたファイルを公開する。同じセッションが二重に見える瞬間は無い。
+    """
+    table = pq.read_table([os.path.join(part_dir, f) for f in files])
+    name = _write_hidden(table, part_dir)
+    atomic_write(os.path.join(part_dir, "." + name + REPLACES_SUFFIX), json.dumps(files))
+    _finish_compaction(part_dir, name, files)
+
+
+def _finish_compaction(part_dir: str, name: str, files: List[str]) -> None:
+    for f in files:
+        path = os.path.join(part_dir, f)
+        if os.path.exists(path):
+            os.remove(path)
+    if os.path.exists(os.path.join(part_dir, "." + name)):
+        _publish(part_dir, name)
+    os.remove(os.path.join(part_dir, "." + name + REPLACES_SUFFIX))
+
+
+def _recover(base_dir: str) -> None:
+    """途中で落ちたコンパクションを完了させ、公開されなかった一時ファイルを消す（ロック中に呼ぶ）"""
+    if not os.path.isdir(base_dir):
+        return
+    for month_dir in os.scandir(base_dir):
+        if not (month_dir.is_dir() and month_dir.name.startswith("年月=")):
+            continue
+        for shop_dir in os.scandir(month_dir.path):
+            if not shop_dir.is_dir():
+                continue
+            hidden = [f for f in os.listdir(shop_dir.path) if f.startswith(".")]
+            # 目印ファイルがあれば、まとめたファイルは書き終わっている → 続きから完了させる
+            for marker in [f for f in hidden if f.endswith(REPLACES_SUFFIX)]:
+                with open(os.path.join(shop_dir.path, marker), encoding="utf-8") as f:
+                    files = json.load(f)
+                _finish_compaction(shop_dir.path, marker[1:-len(REPLACES_SUFFIX)], files)
+            # 目印の無い一時ファイルは、公開前に落ちた書き込みの残り
+            for f in hidden:
+                path = os.path.join(shop_dir.path, f)
+                if f.endswith((".parquet", ".tmp")) and os.path.exists(path):
+                    os.remove(path)
+
+
+def version(base_dir: str = ARCHIVE_DIR) -> str:
+    """アーカイブが更新されるたびに変わる値（キャッシュキー用）"""
+    try:
+        with open(os.path.join(base_dir, "_version")) as f:
+            return f.read()
+    except FileNotFoundError:
+        return ""
+
+
+def list_shops(base_dir: str = ARCHIVE_DIR) -> List[str]:
+    """アーカイブに存在する店名をパーティションのディレクトリ名から取得する"""
+    shops = set()
+    if not os.path.isdir(base_dir):
+        return []
+    for month_dir in os.scandir(base_dir):
+        if month_dir.is_dir() and month_dir.name.startswith("年月="):
+            for shop_dir in os.scandir(month_dir.path):
+                if shop_dir.is_dir() and shop_dir.name.startswith("店名="):
+                    shops.add(unquote(shop_dir.name[len("店名="):]))
+    return sorted(shops)
+
+
+def _dataset_filter(base_dir: str, date_from: Optional[str], date_to: Optional[str],
+                    shops: Optional[List[str]]):
+    """アーカイブのデータセットと、期間・店名の条件式を返す"""
+    import pyarrow.dataset as ds
+
+    dataset = ds.dataset(base_dir, format="parquet", schema=SCHEMA, partitioning=_partitioning(),
+                         exclude_invalid_files=False, ignore_prefixes=["_", "."])
+    date, month = ds.field("日付"), ds.field("年月")
+    conditions = []
+    if date_from:
+        # 年月の条件でパーティション単位の読み飛ばし、日付の条件で行の絞り込みを行う
+        conditions += [month >= date_from[:7], date >= date_from]
+    if date_to:
+        conditions += [month <= date_to[:7], date <= date_to]
+    if shops:
+        conditions.append(ds.field("店名").isin(shops))
+
+    expression = None
+    for cond in conditions:
+        expression = cond if expression is None else expression & cond
+    return dataset, expression
+
+
+def scan(base_dir: str = ARCHIVE_DIR, columns: Optional[List[str]] = None,
+         date_from: Optional[str] = None, date_to: Optional[str] = None,
+         shops: Optional[List[str]] = None) -> pa.Table:
+    """条件に合うセッションだけを読み込む（日付は 'YYYY-MM-DD' 形式の文字列）"""
+    if not os.path.isdir(base_dir):
+        return SCHEMA.empty_table().select(columns or SCHEMA.names)
+    dataset, expression = _dataset_filter(base_dir, date_from, date_to, shops)
+    return dataset.to_table(columns=columns, filter=expression)
+
+
+def scan_batches(base_dir: str = ARCHIVE_DIR, columns: Optional[List[str]] = None,
+                 date_from: Optional[str] = None, date_to: Optional[str] = None,
+                 shops: Optional[List[str]] = None, batch_size: int = 10_000) -> Iterator[pa.RecordBatch]:
+    """scan と同じ条件で、全件をまとめずに RecordBatch を順に返す（エクスポート用）"""
+    if not os.path.isdir(base_dir):
+        return
+    dataset, expression = _dataset_filter(base_dir, date_from, date_to, shops)
+    for batch in dataset.to_batches(columns=columns, filter=expression, batch_size=batch_size):
+        if batch.num_rows:
+            yield batch
+
+
+def sort_page(table: pa.Table, offset: int, limit: int, sort_by: Optional[str] = None,
+              descending: bool = False) -> pa.Table:
+    """並べ替えた表の offset 件目から limit 件だけを返す
+
+    全体を並べ替えず、上位 offset + limit 件だけを選んでから並べる（select_k）。
+    """
+    import pyarrow.compute as pc
+
+    if sort_by is None:
+        return table.slice(offset, limit)
+    k = min(offset + limit, table.num_rows)
+    if k == 0:
+        return table.slice(0, 0)
+    order = "descending" if descending else "ascending"
+    indices = pc.select_k_unstable(table, k=k, sort_keys=[(sort_by, order)])
+    top = table.take(indices).sort_by([(sort_by, order)])
+    return top.slice(offset, limit)
@@ -0,0 +1,133 @@
+"""ボーダーライン計算エンジン（NumPy によるベクトル化）
+
+複数機種のスペックを配列でまとめて渡すと、平均連チャン数・トータル純増期待出玉・
+ボーダーラインを1回の計算で全機種分求める。スカラーを渡せば1機種分の計算になる。
+
+割合（ラウンド振り分け）は 0.0～1.0、突入率・継続率・電サポ減算割合は％で指定する。
+ラウンド振り分けは (機種数, 振り分け数) の2次元配列で、振り分け数が揃わない場合は
+pad_distributions() で割合 0 の列を詰めて揃える。
+"""
+from typing import List, NamedTuple, Sequence, Tuple
+
+import numpy as np
+
+
+class BorderResult(NamedTuple):
+    renchan: np.ndarray          # 平均連チャン数
+    normal_payout: np.ndarray    # 初当たり(非突入)平均純増出玉
+    rush_payout: np.ndarray      # RUSH中継続時の平均純増出玉
+    rush_total: np.ndarray       # 1度のRUSH突入で得られる平均純増出玉
+    rush_first_hit: np.ndarray   # 初当たり（Rush突入）平均純増出玉
+    total_payout: np.ndarray     # トータル純増期待出玉
+    balls_per_1000: np.ndarray   # 千円当たりの出玉価値
+    border: np.ndarray           # ボーダーライン（千円あたり回転数）
+
+
+def pad_distributions(distributions: Sequence[Tuple[Sequence[float], Sequence[float]]]
+                      ) -> Tuple[np.ndarray, np.ndarray]:
+    """(ラウンド数の列, 割合の列) のリストを、割合 0 で埋めた2次元配列の組にする"""
+    width = max((len(rounds) for rounds, _ in distributions), default=0)
+    rounds_2d = np.zeros((len(distributions), width))
+    ratios_2d = np.zeros((len(distributions), width))
+    for i, (rounds, ratios) in enumerate(distributions):
+        rounds_2d[i, :len(rounds)] = rounds
+        ratios_2d[i, :len(ratios)] = ratios
+    return rounds_2d, ratios_2d
+
+
+def expected_payout(round_ball, rounds, ratios, support_col) -> np.ndarray:
+    """ラウンド振り分けから1回の大当たりの平均純増出玉を求める"""
+    rounds = np.atleast_2d(np.asarray(rounds, dtype=float))
+    ratios = np.atleast_2d(np.asarray(ratios, dtype=float))
+    per_round = (np.asarray(round_ball, dtype=float) * np.asarray(support_col, dtype=float))
+    return np.sum(rounds * ratios, axis=-1) * per_round
+
+
+def border_lines(prob_normal, rush_entry, rush_continue, count_num, attacker_ball,
+                 normal_rounds, normal_ratios, rush_rounds, rush_ratios,
+                 exchange_money=4, support_reduction=10) -> BorderResult:
+    """全機種分のボーダーラインと期待出玉を一括で計算する
+
+    normal_* は初当たり時、rush_* は RUSH 継続時のラウンド振り分け。
+    """
+    prob_normal = np.asarray(prob_normal, dtype=float)
+    entry = np.asarray(rush_entry, dtype=float) / 100
+    cont = np.asarray(rush_continue, dtype=float) / 100
+    round_ball = np.asarray(count_num, dtype=float) * np.asarray(attacker_ball, dtype=float)
+    support_col = (100 - np.asarray(support_reduction, dtype=float)) / 100
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # RUSH平均連チャン数
+        renchan = 1 / (1 - cont)
+        # 初当たり(非突入)平均純増出玉 / RUSH中継続時の平均純増出玉
+        normal_payout = expected_payout(round_ball, normal_rounds, normal_ratios, support_col)
+        rush_payout = expected_payout(round_ball, rush_rounds, rush_ratios, support_col)
+        # 1度のRUSH突入で得られる平均純増出玉
+        rush_total = rush_payout * renchan
+        # 初当たり（Rush突入）平均純増出玉
+        rush_first_hit = normal_payout + rush_total
+        # トータル純増期待出玉（非突入と突入を突入率で重み付け）
+        total_payout = normal_payout * (1 - entry) + rush_first_hit * entry
+        # 千円当たりの出玉価値
+        balls_per_1000 = 1000 / np.asarray(exchange_money, dtype=float)
+        # ボーダーライン
+        border = prob_normal * balls_per_1000 / total_payout
+
+    arrays = np.broadcast_arrays(renchan, normal_payout, rush_payout, rush_total,
+                                 rush_first_hit, total_payout, balls_per_1000, border)
+    return BorderResult(*(np.atleast_1d(a) for a in arrays))
+
+
+def border_table(specs: List[dict]):
+    """機種スペックの辞書のリストから、全機種のボーダーを DataFrame で返す（ラインナップ比較用）
+
+    各辞書のキーは border_lines() の引数名と同じ。ラウンド振り分けは
+    normal_rounds / normal_ratios / rush_rounds / rush_ratios に1次元の列で入れる。
+    """
+    import pandas as pd
+
+    normal_rounds, normal_ratios = pad_distributions([(s["normal_rounds"], s["normal_ratios"]) for s in specs])
+    rush_rounds, rush_ratios = pad_distributions([(s["rush_rounds"], s["rush_ratios"]) for s in specs])
+    defaults = {"exchange_money": 4, "support_reduction": 10}
+    scalar_keys = ["prob_normal", "rush_entry", "rush_continue", "count_num", "attacker_ball",
+                   "exchange_money", "support_reduction"]
+    scalars = {k: np.array([s.get(k, defaults.get(k)) for s in specs], dtype=float) for k in scalar_keys}
+    result = border_lines(normal_rounds=normal_rounds, normal_ratios=normal_ratios,
+                          rush_rounds=rush_rounds, rush_ratios=rush_ratios, **scalars)
+    frame = pd.DataFrame(result._asdict())
+    frame.insert(0, "機種名", [s.get("機種名", "") for s in specs])
+    return frame
+
+
+class SensitivityGrid(NamedTuple):
+    exchange_money: np.ndarray     # 換金率の軸 (E,)
+    support_reduction: np.ndarray  # 電サポ減算割合の軸 (S,)
+    rotation_rate: np.ndarray      # 回転率（千円あたり）の軸 (R,)
+    border: np.ndarray             # ボーダーライン (E, S)
+    unit_value: np.ndarray         # 単価（1回転あたりの期待値・円） (E, S, R)
+    hourly: np.ndarray             # 時給（円） (E, S, R)
+    work: np.ndarray               # 仕事量（円） (E, S, R)
+
+
+def sensitivity_grid(prob_normal, rush_entry, rush_continue, count_num, attacker_ball,
+                     normal_rounds, normal_ratios, rush_rounds, rush_ratios,
+                     exchange_money, support_reduction, rotation_rate,
+                     spins_per_hour=200, hours=1) -> SensitivityGrid:
+    """1機種について、換金率 × 電サポ減算割合 × 回転率の格子全体を1回のブロードキャストで計算する
+
+    単価は「1回転あたりの出玉の価値 − 1回転あたりの投資額」で、現金で打ったときの値。
+    時給は単価 × 1時間あたりの通常回転数、仕事量は時給 × 実践時間。
+    """
+    exchange = np.asarray(exchange_money, dtype=float)
+    support = np.asarray(support_reduction, dtype=float)
+    rate = np.asarray(rotation_rate, dtype=float)
+    # 換金率を 0 軸、電サポ減算を 1 軸に置き、border_lines() の中で (E, S, 1) に広げる
+    result = border_lines(prob_normal, rush_entry, rush_continue, count_num, attacker_ball,
+                          normal_rounds, normal_ratios, rush_rounds, rush_ratios,
+                          exchange_money=exchange[:, None, None], support_reduction=support[None, :, None])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # 回転率を 2 軸に置いて (E, S, R) にする
+        unit_value = (result.total_payout / float(prob_normal) * exchange[:, None, None]
+                      - 1000 / rate[None, None, :])
+    hourly = unit_value * spins_per_hour
+    return SensitivityGrid(exchange, support, rate, result.border[..., 0], unit_value, hourly, hourly * hours)
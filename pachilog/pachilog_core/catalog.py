@@ -0,0 +1,182 @@
+"""機種スペックのカタログ（機種名 → スペック・ラウンド振り分け・計算済みのボーダー）
+
+JSON ファイル1つに全機種を保存し、読み込んだ内容から機種名の索引をメモリ上に作る。
+入力途中の機種名は、正規化した名前のソート済みリストを二分探索して前方一致で探し、
+見つからなければ difflib で表記ゆれ（あいまい一致）を探す。
+
+ボーダーは保存するときに代表的な換金率の分を計算して一緒に持つため、読み込むだけで表示できる。
+保存するボーダーはタブ1のボーダーライン・期待値と同じ border_lines() の値だけにする。
+"""
+import bisect
+import difflib
+import json
+import os
+import unicodedata
+from typing import Dict, List, Optional, Tuple
+
+from .border import border_lines
+from .fileio import atomic_write, file_lock
+from .rounds import RoundDistribution
+
+CATALOG_FILE = "pachilog_specs.json"
+
+LOOP = "確変ループ"
+ST = "ST"
+# ラウンド振り分けの種類（raund_check() の prefix と同じ）
+DIST_KINDS = ("normal", "rush", "normal_rush")
+# 保存時にボーダーを計算しておく換金率（1玉あたりの円）
+EXCHANGE_RATES = (4.0, 3.57, 3.33, 3.0)
+
+# タブ1の入力欄の初期値（キーは border_lines() の引数名に揃える）
+DEFAULT_SPEC = {
+    "prob_normal": 319.7,
+    "prob_rush": 99.9,
+    "rush_entry": 50,
+    "rush_continue": 80,
+    "count_num": 10,
+    "attacker_ball": 10,
+    "mode": LOOP,
+    "support_reduction": 10,
+    "jitan_continue": 0.0,
+}
+
+
+def normalize(name: str) -> str:
+    """索引用の機種名（全角・半角、大文字・小文字、空白の違いを無視する）"""
+    return "".join(unicodedata.normalize("NFKC", str(name)).casefold().split())
+
+
+def _entries(entries) -> List[dict]:
+    return [{"ラウンド": int(e["ラウンド"]), "割合": float(e["割合"]), "ステータス": e.get("ステータス", "確変")}
+            for e in entries]
+
+
+def distributions(spec: dict) -> Optional[Tuple[RoundDistribution, RoundDistribution, list, list]]:
+    """計算に使う (初当たり時, RUSH継続時の確変行, 初当たり時の全行, RUSH時の全行)。振り分けが無ければ None"""
+    dists = spec.get("distributions", {})
+    if spec.get("mode") == ST:
+        if not dists.get("normal") or not dists.get("rush"):
+            return None
+        first = RoundDistribution.from_entries(dists["normal"])
+        rush = RoundDistribution.from_entries(dists["rush"])
+    else:
+        if not dists.get("normal_rush"):
+            return None
+        first = rush = RoundDistribution.from_entries(dists["normal_rush"])
+    return first, rush.kakuhen_only(), first.rows(), rush.rows()
+
+
+def compute_borders(spec: dict) -> List[dict]:
+    """EXCHANGE_RATES の換金率ごとのボーダー（全換金率を1回のベクトル計算で求める）"""
+    dists = distributions(spec)
+    if dists is None:
+        return []
+    first, rush, _, _ = dists
+    rates = list(EXCHANGE_RATES)
+    result = border_lines(
+        spec["prob_normal"], spec["rush_entry"], spec["rush_continue"], spec["count_num"], spec["attacker_ball"],
+        first.rounds, first.ratios, rush.rounds, rush.ratios,
+        exchange_money=rates, support_reduction=spec["support_reduction"],
+    )
+    return [{"換金率": rate, "ボーダー": round(value, 2)} for rate, value in zip(rates, result.border.tolist())]
+
+
+class SpecCatalog:
+    """機種スペックのカタログと、その機種名の索引"""
+
+    def __init__(self, path: str = CATALOG_FILE):
+        self.path = path
+        self._specs: Dict[str, dict] = {}
+        self._keys: List[str] = []  # 正規化した機種名（ソート済み）
+        self._names: Dict[str, str] = {}  # 正規化した機種名 → 機種名
+        self._stamp = None
+        self.refresh()
+
+    def _read(self) -> Dict[str, dict]:
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def _index(self, specs: Dict[str, dict]) -> None:
+        self._specs = specs
+        self._names = {normalize(name): name for name in specs}
+        self._keys = sorted(self._names)
+
+    def _file_stamp(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def refresh(self) -> None:
+        """ファイルが（別のプロセスなどで）更新されていれば読み直す"""
+        stamp = self._file_stamp()
+        if stamp != self._stamp:
+            self._index(self._read())
+            self._stamp = stamp
+
+    def __len__(self) -> int:
+        return len(self._specs)
+
+    def names(self) -> List[str]:
+        return [self._names[key] for key in self._keys]
+
+    def get(self, name: str) -> Optional[dict]:
+        """機種名で1件取り出す（表記ゆれは normalize() で吸収する）"""
+        full_name = self._names.get(normalize(name))
+        return self._specs[full_name] if full_name else None
+
+    def search(self, query: str, limit: int = 5) -> List[str]:
+        """前方一致する機種名を辞書順に返し、足りなければあいまい一致で補う"""
+        key = normalize(query)
+        if not key:
+            return []
+        start = bisect.bisect_left(self._keys, key)
+        matches = []
+        for candidate in self._keys[start:start + limit]:
+            if not candidate.startswith(key):
+                break
+            matches.append(candidate)
+        if len(matches) < limit:
+            for candidate in difflib.get_close_matches(key, self._keys, n=limit, cutoff=0.5):
+                if candidate not in matches and len(matches) < limit:
+                    matches.append(candidate)
+        return [self._names[candidate] for candidate in matches]
+
+    def save(self, name: str, spec: dict) -> dict:
+        """スペックを保存し（同じ機種名は上書き）、ボーダーを計算して付けたものを返す
+
+        spec のキーは DEFAULT_SPEC と distributions（DIST_KINDS → raund_check() の入力行）。
+        """
+        name = name.strip()
+        if not name:
+            raise ValueError("機種名を入力してください")
+        saved = {"機種名": name}
+        saved.update({key: spec.get(key, default) for key, default in DEFAULT_SPEC.items()})
+        dists = spec.get("distributions", {})
+        saved["distributions"] = {kind: _entries(dists[kind]) for kind in DIST_KINDS if dists.get(kind)}
+        saved["borders"] = compute_borders(saved)
+        # 別のプロセスが保存した機種を消さないよう、ロック中にファイルを読み直してから書き込む
+        with file_lock(self.path):
+            specs = self._read()
+            old_name = self._names.get(normalize(name))
+            if old_name is not None:
+                specs.pop(old_name, None)
+            specs[name] = saved
+            atomic_write(self.path, json.dumps(specs, ensure_ascii=False, indent=1))
+            self._index(specs)
+            self._stamp = self._file_stamp()
+        return saved
+
+    def delete(self, name: str) -> None:
+        """機種を削除する"""
+        with file_lock(self.path):
+            specs = self._read()
+            full_name = self._names.get(normalize(name), name)
+            if specs.pop(full_name, None) is not None:
+                atomic_write(self.path, json.dumps(specs, ensure_ascii=False, indent=1))
+            self._index(specs)
+            self._stamp = self._file_stamp()
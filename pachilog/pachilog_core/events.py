@@ -0,0 +1,144 @@
+"""実践中の操作を表す型付きイベントと、それを状態に適用するリデューサー
+
+画面の操作（投資・貸し玉・行入力・大当たり・行確定など）は1件のイベントとして保存し、
+状態は「最後のスナップショット + それ以降のイベント」を apply() で順に適用して復元する。
+入力途中の行（下書き）もイベントで組み立てるため、再接続しても貸し玉や大当たりの途中から再開できる。
+
+状態の形は Journal / SessionStore と同じ:
+    {"records": [...], "machine_info": {...}, "is_active": bool, "draft": None か 下書き}
+
+records は list のほか、len / [] / append を持つオブジェクト（SessionStore の行の読み書き）でもよい。
+下書きの大当たりは HitLedger で持ち、保存するときは dump_draft / load_draft で JSON の形と行き来する。
+"""
+from typing import Optional
+
+from . import aggregates, play, rotation
+from .hits import HitLedger
+
+INVEST = "投資"
+LEND = "貸し玉"
+ROW_START = "行入力開始"
+DRAFT = "下書き"
+HIT = "大当たり"
+ROW_COMMIT = "行確定"
+ROW_CANCEL = "行入力取消"
+TYPES = frozenset([INVEST, LEND, ROW_START, DRAFT, HIT, ROW_COMMIT, ROW_CANCEL])
+
+# 下書きのうち、入力欄で直接変更できる項目
+DRAFT_FIELDS = ("持ち玉", "打ち始め", "打ち終わり")
+
+
+# --- イベントの作成 ---
+
+def invest(amount: int) -> dict:
+    return {"op": INVEST, "amount": int(amount)}
+
+
+def lend() -> dict:
+    return {"op": LEND}
+
+
+def start_row(index: Optional[int] = None) -> dict:
+    """行の入力を始める（index があればその行の編集）"""
+    return {"op": ROW_START, "index": index}
+
+
+def draft(**values) -> dict:
+    """下書きの入力欄（持ち玉・打ち始め・打ち終わり）の変更"""
+    return {"op": DRAFT, "values": {k: int(v) for k, v in values.items() if k in DRAFT_FIELDS}}
+
+
+def hit(rounds: int, payout: int) -> dict:
+    return {"op": HIT, "rounds": int(rounds), "payout": int(payout)}
+
+
+def commit_row(time: str) -> dict:
+    """下書きを記録行として確定する（time は新しい行の時刻。編集では元の時刻を残す）"""
+    return {"op": ROW_COMMIT, "time": time}
+
+
+def cancel_row() -> dict:
+    return {"op": ROW_CANCEL}
+
+
+# --- 適用 ---
+
+def new_draft(state: dict, index: Optional[int] = None) -> dict:
+    """行入力の下書き（行開始時の持ち玉・入力欄・この行で借りた玉・大当たり）"""
+    balls = int(state["machine_info"].get("持ち玉", 0))
+    record = state["records"][index] if index is not None else None
+    return {
+        "index": index,
+        "行開始持ち玉": balls,
+        "持ち玉": balls,
+        "打ち始め": record["打ち始め"] if record else 0,
+        "打ち終わり": record["打ち終わり"] if record else 0,
+        "貸し玉": 0,
+        "大当たり": HitLedger(),
+    }
+
+
+def dump_draft(draft: Optional[dict]) -> Optional[dict]:
+    """下書きを JSON にできる形にする（大当たりは [[ラウンド, 獲得出玉], ...]）"""
+    if draft is None:
+        return None
+    return dict(draft, 大当たり=draft["大当たり"].entries())
+
+
+def load_draft(data: Optional[dict]) -> Optional[dict]:
+    """保存した下書きの大当たりを HitLedger に戻す（合計は台帳が持つので、古い形式の合計の項目は捨てる）"""
+    if data is None:
+        return None
+    draft = {k: v for k, v in data.items() if k not in ("総ラウンド", "総出玉")}
+    draft["大当たり"] = HitLedger.from_entries(data.get("大当たり", []))
+    return draft
+
+
+def used_balls(draft: dict) -> int:
+    return play.used_balls(draft["行開始持ち玉"], draft["貸し玉"], draft["持ち玉"])
+
+
+def build_record(state: dict, time: str) -> dict:
+    """下書きから記録行を作る"""
+    draft = state["draft"]
+    hits = draft["大当たり"]
+    return play.build_record(
+        time, used_balls(draft), draft["打ち始め"], draft["打ち終わり"], hits.total_payout,
+        hits.total_round, hits.payout_per_round, state["machine_info"].get("交換率", "4円"),
+    )
+
+
+def apply(state: dict, event: dict) -> dict:
+    """1件の型付きイベントを状態に適用する（合計・統計量の更新は O(1)）"""
+    op = event.get("op")
+    info = state["machine_info"]
+    draft = state.get("draft")
+    if op == INVEST:
+        play.invest(info, event["amount"])
+    elif op == LEND:
+        # 残金が足りないときのボタンは押せないが、古いイベントを再生しても状態が壊れないよう確かめる
+        if play.can_lend(info):
+            _, balls = play.lend(info)
+            if draft is not None:
+                draft["貸し玉"] += balls
+    elif op == ROW_START:
+        state["draft"] = new_draft(state, event.get("index"))
+    elif op == DRAFT and draft is not None:
+        draft.update(event.get("values", {}))
+    elif op == HIT and draft is not None:
+        draft["大当たり"].add(event["rounds"], event["payout"])
+    elif op == ROW_COMMIT and draft is not None:
+        index = draft["index"]
+        old = state["records"][index] if index is not None else None
+        record = build_record(state, old["時間"] if old else event["time"])
+        if old is not None:
+            state["records"][index] = record
+        else:
+            state["records"].append(record)
+        aggregates.apply_row(info, record, old)
+        rotation.apply_row(info, record, old)
+        info["持ち玉"] = draft["持ち玉"] + draft["大当たり"].total_payout
+        state["draft"] = None
+    elif op == ROW_CANCEL:
+        state["draft"] = None
+    return state
@@ -0,0 +1,63 @@
+"""実践中の期待値・仕事量を machine_info に持ち、行の確定ごとに差分で更新する（pachilog_app.py のタブ2用）
+
+機種スペックから「通常1回転あたりの期待出玉」を実践開始時に一度だけ求めておき、
+行を確定するたびにその行の通常回転と使用玉数の分だけ仕事量を足す。記録行全体は読み直さない。
+
+    1行の期待収支（円） = 通常回転 × 1回転あたりの期待出玉 × 換金率 − 使用玉数 × 貸し玉料金
+    仕事量 = 1行の期待収支の合計、期待値（単価） = 仕事量 / 総回転数
+
+回転率がボーダーちょうどのとき1行の期待収支は 0 になる（border.border_lines() と同じ定義）。
+"""
+from typing import Optional
+
+from .border import border_lines
+from .catalog import distributions
+from .play import LEND_PRICE
+
+# machine_info に保持する合計のキー（実践終了時にアーカイブへ書き出す値）
+TOTAL_KEYS = ("total_spins", "used_balls_total", "work_value", "expected_value")
+
+
+def link_spec(spec: dict, exchange_money: float) -> Optional[dict]:
+    """カタログの機種スペックから、期待値の計算に使う値だけを取り出す（振り分けが無ければ None）"""
+    dists = distributions(spec)
+    if dists is None:
+        return None
+    first, rush, _, _ = dists
+    result = border_lines(
+        spec["prob_normal"], spec["rush_entry"], spec["rush_continue"], spec["count_num"], spec["attacker_ball"],
+        first.rounds, first.ratios, rush.rounds, rush.ratios,
+        exchange_money=exchange_money, support_reduction=spec["support_reduction"],
+    )
+    return {
+        "機種名": spec["機種名"],
+        "換金率": float(exchange_money),
+        "ボーダー": float(result.border[0]),
+        # 初当たり1回の期待出玉（トータル純増期待出玉）と、それを通常時の確率で割った1回転あたりの期待出玉
+        "初当たり出玉": float(result.total_payout[0]),
+        "回転あたり出玉": float(result.total_payout[0]) / float(spec["prob_normal"]),
+    }
+
+
+def row_value(link: dict, record: dict, rate: Optional[str]) -> float:
+    """1行の期待収支（円）"""
+    spins = record.get("通常回転", 0)
+    used = record.get("使用玉数", 0)
+    return spins * link["回転あたり出玉"] * link["換金率"] - used * LEND_PRICE.get(rate, 4)
+
+
+def apply_row(info: dict, new: dict, old: Optional[dict] = None) -> dict:
+    """1行の確定（old があれば編集）を総回転数・総使用玉数・仕事量に反映し、更新したキーと値を返す"""
+    changes = {
+        "total_spins": info.get("total_spins", 0) + new.get("通常回転", 0) - (old.get("通常回転", 0) if old else 0),
+        "used_balls_total": info.get("used_balls_total", 0) + new.get("使用玉数", 0)
+                            - (old.get("使用玉数", 0) if old else 0),
+    }
+    link = info.get("spec")
+    work = info.get("work_value", 0.0)
+    if link:
+        work += row_value(link, new, info.get("rate")) - (row_value(link, old, info.get("rate")) if old else 0.0)
+    changes["work_value"] = work
+    changes["expected_value"] = work / changes["total_spins"] if changes["total_spins"] else 0.0
+    info.update(changes)
+    return changes
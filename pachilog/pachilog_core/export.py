@@ -0,0 +1,176 @@
+"""実践履歴のエクスポート（CSV / Excel / Parquet）
+
+アーカイブ（Parquet）か SessionStore（SQLite）から RecordBatch を少しずつ読み、
+そのまま書き出し先に追記する。履歴全体を1つの DataFrame にまとめることはない。
+
+    python -m pachilog_core.export 実践一覧.xlsx                       # pachilog/ ディレクトリから実行
+    python -m pachilog_core.export 記録.parquet --source db --from 2024-01-01
+"""
+import argparse
+import codecs
+import io
+from typing import BinaryIO, Iterable, Iterator, List, Optional, Union
+
+import pyarrow as pa
+
+from . import archive
+from .fileio import safe_name
+from .store import SessionStore
+
+# 形式 → (MIME タイプ, 拡張子)
+FORMATS = {
+    "csv": ("text/csv", ".csv"),
+    "xlsx": ("application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", ".xlsx"),
+    "parquet": ("application/vnd.apache.parquet", ".parquet"),
+}
+BATCH_ROWS = 10_000
+# Excel の1シートの行数の上限（見出し行を含む）
+XLSX_MAX_ROWS = 1_048_576
+
+# SessionStore の記録行の型（バッチごとの型推論で列の型がぶれないよう固定する）
+HISTORY_SCHEMA = pa.schema([
+    ("日付", pa.string()), ("店名", pa.string()), ("台番号", pa.int64()), ("交換率", pa.string()),
+    ("時間", pa.string()), ("使用玉数", pa.int64()), ("打ち始め", pa.int64()), ("打ち終わり", pa.int64()),
+    ("通常回転", pa.int64()), ("回転率", pa.float64()), ("獲得玉数", pa.float64()),
+    ("ラウンド数", pa.float64()), ("1Rあたり獲得出玉", pa.float64()),
+])
+
+
+# --- 読み込み元 ---
+
+def archive_schema(columns: Optional[List[str]] = None) -> pa.Schema:
+    names = columns or [name for name in archive.SCHEMA.names if name != "年月"]
+    return pa.schema([archive.SCHEMA.field(name) for name in names])
+
+
+def archive_batches(columns: Optional[List[str]] = None, date_from: Optional[str] = None,
+                    date_to: Optional[str] = None, shops: Optional[List[str]] = None,
+                    base_dir: str = archive.ARCHIVE_DIR, batch_size: int = BATCH_ROWS) -> Iterator[pa.RecordBatch]:
+    """アーカイブ（1セッション1行）を条件で絞り込んで順に返す"""
+    return archive.scan_batches(base_dir, archive_schema(columns).names, date_from, date_to, shops, batch_size)
+
+
+def store_batches(store: SessionStore, date_from: Optional[str] = None, date_to: Optional[str] = None,
+                  shop: Union[str, List[str], None] = None, machine_no: Optional[int] = None,
+                  batch_size: int = BATCH_ROWS) -> Iterator[pa.RecordBatch]:
+    """SessionStore の全記録行（セッションの日付・店名・台番号付き）を順に返す（shop はリストで複数指定可）"""
+    for rows in store.iter_history(date_from, date_to, shop, machine_no, batch_size):
+        columns = list(zip(*rows))
+        yield pa.RecordBatch.from_arrays(
+            [pa.array(values, type=field.type) for values, field in zip(columns, HISTORY_SCHEMA)],
+            schema=HISTORY_SCHEMA,
+        )
+
+
+# --- 書き出し ---
+
+def write_csv(batches: Iterable[pa.RecordBatch], schema: pa.Schema, sink: BinaryIO) -> int:
+    import pyarrow.csv as pacsv
+
+    # Excel で開いても文字化けしないよう BOM 付きの UTF-8 にする
+    sink.write(codecs.BOM_UTF8)
+    rows = 0
+    with pacsv.CSVWriter(sink, schema) as writer:
+        for batch in batches:
+            writer.write_batch(batch)
+            rows += batch.num_rows
+    return rows
+
+
+def write_xlsx(batches: Iterable[pa.RecordBatch], schema: pa.Schema, sink: BinaryIO) -> int:
+    import openpyxl
+
+    # write_only モードでは書いた行を一時ファイルに流すため、シート全体をメモリに持たない
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet("実践一覧")
+    sheet.append(schema.names)
+    rows = 0
+    for batch in batches:
+        rows += batch.num_rows
+        if rows + 1 > XLSX_MAX_ROWS:
+            raise ValueError(f"Excel の行数の上限（{XLSX_MAX_ROWS:,} 行）を超えます。CSV か Parquet で出力してください")
+        for row in zip(*(column.to_pylist() for column in batch.columns)):
+            sheet.append(row)
+    workbook.save(sink)
+    return rows
+
+
+def write_parquet(batches: Iterable[pa.RecordBatch], schema: pa.Schema, sink: BinaryIO) -> int:
+    import pyarrow.parquet as pq
+
+    rows = 0
+    with pq.ParquetWriter(sink, schema) as writer:
+        for batch in batches:
+            writer.write_batch(batch)
+            rows += batch.num_rows
+    return rows
+
+
+WRITERS = {"csv": write_csv, "xlsx": write_xlsx, "parquet": write_parquet}
+
+
+class LimitedSink(io.RawIOBase):
+    """書き込んだバイト数が max_bytes を超えたら ValueError を出す書き出し先（sink に書き込む）
+
+    画面からのダウンロードはファイル全体をメモリに載せるため、その大きさの上限に使う。
+    """
+
+    def __init__(self, sink: BinaryIO, max_bytes: int):
+        self._sink = sink
+        self.max_bytes = max_bytes
+        self.written = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        size = memoryview(data).nbytes
+        if self.written + size > self.max_bytes:
+            raise ValueError(f"ファイルが {self.max_bytes / 2**20:,.0f} MB を超えます。"
+                             "条件を絞るか、コマンド（python -m pachilog_core.export）で書き出してください")
+        self._sink.write(data)
+        self.written += size
+        return size
+
+    def flush(self) -> None:
+        self._sink.flush()
+
+
+def export(batches: Iterable[pa.RecordBatch], schema: pa.Schema, fmt: str, sink: BinaryIO) -> int:
+    """RecordBatch を fmt 形式で sink（バイナリのファイルオブジェクト）に書き出し、行数を返す"""
+    if fmt not in WRITERS:
+        raise ValueError(f"未対応の形式です: {fmt}")
+    return WRITERS[fmt](batches, schema, sink)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="実践履歴を CSV / Excel / Parquet に書き出す")
+    parser.add_argument("out", help="出力ファイル（拡張子 .csv / .xlsx / .parquet で形式を決める）")
+    parser.add_argument("--source", choices=["archive", "db"], default="archive",
+                        help="archive: 実践一覧（1セッション1行） / db: SQLite の全記録行")
+    parser.add_argument("--from", dest="date_from", help="期間の開始日（YYYY-MM-DD）")
+    parser.add_argument("--to", dest="date_to", help="期間の終了日（YYYY-MM-DD）")
+    parser.add_argument("--shop", action="append", help="店名（複数指定可）")
+    parser.add_argument("--archive-dir", default=archive.ARCHIVE_DIR)
+    parser.add_argument("--db", default="pachilog.db")
+    parser.add_argument("--player", default="", help="プレイヤー名（アプリの ?player= と同じ値）")
+    args = parser.parse_args(argv)
+
+    fmt = next((name for name, (_, ext) in FORMATS.items() if args.out.lower().endswith(ext)), None)
+    if fmt is None:
+        parser.error("出力ファイルの拡張子は .csv / .xlsx / .parquet のいずれかにしてください")
+    if args.source == "archive":
+        schema = archive_schema()
+        batches = archive_batches(date_from=args.date_from, date_to=args.date_to, shops=args.shop,
+                                  base_dir=args.archive_dir)
+    else:
+        schema = HISTORY_SCHEMA
+        batches = store_batches(SessionStore(args.db, safe_name(args.player)), args.date_from, args.date_to,
+                                args.shop)
+    with open(args.out, "wb") as f:
+        rows = export(batches, schema, fmt, f)
+    print(f"{args.out}: {rows} 行を書き出しました")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""ファイルの原子的な書き込みとプロセス間ロック
+
+保存ファイルを 'w' で開いて上書きすると、書き込み途中で落ちたときに唯一のコピーが壊れる。
+ここでは同じディレクトリの一時ファイルに書いてから os.replace で置き換え、
+複数のタブ・プロセスからの書き込みは <ファイル名>.lock のロックで直列化する。
+"""
+import os
+import re
+import tempfile
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# プレイヤー名（URL のクエリパラメータなど）をファイル名に使うときに残す文字
+_UNSAFE = re.compile(r"[^\w\-]")
+MAX_NAME = 64
+
+
+def safe_name(name: str) -> str:
+    """ファイル名・パスに使えない文字を '_' に置き換える（空なら空文字）"""
+    return _UNSAFE.sub("_", str(name).strip())[:MAX_NAME]
+
+
+def fsync_dir(path: str) -> None:
+    # rename をディスクに残すにはディレクトリも fsync する（Windows では不要・不可）
+    if fcntl is None:
+        return
+    fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def atomic_write(path: str, data, encoding: str = "utf-8") -> None:
+    """一時ファイルに書いて fsync し、os.replace で path と置き換える
+
+    読み手からは常に「前の内容」か「新しい内容」のどちらかが見え、途中の状態は見えない。
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix="." + os.path.basename(path) + ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data.encode(encoding) if isinstance(data, str) else data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    fsync_dir(path)
+
+
+@contextmanager
+def file_lock(path: str):
+    """path に対応する <path>.lock を排他ロックする（同じプロセスの別スレッドにも効く）"""
+    lock_path = path + ".lock"
+    with open(lock_path, "a+b") as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def keyed_path(path: str, key: str) -> str:
+    """プレイヤーごとのファイル・ディレクトリ名（key が空なら path のまま）
+
+        keyed_path("pachilog_data.json", "taro") -> "pachilog_data_taro.json"
+    """
+    key = safe_name(key)
+    if not key:
+        return path
+    root, ext = os.path.splitext(path)
+    return f"{root}_{key}{ext}"
@@ -0,0 +1,57 @@
+"""1行分の大当たり記録（ラウンド数・獲得出玉）を保持する台帳
+
+行入力の下書き（events.new_draft）の "大当たり" に入る。保存するときは [[ラウンド, 獲得出玉], ...] の
+リストにし（entries）、読み込むときに from_entries で台帳に戻す。
+"""
+from array import array
+from typing import Iterable, List, Sequence, Tuple
+
+
+class HitLedger:
+    """固定スキーマの配列で大当たりを保持し、合計を追加のたびに更新する"""
+
+    __slots__ = ("_rounds", "_payouts", "total_round", "total_payout")
+
+    def __init__(self):
+        self._rounds = array("q")
+        self._payouts = array("q")
+        self.total_round = 0
+        self.total_payout = 0
+
+    @classmethod
+    def from_entries(cls, entries: Iterable[Sequence[int]]) -> "HitLedger":
+        """保存した [[ラウンド, 獲得出玉], ...] から台帳を作る"""
+        ledger = cls()
+        for rounds, payout in entries:
+            ledger.add(rounds, payout)
+        return ledger
+
+    def add(self, rounds: int, payout: int) -> None:
+        rounds, payout = int(rounds), int(payout)
+        self._rounds.append(rounds)
+        self._payouts.append(payout)
+        self.total_round += rounds
+        self.total_payout += payout
+
+    def __len__(self) -> int:
+        return len(self._rounds)
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, HitLedger):
+            return NotImplemented
+        return self._rounds == other._rounds and self._payouts == other._payouts
+
+    @property
+    def payout_per_round(self) -> float:
+        """1Rあたりの獲得出玉"""
+        return self.total_payout / self.total_round if self.total_round > 0 else 0
+
+    def entries(self) -> List[Tuple[int, int]]:
+        return list(zip(self._rounds, self._payouts))
+
+    def __repr__(self) -> str:
+        return f"HitLedger({self.entries()!r})"
+
+    def columns(self) -> dict:
+        """表示用の表（列名 → 値のリスト）"""
+        return {"ラウンド": self._rounds.tolist(), "獲得出玉": self._payouts.tolist()}
@@ -0,0 +1,212 @@
+"""過去の実践記録（CSV / Excel）の一括取り込み
+
+ファイルを1行ずつ読み、列名を記録行のキーにそろえて SessionStore に書き込む。
+CSV は csv モジュールで、.xlsx は openpyxl の read_only モードで読むため、
+何十万行のファイルでもメモリに載るのは書き込み待ちの1チャンク分だけになる。
+
+日付・店名・台番号・交換率の列があれば、その値が変わるところでセッションを区切る。
+列が無い場合は defaults（CLI では --date / --shop など）の値を使う。
+
+    python -m pachilog_core.importer 記録.xlsx --db pachilog.db --shop ○○店   # pachilog/ ディレクトリから実行
+"""
+import argparse
+import codecs
+import csv
+import io
+import os
+from datetime import date as date_type, datetime, time as time_type
+from itertools import chain, groupby
+from typing import Iterator, List, NamedTuple, Optional, Sequence
+
+from .play import build_record
+from .fileio import safe_name
+from .store import IMPORT_CHUNK_ROWS, SessionStore
+
+# セッションを区切るキー
+SESSION_KEYS = ["日付", "店名", "台番号", "交換率"]
+# 取り込みに必須の記録行のキー
+REQUIRED_KEYS = ["使用玉数", "打ち始め", "打ち終わり"]
+
+# 表計算ソフト側の列名 → 記録行・セッションのキー（空白を除いて比較する）
+COLUMN_ALIASES = {
+    "時間": "時間", "時刻": "時間", "記録時間": "時間",
+    "使用玉数": "使用玉数", "使用玉": "使用玉数", "使用球数": "使用玉数",
+    "打ち始め": "打ち始め", "打ち始め回転数": "打ち始め", "開始回転": "打ち始め", "開始回転数": "打ち始め",
+    "打ち終わり": "打ち終わり", "打ち終わり回転数": "打ち終わり", "終了回転": "打ち終わり", "終了回転数": "打ち終わり",
+    "獲得玉数": "獲得玉数", "獲得出玉": "獲得玉数", "獲得玉": "獲得玉数", "出玉": "獲得玉数",
+    "ラウンド数": "ラウンド数", "ラウンド": "ラウンド数", "R数": "ラウンド数", "R": "ラウンド数",
+    "日付": "日付", "実践日": "日付",
+    "店名": "店名", "店舗": "店名", "ホール": "店名",
+    "台番号": "台番号", "台番": "台番号",
+    "交換率": "交換率", "レート": "交換率",
+}
+
+CSV_ENCODINGS = ("utf-8-sig", "cp932")
+# 文字コードの判定に使う先頭部分のバイト数
+DETECT_BYTES = 1 << 16
+
+
+class ImportResult(NamedTuple):
+    sessions: int
+    rows: int
+    skipped: int
+
+
+def map_columns(header: Sequence) -> List[Optional[str]]:
+    """見出し行の各列を記録行・セッションのキーに対応付ける（対応しない列は None）"""
+    keys = [COLUMN_ALIASES.get("".join(str(h or "").split())) for h in header]
+    missing = [key for key in REQUIRED_KEYS if key not in keys]
+    if missing:
+        raise ValueError(f"必要な列がありません: {', '.join(missing)}")
+    return keys
+
+
+def _number(value) -> int:
+    """'1,234 玉' のような表示用の文字列も数値として読む"""
+    if value is None or value == "":
+        return 0
+    if isinstance(value, (int, float)):
+        return int(value)
+    text = "".join(ch for ch in str(value) if ch.isdigit() or ch in ".-")
+    return int(float(text)) if text not in ("", ".", "-") else 0
+
+
+def _time(value) -> str:
+    if isinstance(value, (datetime, time_type)):
+        return value.strftime("%H:%M")
+    return "" if value is None else str(value).strip()
+
+
+def _date(value) -> str:
+    if isinstance(value, (datetime, date_type)):
+        return value.strftime("%Y-%m-%d")
+    return str(value).strip().replace("/", "-") if value not in (None, "") else ""
+
+
+def _detect_encoding(head: bytes, encoding: Optional[str]) -> str:
+    """先頭部分を UTF-8（BOM 付き可）→ Shift_JIS 系の順に試して文字コードを決める"""
+    if encoding:
+        return encoding
+    for enc in CSV_ENCODINGS:
+        try:
+            codecs.getincrementaldecoder(enc)().decode(head, final=False)
+            return enc
+        except UnicodeDecodeError:
+            continue
+    raise ValueError("CSV の文字コードを判別できません")
+
+
+def _rows_csv(source, encoding: Optional[str]) -> Iterator[Sequence]:
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as f:
+            encoding = _detect_encoding(f.read(DETECT_BYTES), encoding)
+        with open(source, newline="", encoding=encoding) as f:
+            yield from csv.reader(f)
+        return
+    # アップロードされたファイルなどのバイナリストリーム
+    encoding = _detect_encoding(source.read(DETECT_BYTES), encoding)
+    source.seek(0)
+    yield from csv.reader(io.TextIOWrapper(source, encoding=encoding, newline=""))
+
+
+def _rows_xlsx(source) -> Iterator[Sequence]:
+    import openpyxl
+
+    workbook = openpyxl.load_workbook(source, read_only=True, data_only=True)
+    try:
+        yield from workbook.active.iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+
+def read_rows(source, name: Optional[str] = None, encoding: Optional[str] = None) -> Iterator[dict]:
+    """ファイルを1行ずつ読み、キーをそろえた dict を返す（見出し行は1行目）
+
+    source はパスかバイナリのファイルオブジェクト。拡張子は name（省略時はパス）で判定する。
+    """
+    name = name or str(source)
+    rows = _rows_xlsx(source) if name.lower().endswith((".xlsx", ".xlsm")) else _rows_csv(source, encoding)
+    keys = None
+    for values in rows:
+        if keys is None:
+            keys = map_columns(values)
+            continue
+        if not any(v not in (None, "") for v in values):
+            continue
+        yield {key: value for key, value in zip(keys, values) if key is not None}
+
+
+def to_record(row: dict, rate: Optional[str]) -> dict:
+    """読み込んだ1行を pachilog.py の記録行にする（通常回転・回転率・1R出玉はここで計算）"""
+    gained = _number(row.get("獲得玉数"))
+    rounds = _number(row.get("ラウンド数"))
+    return build_record(
+        _time(row.get("時間")), _number(row.get("使用玉数")),
+        _number(row.get("打ち始め")), _number(row.get("打ち終わり")),
+        gained, rounds, gained / rounds if rounds > 0 else 0, rate,
+    )
+
+
+def import_rows(store: SessionStore, rows: Iterator[dict], defaults: Optional[dict] = None,
+                chunk_rows: int = IMPORT_CHUNK_ROWS) -> ImportResult:
+    """行を読みながらセッションごとに SessionStore へ書き込む"""
+    defaults = dict({"日付": datetime.now().strftime("%Y-%m-%d"), "店名": "", "台番号": 0, "交換率": "4円"},
+                    **(defaults or {}))
+    sessions = total = skipped = 0
+
+    def session_key(row):
+        return tuple(row.get(key) if row.get(key) not in (None, "") else defaults[key] for key in SESSION_KEYS)
+
+    for (day, shop, machine_no, rate), group in groupby(rows, key=session_key):
+        rate = str(rate) if str(rate) in ("4円", "1円") else f"{_number(rate)}円"
+
+        def records(group=group, rate=rate):
+            nonlocal skipped
+            for row in group:
+                try:
+                    yield to_record(row, rate)
+                except ValueError:
+                    skipped += 1
+
+        session_records = records()
+        first = next(session_records, None)
+        if first is None:
+            continue
+        info = {"店名": str(shop), "台番号": _number(machine_no), "交換率": rate, "持ち玉": 0,
+                "現金投資額": 0, "貸し玉可能残金": 0, "実践開始時間": first["時間"]}
+        total += store.import_session(_date(day), info, chain([first], session_records), chunk_rows=chunk_rows)
+        sessions += 1
+    return ImportResult(sessions, total, skipped)
+
+
+def import_file(store: SessionStore, source, name: Optional[str] = None, defaults: Optional[dict] = None,
+                encoding: Optional[str] = None, chunk_rows: int = IMPORT_CHUNK_ROWS) -> ImportResult:
+    """CSV / .xlsx ファイルを SessionStore に取り込む"""
+    return import_rows(store, read_rows(source, name, encoding), defaults, chunk_rows)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="CSV / Excel の実践記録を SQLite に取り込む")
+    parser.add_argument("files", nargs="+", help="取り込む .csv / .xlsx ファイル")
+    parser.add_argument("--db", default="pachilog.db", help="取り込み先の SQLite ファイル")
+    parser.add_argument("--player", default="", help="プレイヤー名（アプリの ?player= と同じ値）")
+    parser.add_argument("--date", help="日付の列が無いときの日付（YYYY-MM-DD）")
+    parser.add_argument("--shop", help="店名の列が無いときの店名")
+    parser.add_argument("--machine-no", type=int, help="台番号の列が無いときの台番号")
+    parser.add_argument("--rate", choices=["4円", "1円"], help="交換率の列が無いときのレート")
+    parser.add_argument("--encoding", help="CSV の文字コード（既定: UTF-8 → Shift_JIS の順に判定）")
+    parser.add_argument("--chunk-rows", type=int, default=IMPORT_CHUNK_ROWS, help="1回に書き込む行数")
+    args = parser.parse_args(argv)
+
+    defaults = {key: value for key, value in
+                (("日付", args.date), ("店名", args.shop), ("台番号", args.machine_no), ("交換率", args.rate))
+                if value is not None}
+    store = SessionStore(args.db, safe_name(args.player))
+    for path in args.files:
+        result = import_file(store, path, defaults=defaults, encoding=args.encoding, chunk_rows=args.chunk_rows)
+        print(f"{path}: {result.sessions} セッション / {result.rows} 行を取り込みました"
+              + (f"（{result.skipped} 行をスキップ）" if result.skipped else ""))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+"""スナップショット + 追記専用ジャーナルによる実践データの永続化
+
+ボタン操作ごとの変更はジャーナル（1行1イベントの JSON Lines）に追記するだけにし、
+一定件数たまったらスナップショットへ畳み込む（コンパクション）。
+読み込み時は最新スナップショットにジャーナルの残りを順に適用して状態を復元する。
+スナップショットは一時ファイル + rename で置き換え、読み書きはファイルロックで直列化する。
+ジャーナルには events モジュールの型付きイベント（投資・貸し玉・行確定など）も記録できる。
+
+ジャーナルの先頭行にはファイルごとの ID を書き、スナップショットには畳み込んだジャーナルの ID を残す。
+スナップショットを書いてからジャーナルを消すまでの間に落ちても、同じ ID のジャーナルは読み込み時に
+適用せずに消すため、同じイベントが二重に適用されることはない。
+"""
+import json
+import os
+import uuid
+from typing import Optional
+
+from . import events as session_events
+from .fileio import atomic_write, file_lock
+
+# ジャーナルがこの件数に達したらスナップショットへ畳み込む
+COMPACT_EVERY = 200
+# ジャーナルの先頭行の op と、スナップショットに残す畳み込み済みジャーナルの ID のキー
+HEADER_OP = "journal"
+FOLDED_KEY = "folded_journal"
+
+
+def empty_state() -> dict:
+    """保存データの初期状態（従来の DATA_FILE と同じ形）"""
+    return {"records": [], "machine_info": {}, "is_active": False, "draft": None}
+
+
+def apply_event(state: dict, event: dict) -> dict:
+    """1件のイベントを状態に適用する
+
+    op の種類:
+        reset   : 状態を丸ごと置き換える ("state")
+        info    : machine_info のキーを更新する ("values")
+        append  : 記録行を末尾に追加する ("record")
+        replace : 既存の記録行を置き換える ("index", "record")
+        active  : 実践中フラグを更新する ("value")
+    events.TYPES の型付きイベントは events.apply() で適用する。
+    """
+    op = event.get("op")
+    if op == "reset":
+        state = empty_state()
+        state.update(event.get("state", {}))
+        state["draft"] = session_events.load_draft(state.get("draft"))
+    elif op == "info":
+        state["machine_info"].update(event.get("values", {}))
+    elif op == "append":
+        state["records"].append(event["record"])
+    elif op == "replace":
+        state["records"][event["index"]] = event["record"]
+    elif op == "active":
+        state["is_active"] = bool(event.get("value"))
+        state["machine_info"]["is_active"] = state["is_active"]
+    elif op in session_events.TYPES:
+        state = session_events.apply(state, event)
+    return state
+
+
+def _journal_id(path: str) -> Optional[str]:
+    """ジャーナルの先頭行の ID（ファイルが無い・ID の無い古い形式なら None）"""
+    try:
+        with open(path, 'rb') as f:
+            first = f.readline()
+    except FileNotFoundError:
+        return None
+    try:
+        header = json.loads(first)
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        return None
+    return header.get("id") if isinstance(header, dict) and header.get("op") == HEADER_OP else None
+
+
+def _ends_with_newline(f) -> bool:
+    """バイナリで開いたファイルが空か、改行で終わっているか"""
+    if f.seek(0, os.SEEK_END) == 0:
+        return True
+    f.seek(-1, os.SEEK_END)
+    return f.read(1) == b"\n"
+
+
+class Journal:
+    """スナップショットファイルとジャーナルファイルの組"""
+
+    def __init__(self, snapshot_path: str, journal_path: Optional[str] = None,
+                 compact_every: int = COMPACT_EVERY):
+        self.snapshot_path = snapshot_path
+        self.journal_path = journal_path or os.path.splitext(snapshot_path)[0] + ".journal.jsonl"
+        self.compact_every = compact_every
+        self._pending = None  # ジャーナルの行数（初回アクセス時に数える）
+        self._seen = None  # 行数を数えたときのジャーナルの (inode, サイズ)
+
+    def _journal_stat(self):
+        try:
+            st = os.stat(self.journal_path)
+        except FileNotFoundError:
+            return None
+        return st.st_ino, st.st_size
+
+    def _count_pending(self) -> int:
+        # 別のプロセスが追記・コンパクションしていたら（inode かサイズが変わっていたら）数え直す
+        seen = self._journal_stat()
+        if self._pending is None or seen != self._seen:
+            self._pending = 0
+            if seen is not None:
+                with open(self.journal_path, 'rb') as f:
+                    self._pending = sum(1 for _ in f)
+            self._seen = seen
+        return self._pending
+
+    def load(self) -> Optional[dict]:
+        """最新スナップショット + ジャーナルの残りから状態を復元する。どちらも無ければ None"""
+        with file_lock(self.snapshot_path):
+            return self._load()
+
+    def _load(self) -> Optional[dict]:
+        has_snapshot = os.path.exists(self.snapshot_path)
+        has_journal = os.path.exists(self.journal_path)
+        if not has_snapshot and not has_journal:
+            return None
+
+        state = empty_state()
+        folded = None
+        if has_snapshot:
+            with open(self.snapshot_path, 'r', encoding='utf-8') as f:
+                state.update(json.load(f))
+            state["draft"] = session_events.load_draft(state.get("draft"))
+            folded = state.pop(FOLDED_KEY, None)
+
+        if has_journal and folded is not None and _journal_id(self.journal_path) == folded:
+            # スナップショットに畳み込んだ後、消す前に落ちたジャーナル
+            os.remove(self.journal_path)
+            has_journal = False
+
+        pending = 0
+        if has_journal:
+            end = 0  # 最後の完全な行（改行で終わる行）の末尾
+            with open(self.journal_path, 'rb') as f:
+                for raw in f:
+                    if not raw.endswith(b"\n"):
+                        # 書き込み途中で落ちた末尾行は捨てる
+                        break
+                    end += len(raw)
+                    line = raw.strip()
+                    if not line:
+                        continue
+                    try:
+                        event = json.loads(line)
+                    except (json.JSONDecodeError, UnicodeDecodeError):
+                        # 以前の途中書き込みが行の途中に残っていても、後ろのイベントは読む
+                        continue
+                    if event.get("op") == HEADER_OP:
+                        continue
+                    state = apply_event(state, event)
+                    pending += 1
+                torn = f.seek(0, os.SEEK_END) > end
+            if torn:
+                # 次の追記が壊れた行の続きに書かれないよう、完全な行の末尾で切り詰める
+                with open(self.journal_path, 'r+b') as f:
+                    f.truncate(end)
+        self._pending, self._seen = pending, self._journal_stat()
+        return state
+
+    def append(self, *events: dict) -> None:
+        """イベントをジャーナルに追記する（必要ならコンパクションも行う）"""
+        lines = "".join(json.dumps(e, ensure_ascii=False, separators=(",", ":")) + "\n" for e in events)
+        with file_lock(self.snapshot_path):
+            pending = self._count_pending()
+            with open(self.journal_path, 'ab+') as f:
+                if f.seek(0, os.SEEK_END) == 0:
+                    # 新しいジャーナルの先頭にはファイルの ID を書く
+                    lines = json.dumps({"op": HEADER_OP, "id": uuid.uuid4().hex}) + "\n" + lines
+                elif not _ends_with_newline(f):
+                    # 別のプロセスが行の途中で落ちていたら、その行と混ざらないよう改行から始める
+                    lines = "\n" + lines
+                f.write(lines.encode("utf-8"))
+                f.flush()
+                os.fsync(f.fileno())
+            self._pending, self._seen = pending + len(events), self._journal_stat()
+
+            if self._pending >= self.compact_every:
+                self._compact()
+
+    def save(self, state: dict) -> None:
+        """状態全体をスナップショットとして書き出し、ジャーナルを空にする"""
+        with file_lock(self.snapshot_path):
+            self._save(state)
+
+    def _save(self, state: dict) -> None:
+        state = dict(state, draft=session_events.dump_draft(state.get("draft")))
+        # 今のジャーナルを畳み込んだことを残してから消す（消す前に落ちても読み込み時に二重に適用しない）
+        folded = _journal_id(self.journal_path)
+        if folded is not None:
+            state[FOLDED_KEY] = folded
+        atomic_write(self.snapshot_path, json.dumps(state, ensure_ascii=False, indent=4))
+        if os.path.exists(self.journal_path):
+            os.remove(self.journal_path)
+        self._pending, self._seen = 0, None
+
+    def compact(self) -> None:
+        """スナップショット + ジャーナルを新しいスナップショットに畳み込む"""
+        with file_lock(self.snapshot_path):
+            self._compact()
+
+    def _compact(self) -> None:
+        state = self._load()
+        if state is not None:
+            self._save(state)
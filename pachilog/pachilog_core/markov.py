@@ -0,0 +1,116 @@
+"""吸収マルコフ連鎖による確変ループ / ST 機の厳密計算
+
+ラウンド振り分けの各行の「次フロー」（確変 / 時短）から状態遷移を組み立て、
+初当たり1回あたりの期待ラウンド数・連チャン数の分布を求める。
+
+状態は 確変中（ST中）と 時短中 の2つで、どちらからも当たりを引けなければ通常に戻る（吸収）。
+    確変ループ : 確変中は次の当たりが確定。時短に落ちたら引き戻し率で当たる
+    ST         : ST中は RUSH継続率で当たる。時短中は引き戻し率で当たる
+
+連鎖の解（ラウンド数の単位）は振り分けと継続率だけで決まるのでキャッシュし、
+出玉・交換率・大当たり確率が変わってもボーダーの計算だけをやり直す。
+"""
+from functools import lru_cache
+from typing import NamedTuple, Sequence, Tuple
+
+import numpy as np
+
+LOOP = "確変ループ"
+ST = "ST"
+KAKUHEN = "確変"
+# 連チャン数の分布をこの確率未満の裾で打ち切る
+TAIL_MASS = 1e-9
+MAX_CHAIN = 10_000
+
+Row = Tuple[float, float, str]  # (ラウンド数, 割合, 次フロー)
+
+
+class ChainSolution(NamedTuple):
+    entry_rate: float             # 初当たりから確変（RUSH）に入る確率
+    first_rounds: float           # 初当たり1回の平均ラウンド数
+    expected_rounds: float        # 初当たり1回あたりの総ラウンド数の期待値
+    mean_hits: float              # 初当たり1回あたりの平均当たり回数（初当たりを含む）
+    mean_rush_hits: float         # RUSH突入1回あたりの平均当たり回数（突入時の当たりを含む）
+    renchan_pmf: np.ndarray       # 当たり回数 1, 2, ... の確率
+
+
+class MarkovResult(NamedTuple):
+    solution: ChainSolution
+    total_payout: float           # トータル純増期待出玉
+    balls_per_1000: float         # 千円当たりの出玉価値
+    border: float                 # ボーダーライン
+
+
+def _rows_key(rows) -> Tuple[Row, ...]:
+    return tuple((float(r), float(p), str(s)) for r, p, s in rows)
+
+
+def _table(rows: Tuple[Row, ...]) -> Tuple[float, float]:
+    """振り分けから (平均ラウンド数, 確変に入る確率) を求める（割合は合計で正規化）"""
+    rounds = np.array([r for r, _, _ in rows], dtype=float)
+    ratios = np.array([p for _, p, _ in rows], dtype=float)
+    kakuhen = np.array([s == KAKUHEN for _, _, s in rows])
+    total = ratios.sum()
+    if total <= 0:
+        raise ValueError("ラウンド振り分けの割合が入力されていません")
+    ratios = ratios / total
+    return float(rounds @ ratios), float(ratios[kakuhen].sum())
+
+
+@lru_cache(maxsize=256)
+def _solve(mode: str, first_rows: Tuple[Row, ...], rush_rows: Tuple[Row, ...],
+           rush_continue: float, jitan_continue: float) -> ChainSolution:
+    first_rounds, entry = _table(first_rows)
+    rush_rounds, stay = _table(rush_rows)
+
+    # 各状態で次の当たりを引く確率 h（確変中, 時短中）
+    h = np.array([1.0 if mode == LOOP else rush_continue / 100, jitan_continue / 100])
+    # 当たりを引いた後の遷移（確変に残る / 時短に落ちる）
+    Q = np.outer(h, [stay, 1 - stay])
+    if np.any(np.abs(np.linalg.eigvals(Q)) >= 1 - 1e-12):
+        raise ValueError("連チャンが終わらない設定です（継続率・次フローを見直してください）")
+    fundamental = np.linalg.inv(np.eye(2) - Q)
+
+    start = np.array([entry, 1 - entry])
+    extra_hits = fundamental @ h              # 各状態から先の当たり回数の期待値
+    expected_rounds = first_rounds + start @ extra_hits * rush_rounds
+
+    # 当たり回数の分布: P(初当たり + j 回) = start Q^j (1 - h)
+    pmf = []
+    dist, remaining = start, 1.0
+    while remaining > TAIL_MASS and len(pmf) < MAX_CHAIN:
+        p = float(dist @ (1 - h))
+        pmf.append(p)
+        remaining -= p
+        dist = dist @ Q
+    pmf = np.array(pmf)
+    pmf.flags.writeable = False
+
+    return ChainSolution(
+        entry_rate=entry,
+        first_rounds=first_rounds,
+        expected_rounds=float(expected_rounds),
+        mean_hits=float(1 + start @ extra_hits),
+        mean_rush_hits=float(1 + extra_hits[0]),
+        renchan_pmf=pmf,
+    )
+
+
+def solve_chain(mode: str, first_rows: Sequence[Row], rush_rows: Sequence[Row],
+                rush_continue: float = 0, jitan_continue: float = 0) -> ChainSolution:
+    """連鎖を解く（同じ振り分け・継続率ならキャッシュを返す）
+
+    確変ループでは first_rows と rush_rows に同じ振り分けを渡し、rush_continue は使わない。
+    """
+    if mode == LOOP:
+        rush_continue = 100
+    return _solve(mode, _rows_key(first_rows), _rows_key(rush_rows), float(rush_continue), float(jitan_continue))
+
+
+def markov_border(solution: ChainSolution, prob_normal: float, round_ball: float,
+                  support_reduction: float = 10, exchange_money: float = 4) -> MarkovResult:
+    """連鎖の解から期待出玉とボーダーを求める（軽い計算なので毎回行う）"""
+    total_payout = solution.expected_rounds * round_ball * (100 - support_reduction) / 100
+    balls_per_1000 = 1000 / exchange_money
+    border = prob_normal * balls_per_1000 / total_payout if total_payout > 0 else float("inf")
+    return MarkovResult(solution, total_payout, balls_per_1000, border)
@@ -0,0 +1,31 @@
+"""表のページ分割（表示するページの範囲だけを求める）"""
+from typing import List, NamedTuple, Sequence
+
+PAGE_SIZES = (20, 50, 100)
+
+
+class Page(NamedTuple):
+    page: int  # 1 始まり
+    pages: int
+    start: int  # 表示順で何件目から（0 始まり）
+    stop: int
+    total: int
+
+
+def page_bounds(total: int, page: int, page_size: int) -> Page:
+    """total 件を page_size 件ずつに分けたときの page ページ目の範囲（範囲外のページは端に寄せる）"""
+    pages = max(1, -(-total // page_size))
+    page = min(max(int(page), 1), pages)
+    start = (page - 1) * page_size
+    return Page(page, pages, start, min(start + page_size, total), total)
+
+
+def list_page(items: Sequence, page: Page, newest_first: bool = False) -> List:
+    """リストから表示するページの分だけを取り出す（newest_first なら末尾から数える）
+
+    どちらの順でもスライス1回で取り出す（SessionStore の記録行はページの範囲だけを読む）。
+    """
+    if not newest_first:
+        return list(items[page.start:page.stop])
+    total = len(items)
+    return list(items[total - page.stop:total - page.start])[::-1]
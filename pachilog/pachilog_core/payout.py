@@ -0,0 +1,138 @@
+"""初当たり1回あたりの出玉分布の厳密計算（FFT による畳み込み）
+
+ラウンド振り分けの離散分布と、継続率から決まる幾何分布の連チャン数を
+フーリエ空間で合成し、初当たり1回あたりの出玉の確率質量関数を求める。
+乱数を使わないため、モンテカルロと違ってノイズのないリスク指標が得られる。
+
+計算はラウンド数を単位とする整数格子の上で行い、最後に1ラウンドあたりの出玉を掛ける。
+出玉のモデルは border.border_lines() と同じで、分布の平均はトータル純増期待出玉に一致する。
+"""
+import math
+from typing import NamedTuple, Sequence
+
+import numpy as np
+
+# 切り捨てる裾の確率の既定値
+TAIL_MASS = 1e-9
+
+
+class PayoutDistribution(NamedTuple):
+    balls: np.ndarray   # 出玉（玉）
+    pmf: np.ndarray     # 各出玉になる確率
+
+    def mean(self) -> float:
+        return float(np.dot(self.balls, self.pmf))
+
+    def std(self) -> float:
+        mean = self.mean()
+        return float(np.sqrt(max(np.dot((self.balls - mean) ** 2, self.pmf), 0.0)))
+
+    def prob_below(self, value: float) -> float:
+        """出玉が value 未満になる確率"""
+        return float(self.pmf[self.balls < value].sum())
+
+    def quantile(self, q: float) -> float:
+        """下側 q（0.0～1.0）の分位点"""
+        cdf = np.cumsum(self.pmf)
+        index = min(int(np.searchsorted(cdf, q * cdf[-1])), len(self.balls) - 1)
+        return float(self.balls[index])
+
+    def summary(self, percentiles=(5, 25, 50, 75, 95)) -> dict:
+        """simulate.summarize() と同じ形式の要約"""
+        summary = {"平均": self.mean(), "標準偏差": self.std(), "負ける確率": self.prob_below(0)}
+        for q in percentiles:
+            summary[f"{q}%点"] = self.quantile(q / 100)
+        return summary
+
+
+def _round_pmf(rounds: Sequence[float], ratios: Sequence[float]) -> np.ndarray:
+    """ラウンド振り分けを、ラウンド数を添字とする確率の配列にする
+
+    割合の合計が 1 に満たない分は 0 ラウンド（出玉なし）として扱い、正規化はしない。
+    RUSH の振り分けに確変の行だけ（kakuhen_only()）を渡すと、時短の行に当たった分を
+    出玉に数えない border_lines() と同じ期待値になる。
+    """
+    rounds = np.rint(np.asarray(rounds, dtype=float)).astype(np.int64)
+    ratios = np.asarray(ratios, dtype=float)
+    size = int(rounds.max()) + 1 if rounds.size else 1
+    pmf = np.bincount(rounds, weights=ratios, minlength=size) if rounds.size else np.zeros(1)
+    total = pmf.sum()
+    if total > 1 + 1e-6:
+        raise ValueError("ラウンド振り分けの割合の合計が100%を超えています")
+    pmf[0] += max(1 - total, 0.0)
+    return pmf
+
+
+def _fft_size(n: int) -> int:
+    return 1 << max(int(n - 1).bit_length(), 0)
+
+
+def _trim(pmf: np.ndarray, tail_mass: float) -> np.ndarray:
+    """数値誤差の負値を除き、裾の確率が tail_mass 未満の部分を切り捨てる"""
+    pmf = np.clip(pmf, 0.0, None)
+    tail = np.cumsum(pmf[::-1])[::-1]
+    keep = int(np.searchsorted(-tail, -tail_mass, side="right"))
+    return pmf[:max(keep, 1)]
+
+
+def first_hit_rounds_pmf(normal_rounds, normal_ratios, rush_rounds, rush_ratios,
+                         rush_entry: float, rush_continue: float,
+                         tail_mass: float = TAIL_MASS) -> np.ndarray:
+    """初当たり1回あたりの総ラウンド数の確率質量関数（添字 = ラウンド数）
+
+    総ラウンド数 = 初当たりのラウンド + (突入時のみ) 幾何分布の回数ぶんの RUSH 当たりのラウンド
+    RUSH の当たり回数の平均は 1 / (1 - 継続率) で、border_lines() の平均連チャン数と同じ。
+    """
+    entry = rush_entry / 100
+    cont = rush_continue / 100
+    if not 0 <= cont < 1:
+        raise ValueError("RUSH継続率は0%以上100%未満で指定してください")
+    a = _round_pmf(normal_rounds, normal_ratios)
+    b = _round_pmf(rush_rounds, rush_ratios)
+
+    # 連チャン数が m を超える確率 cont**m が tail_mass を下回る長さまで格子を取る
+    chain_max = 1 if cont == 0 else math.ceil(math.log(tail_mass) / math.log(cont)) + 1
+    size = _fft_size(len(a) + (len(b) - 1) * chain_max)
+
+    phi_a = np.fft.rfft(a, size)
+    phi_b = np.fft.rfft(b, size)
+    # RUSH 1回分（幾何分布の回数ぶんの和）の特性関数: (1-c)φ / (1 - cφ)
+    phi_rush = (1 - cont) * phi_b / (1 - cont * phi_b)
+    phi = phi_a * ((1 - entry) + entry * phi_rush)
+    return _trim(np.fft.irfft(phi, size), tail_mass)
+
+
+def first_hit_distribution(normal_rounds, normal_ratios, rush_rounds, rush_ratios,
+                           rush_entry: float, rush_continue: float, round_ball: float,
+                           support_reduction: float = 10,
+                           tail_mass: float = TAIL_MASS) -> PayoutDistribution:
+    """初当たり1回あたりの出玉（玉）の分布"""
+    pmf = first_hit_rounds_pmf(normal_rounds, normal_ratios, rush_rounds, rush_ratios,
+                               rush_entry, rush_continue, tail_mass)
+    per_round = round_ball * (100 - support_reduction) / 100
+    return PayoutDistribution(np.arange(len(pmf)) * per_round, pmf)
+
+
+def session_distribution(first_hit_pmf: np.ndarray, prob_normal: float, n_spins: int,
+                         round_ball: float, support_reduction: float = 10,
+                         rotation_rate: float = 18.0, lend_balls: float = 250,
+                         tail_mass: float = TAIL_MASS) -> PayoutDistribution:
+    """N回転打ったときの差玉（玉）の分布
+
+    初当たり回数は二項分布 B(N, 1/確率) で、確率母関数 (1 - p + pφ)^N を使って合成する。
+    """
+    p = 1 / prob_normal
+    # 初当たり回数の上限（二項分布の裾が tail_mass を下回るところ）を対数で求める
+    k = np.arange(n_spins)
+    log_pmf = n_spins * math.log1p(-p) + np.concatenate(
+        [[0.0], np.cumsum(np.log((n_spins - k) / (k + 1)) + math.log(p / (1 - p)))])
+    cdf = np.cumsum(np.exp(log_pmf))
+    hits_max = int(np.searchsorted(cdf, 1 - tail_mass)) + 1
+
+    size = _fft_size((len(first_hit_pmf) - 1) * hits_max + 1)
+    phi = np.fft.rfft(first_hit_pmf, size)
+    pmf = _trim(np.fft.irfft(np.power(1 - p + p * phi, n_spins), size), tail_mass)
+
+    per_round = round_ball * (100 - support_reduction) / 100
+    cost = n_spins * lend_balls / rotation_rate
+    return PayoutDistribution(np.arange(len(pmf)) * per_round - cost, pmf)
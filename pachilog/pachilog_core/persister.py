@@ -0,0 +1,205 @@
+"""書き込みの遅延実行（write-behind）
+
+画面側は append() でイベントをキューに入れるだけにし、バックグラウンドのスレッドが
+少し待ってから溜まったイベントをまとめて1回のトランザクションで書き込む。
+連打された投資ボタンなどで、スクリプトのスレッドがディスクを待つことはない。
+
+load / save は未書き込みのイベントを書き切ってから（flush してから）実行する。
+実践終了時の save と、インタープリタ終了時（atexit）には必ず書き切る。
+
+書き込みに失敗したまとまりは、間隔を倍にしながら MAX_RETRIES 回まで再試行する。
+それでも書けなければ退避ファイル（JSON Lines）に追記して画面側に伝え、後続のイベントの書き込みを続ける。
+"""
+import atexit
+import json
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Callable, List, Optional
+
+from .fileio import file_lock
+
+# 最初のイベントが来てから、後続のイベントを待ってまとめる時間（秒）
+COALESCE_SECONDS = 0.2
+# 書き込みに失敗したときに再試行するまでの時間（秒）。失敗するたびに倍にし、MAX_RETRY_SECONDS で頭打ちにする
+RETRY_SECONDS = 1.0
+MAX_RETRY_SECONDS = 30.0
+# 同じまとまりの書き込みを試す回数（これを超えたら退避ファイルに移す）
+MAX_RETRIES = 5
+# WriterPool が同時に持つ WriteBehind（書き込みスレッド）の数
+MAX_WRITERS = 32
+
+
+def coalesce(events: List[dict]) -> List[dict]:
+    """イベント列を同じ結果になる短い列にまとめる
+
+    - reset より前のイベントは reset で上書きされるので捨てる
+    - info は記録行（append / replace）と独立しているので、reset / active をまたがない範囲で1つにまとめる
+    """
+    start = max((i for i, e in enumerate(events) if e.get("op") == "reset"), default=0)
+    merged, info = [], None
+    for event in events[start:]:
+        op = event.get("op")
+        if op == "info":
+            if info is None:
+                info = {"op": "info", "values": {}}
+                merged.append(info)
+            info["values"].update(event.get("values", {}))
+        else:
+            merged.append(event)
+            if op not in ("append", "replace"):
+                info = None
+    return merged
+
+
+class WriteBehind:
+    """Journal / SessionStore を包み、append をバックグラウンドで書き込む
+
+    元のストアと同じ load / save / append のインターフェースを持つ。
+    dead_letter_path を渡すと、再試行しても書けなかったイベントをそのファイルに退避する。
+    """
+
+    def __init__(self, store, delay: float = COALESCE_SECONDS, dead_letter_path: Optional[str] = None):
+        self.store = store
+        self.delay = delay
+        self.dead_letter_path = dead_letter_path
+        self._pending: List[dict] = []
+        self._cond = threading.Condition()
+        self._queued = 0  # これまでにキューに入れたイベント数
+        self._written = 0  # これまでに書き込んだイベント数
+        self._error: Optional[BaseException] = None
+        self._flushing = 0  # flush() で待っているスレッドの数（いればまとめる待ち時間を省く）
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="pachilog-write-behind", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def _raise_error(self) -> None:
+        # バックグラウンドでの書き込みの失敗は、次の呼び出しで画面側に伝える
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+    def append(self, *events: dict) -> None:
+        """イベントをキューに入れてすぐ戻る"""
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("persister is closed")
+            self._pending.extend(events)
+            self._queued += len(events)
+            self._cond.notify_all()
+            self._raise_error()
+
+    def flush(self, timeout: Optional[float] = None) -> None:
+        """呼び出し時点までにキューに入ったイベントを書き終えるまで待つ"""
+        with self._cond:
+            target = self._queued
+            self._flushing += 1
+            self._cond.notify_all()
+            try:
+                done = self._cond.wait_for(lambda: self._written >= target or self._error is not None, timeout)
+            finally:
+                self._flushing -= 1
+            if not done:
+                raise TimeoutError("書き込みが終わりませんでした")
+            self._raise_error()
+
+    def load(self) -> Optional[dict]:
+        self.flush()
+        return self.store.load()
+
+    def save(self, state: dict) -> None:
+        """未書き込みのイベントを書き切ってから、状態全体を同期的に保存する"""
+        self.flush()
+        self.store.save(state)
+
+    def close(self) -> None:
+        """残りを書き切ってスレッドを止める（atexit からも呼ばれる）"""
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
+        atexit.unregister(self.close)
+
+    def _run(self) -> None:
+        batch, failures = [], 0
+        while True:
+            with self._cond:
+                if not batch:
+                    self._cond.wait_for(lambda: self._pending or self._closed)
+                    if not self._pending and self._closed:
+                        return
+                    # 続けて押されたボタンの分もまとめて書くため、少しだけ待つ（flush 中・終了時は待たない）
+                    self._cond.wait_for(lambda: self._closed or self._flushing, self.delay)
+                    batch, self._pending = self._pending, []
+            error = None
+            try:
+                self.store.append(*coalesce(batch))
+            except Exception as e:
+                failures += 1
+                with self._cond:
+                    if failures < MAX_RETRIES and not self._closed:
+                        # 失敗したまとまりだけを再試行する（後から来たイベントは追い越さない）。
+                        # 再試行で書ければ失敗ではないので、画面側には伝えず、flush() も書き終わるまで待たせる
+                        self._cond.wait_for(lambda: self._closed,
+                                            min(RETRY_SECONDS * 2 ** (failures - 1), MAX_RETRY_SECONDS))
+                        continue
+                error = self._dead_letter(batch, e)
+            with self._cond:
+                self._written += len(batch)
+                if error is not None:
+                    self._error = error
+                self._cond.notify_all()
+            batch, failures = [], 0
+
+    def _dead_letter(self, batch: List[dict], error: Exception) -> RuntimeError:
+        """書き込めなかったイベントを退避ファイルに追記し、画面側に伝える例外を返す"""
+        message = f"{len(batch)} 件の変更を保存できませんでした"
+        if self.dead_letter_path:
+            line = json.dumps({"time": datetime.now().isoformat(timespec="seconds"), "error": repr(error),
+                               "events": batch}, ensure_ascii=False, default=str)
+            try:
+                with file_lock(self.dead_letter_path):
+                    with open(self.dead_letter_path, "a", encoding="utf-8") as f:
+                        f.write(line + "\n")
+                        f.flush()
+                        os.fsync(f.fileno())
+                message += f"（{self.dead_letter_path} に退避しました）"
+            except OSError:
+                # 退避もできないときは、画面側に伝えるだけにする
+                pass
+        result = RuntimeError(f"{message}: {error}")
+        result.__cause__ = error
+        return result
+
+
+class WriterPool:
+    """キー（プレイヤー）ごとの WriteBehind を最大 max_writers 個まで持つ
+
+    数を超えたら、最も長く使われていないものを書き切ってから止める（スレッドが際限なく増えない）。
+    """
+
+    def __init__(self, factory: Callable[[str], WriteBehind], max_writers: int = MAX_WRITERS):
+        self._factory = factory
+        self.max_writers = max_writers
+        self._writers: "OrderedDict[str, WriteBehind]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> WriteBehind:
+        with self._lock:
+            writer = self._writers.pop(key, None)
+            if writer is None:
+                writer = self._factory(key)
+            self._writers[key] = writer
+            evicted = []
+            while len(self._writers) > self.max_writers:
+                evicted.append(self._writers.popitem(last=False)[1])
+        for old in evicted:
+            old.close()
+        return writer
+
+    def __len__(self) -> int:
+        return len(self._writers)
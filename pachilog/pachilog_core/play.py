@@ -0,0 +1,80 @@
+"""実践記録の計算（投資・貸し玉・使用玉数・回転率・記録行の作成）"""
+from datetime import datetime
+from typing import Optional, Tuple
+
+from .aggregates import rate_unit
+
+# 1玉あたりの貸し玉料金（円）
+LEND_PRICE = {"4円": 4, "1円": 1}
+# 貸し玉ボタン1回で使う金額（円）
+LOAN_MONEY = {"4円": 500, "1円": 200}
+
+
+def balls_for_money(amount: int, rate: Optional[str]) -> int:
+    """amount 円で借りられる玉数"""
+    return amount // LEND_PRICE.get(rate, 4)
+
+
+def loan_unit(rate: Optional[str]) -> Tuple[int, int]:
+    """貸し玉ボタン1回分の (金額, 玉数)"""
+    money = LOAN_MONEY.get(rate, 500)
+    return money, balls_for_money(money, rate)
+
+
+def invest(info: dict, amount: int) -> dict:
+    """現金投資を反映し、更新したキーと値を返す"""
+    changes = {
+        "現金投資額": info.get("現金投資額", 0) + amount,
+        "貸し玉可能残金": info.get("貸し玉可能残金", 0) + amount,
+    }
+    info.update(changes)
+    return changes
+
+
+def can_lend(info: dict) -> bool:
+    money, _ = loan_unit(info.get("交換率", "4円"))
+    return info.get("貸し玉可能残金", 0) >= money
+
+
+def lend(info: dict) -> Tuple[dict, int]:
+    """貸し玉1回分を残金から引き、(更新したキーと値, 借りた玉数) を返す"""
+    money, balls = loan_unit(info.get("交換率", "4円"))
+    changes = {"貸し玉可能残金": info.get("貸し玉可能残金", 0) - money}
+    info.update(changes)
+    return changes, balls
+
+
+def used_balls(start_balls: int, loaned_balls: int, current_balls: int) -> int:
+    """使用玉数 = (行開始時の持ち玉 + この行で借りた玉) - 現在の持ち玉"""
+    return max(start_balls + loaned_balls - current_balls, 0)
+
+
+def rotation_rate(spins: int, used: int, rate: Optional[str]) -> float:
+    """回転率（千円あたりの回転数）"""
+    return spins / used * rate_unit(rate) if used > 0 else 0
+
+
+def build_record(time: str, used: int, start_rot: int, end_rot: int, gained_balls: int,
+                 total_round: int, payout_per_round: float, rate: Optional[str]) -> dict:
+    """記録一覧の1行を作る"""
+    normal_rot = max(end_rot - start_rot, 0)
+    return {
+        "時間": time,
+        "使用玉数": used,
+        "打ち始め": start_rot,
+        "打ち終わり": end_rot,
+        "通常回転": normal_rot,
+        "回転率": round(rotation_rate(normal_rot, used, rate), 2),
+        "獲得玉数": gained_balls,
+        "ラウンド数": total_round,
+        "1Rあたり獲得出玉": round(payout_per_round, 2),
+    }
+
+
+def elapsed_str(start_hhmm: str, now: Optional[datetime] = None) -> str:
+    """'HH:MM' の開始時刻からの実践時間（例: 3時間15分）"""
+    now = now or datetime.now()
+    start = datetime.strptime(start_hhmm, "%H:%M")
+    elapsed = now - start
+    hours, remainder = divmod(elapsed.seconds, 3600)
+    return f"{hours}時間{remainder // 60}分"
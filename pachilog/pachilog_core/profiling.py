@@ -0,0 +1,122 @@
+"""rerun ごとの処理時間の計測（段階ごとの内訳・p50/p95・JSONL への追記）
+
+環境変数 PACHILOG_PROFILE=1 のとき（画面側ではクエリパラメータ ?profile=1 でも）有効にする。
+無効のときの stage() は何もしないコンテキストマネージャを返すだけなので、計測コードを残したままでよい。
+"""
+import json
+import os
+import statistics
+import time
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+PROFILE_ENV = "PACHILOG_PROFILE"
+PROFILE_FILE_ENV = "PACHILOG_PROFILE_FILE"
+PROFILE_FILE = "pachilog_profile.jsonl"
+# p50/p95 を求める直近の rerun 数
+WINDOW = 200
+
+TOTAL = "total"
+
+
+def enabled_by_env() -> bool:
+    return os.environ.get(PROFILE_ENV, "").lower() in ("1", "true", "yes", "on")
+
+
+class Profiler:
+    """1回の rerun の段階ごとの時間を集め、直近 WINDOW 回分を保持して JSONL に追記する"""
+
+    def __init__(self, app: str, log_path: Optional[str] = None, window: int = WINDOW):
+        self.app = app
+        self.enabled = False
+        self.log_path = log_path or os.environ.get(PROFILE_FILE_ENV, PROFILE_FILE)
+        self.samples = deque(maxlen=window)
+        self._stages: Dict[str, float] = {}
+        self._started: Optional[float] = None
+        self._last_end: Optional[float] = None
+        self._fragment: Optional[str] = None
+
+    @property
+    def running(self) -> bool:
+        """rerun の計測中か（begin() から finish() まで）"""
+        return self._started is not None
+
+    def begin(self, enabled: bool, fragment: Optional[str] = None) -> None:
+        """rerun の先頭で呼ぶ。st.rerun() で前回の rerun が途中終了していれば、その分をここで確定する
+
+        fragment を渡すと、st.fragment だけの部分的な rerun としてサンプルに名前を残す。
+        """
+        if self._started is not None:
+            self._commit(self._last_end or self._started, interrupted=True)
+        self.enabled = enabled
+        self._stages = {}
+        self._started = time.perf_counter() if enabled else None
+        self._last_end = self._started
+        self._fragment = fragment
+
+    @contextmanager
+    def _timed(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            self._stages[name] = self._stages.get(name, 0.0) + (end - start) * 1000
+            self._last_end = end
+
+    def stage(self, name: str):
+        """with profiler.stage("load_data"): ... の形で段階の時間を計測する（同じ名前は合算）"""
+        if self._started is None:
+            return nullcontext()
+        return self._timed(name)
+
+    def finish(self) -> Optional[dict]:
+        """rerun の末尾で呼び、この rerun のサンプルを確定して返す"""
+        if self._started is None:
+            return None
+        return self._commit(time.perf_counter())
+
+    def _commit(self, end: float, interrupted: bool = False) -> dict:
+        sample = {
+            "app": self.app,
+            "at": datetime.now().isoformat(timespec="milliseconds"),
+            TOTAL: (end - self._started) * 1000,
+            "stages": dict(self._stages),
+        }
+        if interrupted:
+            sample["rerun"] = True
+        if self._fragment is not None:
+            sample["fragment"] = self._fragment
+        self._started = None
+        self.samples.append(sample)
+        self._export(sample)
+        return sample
+
+    def _export(self, sample: dict) -> None:
+        # 計測のせいでアプリが止まらないよう、書き込みの失敗は無視する
+        try:
+            with open(self.log_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(sample, ensure_ascii=False) + "\n")
+        except OSError:
+            pass
+
+    def percentiles(self) -> Dict[str, Tuple[float, float, int]]:
+        """段階ごと（total を含む）の (p50, p95, サンプル数) [ms]"""
+        values: Dict[str, list] = {TOTAL: []}
+        for sample in self.samples:
+            values[TOTAL].append(sample[TOTAL])
+            for name, ms in sample["stages"].items():
+                values.setdefault(name, []).append(ms)
+        result = {}
+        for name, ms in values.items():
+            if not ms:
+                continue
+            if len(ms) == 1:
+                p50 = p95 = ms[0]
+            else:
+                cuts = statistics.quantiles(ms, n=20, method="inclusive")
+                p50, p95 = statistics.median(ms), cuts[18]
+            result[name] = (p50, p95, len(ms))
+        return result
@@ -0,0 +1,112 @@
+"""店名・台番号・年月ごとの集計（ロールアップ）を SQLite に持ち、セッション終了時に差分で更新する
+
+集計画面は rollups テーブルを読むだけなので、履歴の件数によらず一定の時間で開ける。
+平均値は合計から読み出し時に計算する。SessionStore と同じ接続・トランザクションの中で使う。
+"""
+from datetime import datetime
+from typing import List, Optional
+
+from .play import LEND_PRICE
+
+# 集計の切り口 → 画面に出す列名
+DIMENSIONS = {"shop": "店名", "machine": "台番号", "month": "年月"}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS rollups (
+    player        TEXT NOT NULL,
+    dim           TEXT NOT NULL,
+    key           TEXT NOT NULL,
+    sessions      INTEGER NOT NULL DEFAULT 0,
+    used_balls    INTEGER NOT NULL DEFAULT 0,
+    used_yen      REAL NOT NULL DEFAULT 0,
+    spins         INTEGER NOT NULL DEFAULT 0,
+    payout_balls  REAL NOT NULL DEFAULT 0,
+    rounds        REAL NOT NULL DEFAULT 0,
+    invest        INTEGER NOT NULL DEFAULT 0,
+    minutes       REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (player, dim, key)
+);
+"""
+
+_TOTALS = ["sessions", "used_balls", "used_yen", "spins", "payout_balls", "rounds", "invest", "minutes"]
+
+
+def _minutes(started_at: Optional[str], ended_at: Optional[str], first: Optional[str], last: Optional[str]) -> float:
+    """実践時間（分）。開始・終了時刻が無い取り込みデータは記録行の最初と最後の時間から求める"""
+    for start, end, fmt in ((started_at, ended_at, None), (first, last, "%H:%M")):
+        try:
+            if fmt is None:
+                start_dt, end_dt = datetime.fromisoformat(start), datetime.fromisoformat(end)
+            else:
+                start_dt, end_dt = datetime.strptime(start, fmt), datetime.strptime(end, fmt)
+        except (TypeError, ValueError):
+            continue
+        return max((end_dt - start_dt).total_seconds() / 60, 0)
+    return 0.0
+
+
+def session_summary(conn, session_id: int) -> dict:
+    """終了したセッション1つ分の合計（記録行はこのセッションの分だけを主キーで読む）"""
+    session = conn.execute(
+        "SELECT date, shop, machine_no, rate, started_at, ended_at, json_extract(machine_info, '$.現金投資額') AS invest"
+        " FROM sessions WHERE id = ?", (session_id,),
+    ).fetchone()
+    totals = conn.execute(
+        "SELECT COALESCE(SUM(used_balls), 0), COALESCE(SUM(spins), 0), COALESCE(SUM(payout_balls), 0),"
+        " COALESCE(SUM(rounds), 0), MIN(time), MAX(time) FROM records WHERE session_id = ?", (session_id,),
+    ).fetchone()
+    used_balls, spins, payout_balls, rounds, first, last = totals
+    return {
+        "keys": {"shop": session["shop"], "machine": f"{session['shop']} #{session['machine_no']}",
+                 "month": str(session["date"])[:7]},
+        "sessions": 1,
+        "used_balls": used_balls,
+        "used_yen": used_balls * LEND_PRICE.get(session["rate"], 4),
+        "spins": spins,
+        "payout_balls": payout_balls,
+        "rounds": rounds,
+        "invest": session["invest"] or 0,
+        "minutes": _minutes(session["started_at"], session["ended_at"], first, last),
+    }
+
+
+def add_session(conn, player: str, session_id: int) -> None:
+    """終了したセッションの合計を、店名・台番号・年月のそれぞれの行に足し込む"""
+    summary = session_summary(conn, session_id)
+    columns = ", ".join(_TOTALS)
+    placeholders = ", ".join("?" for _ in _TOTALS)
+    updates = ", ".join(f"{col} = {col} + excluded.{col}" for col in _TOTALS)
+    conn.executemany(
+        f"INSERT INTO rollups (player, dim, key, {columns}) VALUES (?, ?, ?, {placeholders})"
+        f" ON CONFLICT (player, dim, key) DO UPDATE SET {updates}",
+        [[player, dim, key] + [summary[col] for col in _TOTALS] for dim, key in summary["keys"].items()],
+    )
+
+
+def rebuild(conn) -> None:
+    """終了済みの全セッションから作り直す（rollups テーブルを追加する前のデータ用）"""
+    conn.execute("DELETE FROM rollups")
+    for row in conn.execute("SELECT id, player FROM sessions WHERE is_active = 0").fetchall():
+        add_session(conn, row["player"], row["id"])
+
+
+def fetch(conn, player: str, dim: str) -> List[dict]:
+    """集計の切り口ごとの平均値（セッション数の多い順）"""
+    rows = conn.execute(
+        f"SELECT key, {', '.join(_TOTALS)} FROM rollups WHERE player = ? AND dim = ? ORDER BY sessions DESC, key",
+        (player, dim),
+    ).fetchall()
+    result = []
+    for row in rows:
+        sessions = row["sessions"] or 1
+        result.append({
+            DIMENSIONS[dim]: row["key"],
+            "セッション数": row["sessions"],
+            "平均回転率": round(row["spins"] / row["used_yen"] * 1000, 2) if row["used_yen"] else 0.0,
+            "1R出玉": round(row["payout_balls"] / row["rounds"], 1) if row["rounds"] else 0.0,
+            "平均投資": round(row["invest"] / sessions),
+            "平均実践時間": round(row["minutes"] / sessions / 60, 1),
+            "総投資": row["invest"],
+            "総実践時間": round(row["minutes"] / 60, 1),
+        })
+    return result
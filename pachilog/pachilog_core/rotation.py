@@ -0,0 +1,125 @@
+"""回転率の逐次統計（重み付き Welford）・信頼区間・ボーダーに対する逐次確率比検定（SPRT）
+
+各行の回転率を、その行の使用玉数（千円単位）を重みとした観測として扱う。
+重み付き平均は「総通常回転 / 総使用玉数」の平均回転率と一致し、分散は行ごとのばらつきから推定する。
+machine_info には十分統計量（行数・重みの合計・平均・偏差平方和）だけを持ち、
+行の確定・編集のたびに O(1) で更新する。信頼区間と検定はこの4つの値から毎回求める。
+"""
+import math
+from typing import NamedTuple, Optional
+
+from .aggregates import rate_unit
+
+# machine_info に保持するキー
+STATS_KEY = "回転率統計"
+
+# 95% 両側の t 分布の分位点（自由度 → 値）。30 を超えたら正規分布の値を使う
+_T95 = {1: 12.706, 2: 4.303, 3: 3.182, 4: 2.776, 5: 2.571, 6: 2.447, 7: 2.365, 8: 2.306, 9: 2.262, 10: 2.228,
+        12: 2.179, 15: 2.131, 20: 2.086, 25: 2.060, 30: 2.042}
+Z95 = 1.960
+
+# 逐次検定の既定値：ボーダー ± INDIFFERENCE（回/K）を見分け、誤判定の確率は ALPHA / BETA
+INDIFFERENCE = 1.0
+ALPHA = 0.05
+BETA = 0.05
+
+
+def empty() -> dict:
+    return {"n": 0, "weight": 0.0, "mean": 0.0, "m2": 0.0}
+
+
+def _observation(record: dict, rate: Optional[str]):
+    """行の (回転率, 重み)。重みは使用玉数を千円単位にしたもの（使用玉数 0 の行は数えない）"""
+    used = record.get("使用玉数", 0) or 0
+    if used <= 0:
+        return None
+    unit = rate_unit(rate)
+    return (record.get("通常回転", 0) or 0) / used * unit, used / unit
+
+
+def add(stats: dict, record: dict, rate: Optional[str]) -> dict:
+    """1行を加える（West の重み付き Welford 法）"""
+    obs = _observation(record, rate)
+    if obs is None:
+        return stats
+    x, w = obs
+    weight = stats["weight"] + w
+    delta = x - stats["mean"]
+    mean = stats["mean"] + delta * w / weight
+    return {"n": stats["n"] + 1, "weight": weight, "mean": mean, "m2": stats["m2"] + w * delta * (x - mean)}
+
+
+def remove(stats: dict, record: dict, rate: Optional[str]) -> dict:
+    """add() で加えた1行を取り除く（行の編集時に、古い行を引いてから新しい行を加える）"""
+    obs = _observation(record, rate)
+    if obs is None:
+        return stats
+    x, w = obs
+    weight = stats["weight"] - w
+    if stats["n"] <= 1 or weight <= 1e-12:
+        return empty()
+    mean = (stats["mean"] * stats["weight"] - x * w) / weight
+    m2 = stats["m2"] - w * (x - mean) * (x - stats["mean"])
+    return {"n": stats["n"] - 1, "weight": weight, "mean": mean, "m2": max(m2, 0.0)}
+
+
+def apply_row(info: dict, new: dict, old: Optional[dict] = None) -> dict:
+    """1行の確定（old があれば編集）を machine_info の統計量に反映し、更新したキーと値を返す"""
+    rate = info.get("交換率")
+    stats = info.get(STATS_KEY) or empty()
+    if old is not None:
+        stats = remove(stats, old, rate)
+    changes = {STATS_KEY: add(stats, new, rate)}
+    info.update(changes)
+    return changes
+
+
+class RotationSummary(NamedTuple):
+    n: int                     # 使用玉数のある行数
+    mean: float                # 平均回転率（回/K）
+    std: float                 # 行ごとの回転率の標準偏差（千円あたりに換算）
+    low: Optional[float]       # 95% 信頼区間の下限（2行未満なら None）
+    high: Optional[float]      # 95% 信頼区間の上限
+    llr: Optional[float]       # 逐次検定の対数尤度比（ボーダー未設定・2行未満なら None）
+    decision: Optional[str]    # "above" / "below" / None（判定中）
+
+
+def _t95(df: int) -> float:
+    if df > 30:
+        return Z95
+    # 表に無い自由度は、それより小さい（区間が広くなる側の）自由度の値を使う
+    return _T95[max(k for k in _T95 if k <= df)]
+
+
+def summarize(stats: Optional[dict], border: Optional[float] = None, indifference: float = INDIFFERENCE,
+              alpha: float = ALPHA, beta: float = BETA) -> RotationSummary:
+    """統計量から信頼区間と、ボーダーに対する逐次確率比検定の結果を求める
+
+    検定は H0: 回転率 = ボーダー − indifference と H1: 回転率 = ボーダー + indifference の比較。
+    行 i の回転率を平均 μ・分散 σ²/w_i の正規分布とみなすと、対数尤度比は
+    2 × indifference × 重みの合計 × (平均 − ボーダー) / σ² で、統計量だけから求まる。
+    """
+    stats = stats or empty()
+    n, weight, mean = stats["n"], stats["weight"], stats["mean"]
+    if n < 2 or weight <= 0:
+        return RotationSummary(n, mean, 0.0, None, None, None, None)
+    variance = stats["m2"] / (n - 1)  # 千円あたりの分散 σ²
+    half = _t95(n - 1) * math.sqrt(variance / weight)
+    llr = decision = None
+    if border and variance > 0:
+        llr = 2 * indifference * weight * (mean - border) / variance
+        if llr >= math.log((1 - beta) / alpha):
+            decision = "above"
+        elif llr <= math.log(beta / (1 - alpha)):
+            decision = "below"
+    return RotationSummary(n, mean, math.sqrt(variance), mean - half, mean + half, llr, decision)
+
+
+def rebuild(info: dict, records) -> dict:
+    """記録行から統計量を作り直す（統計量を持たない古いデータの復元時・実践開始時に使う）"""
+    stats = empty()
+    for record in records:
+        stats = add(stats, record, info.get("交換率"))
+    changes = {STATS_KEY: stats}
+    info.update(changes)
+    return changes
@@ -0,0 +1,67 @@
+"""ラウンド振り分けの型付き表現
+
+ラウンド数・割合・次フローを構造化 NumPy 配列で保持し、計算ではこれをそのまま使う。
+"10R" や "50.0%" といった文字列への整形は表示するときだけ行う。
+"""
+from typing import Iterable, List, Tuple
+
+import numpy as np
+
+KAKUHEN = "確変"
+JITAN = "時短"
+
+ROUND_DTYPE = np.dtype([
+    ("rounds", np.int16),     # ラウンド数
+    ("ratio", np.float64),    # 割合（0.0～1.0）
+    ("kakuhen", np.bool_),    # 次フローが確変か（False なら時短）
+])
+
+
+class RoundDistribution:
+    """ラウンド振り分け1つ分（通常時 / RUSH時 / 通常時・RUSH時共通）"""
+
+    __slots__ = ("data",)
+
+    def __init__(self, data: np.ndarray):
+        self.data = data
+        self.data.flags.writeable = False
+
+    @classmethod
+    def from_entries(cls, entries: Iterable[dict]) -> "RoundDistribution":
+        """raund_check() の入力行（ラウンド / 割合(％) / ステータス）から作る"""
+        entries = list(entries)
+        data = np.empty(len(entries), dtype=ROUND_DTYPE)
+        for i, entry in enumerate(entries):
+            data[i] = (entry["ラウンド"], entry["割合"] / 100, entry.get("ステータス", KAKUHEN) == KAKUHEN)
+        return cls(data)
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    @property
+    def rounds(self) -> np.ndarray:
+        return self.data["rounds"]
+
+    @property
+    def ratios(self) -> np.ndarray:
+        return self.data["ratio"]
+
+    @property
+    def total_ratio(self) -> float:
+        return float(self.data["ratio"].sum())
+
+    def kakuhen_only(self) -> "RoundDistribution":
+        """次フローが確変の行だけを取り出す"""
+        return RoundDistribution(self.data[self.data["kakuhen"]])
+
+    def rows(self) -> List[Tuple[float, float, str]]:
+        """markov.solve_chain() に渡す (ラウンド数, 割合, 次フロー) の列"""
+        return [(int(r), float(p), KAKUHEN if k else JITAN) for r, p, k in self.data.tolist()]
+
+    def display(self) -> dict:
+        """表示用に整形した表（列名 → 値のリスト）"""
+        return {
+            "ラウンド (R)": [f"{r}R" for r in self.data["rounds"].tolist()],
+            "割合 (%)": [f"{p * 100:.1f}%" for p in self.data["ratio"].tolist()],
+            "ステータス": [KAKUHEN if k else JITAN for k in self.data["kakuhen"].tolist()],
+        }
@@ -0,0 +1,117 @@
+"""収支のモンテカルロシミュレーション
+
+タブ1の入力（大当たり確率・RUSH突入率/継続率・ラウンド振り分け）から、
+N回転打ったときの差玉の分布を求める。試行はNumPyでまとめて計算し、
+複数のプロセスに分割して並列に実行する。
+出玉のモデルは border.border_lines() / payout と同じで、差玉の平均は期待値に一致する。
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import NamedTuple, Optional, Sequence
+
+import numpy as np
+
+# 1プロセスに渡す試行数の単位（メモリ使用量の上限の目安）
+CHUNK_TRIALS = 100_000
+PERCENTILES = (5, 25, 50, 75, 95)
+
+
+class SimulationSpec(NamedTuple):
+    prob_normal: float           # 大当たり確率（通常時）の分母
+    rush_entry: float            # RUSH突入率（％）
+    rush_continue: float         # RUSH継続率（％）
+    round_ball: float            # 1ラウンドあたりの出玉（カウント数 × アタッカー賞球）
+    normal_rounds: Sequence[float]
+    normal_ratios: Sequence[float]
+    rush_rounds: Sequence[float]
+    rush_ratios: Sequence[float]
+    support_reduction: float = 10  # 電サポ減算割合（％）
+    n_spins: int = 3000          # 1セッションの通常回転数
+    rotation_rate: float = 18.0  # 千円あたり回転数
+    lend_balls: float = 250      # 千円で借りられる玉数
+
+
+def _with_blank(rounds, ratios):
+    """割合の合計が 1 に満たない分を 0 ラウンド（出玉なし）の行として加えた (ラウンド数, 確率)
+
+    正規化はしない（payout._round_pmf() と同じ扱い）。RUSH の振り分けに確変の行だけを渡すと、
+    時短の行に当たった分を出玉に数えない border_lines() と同じ期待値になる。
+    """
+    rounds = np.asarray(rounds, dtype=float)
+    ratios = np.asarray(ratios, dtype=float)
+    total = ratios.sum()
+    if total > 1 + 1e-6:
+        raise ValueError("ラウンド振り分けの割合の合計が100%を超えています")
+    p = np.append(ratios, max(1 - total, 0.0))
+    return np.append(rounds, 0.0), p / p.sum()
+
+
+def _simulate_chunk(spec: SimulationSpec, n_trials: int, seed) -> np.ndarray:
+    """n_trials 回分のセッションの差玉（玉）を返す"""
+    rng = np.random.default_rng(seed)
+    normal_rounds, normal_p = _with_blank(spec.normal_rounds, spec.normal_ratios)
+    rush_rounds, rush_p = _with_blank(spec.rush_rounds, spec.rush_ratios)
+    entry = spec.rush_entry / 100
+    cont = spec.rush_continue / 100
+
+    # 初当たり回数
+    hits = rng.binomial(spec.n_spins, 1 / spec.prob_normal, size=n_trials)
+    owner = np.repeat(np.arange(n_trials), hits)
+    rounds = np.zeros(n_trials)
+
+    if owner.size:
+        first = rng.choice(normal_rounds, size=owner.size, p=normal_p)
+        rounds += np.bincount(owner, weights=first, minlength=n_trials)
+
+    # RUSH突入した初当たりごとの連チャン数（継続率で打ち切られるまでの当たり回数）
+    if owner.size and entry > 0 and cont < 1:
+        entered = rng.random(owner.size) < entry
+        chain = np.zeros(owner.size, dtype=np.int64)
+        chain[entered] = rng.geometric(1 - cont, size=int(entered.sum()))
+        rush_owner = np.repeat(owner, chain)
+        if rush_owner.size:
+            rush = rng.choice(rush_rounds, size=rush_owner.size, p=rush_p)
+            rounds += np.bincount(rush_owner, weights=rush, minlength=n_trials)
+
+    payout = rounds * spec.round_ball * (100 - spec.support_reduction) / 100
+    cost = spec.n_spins * spec.lend_balls / spec.rotation_rate
+    return payout - cost
+
+
+def simulate(spec: SimulationSpec, n_trials: int = 1_000_000, seed: Optional[int] = None,
+             workers: Optional[int] = None) -> np.ndarray:
+    """n_trials 回のセッションをシミュレートし、各試行の差玉を返す
+
+    workers=1 のときは同じプロセス内で計算する。
+    """
+    if spec.rush_continue >= 100:
+        raise ValueError("RUSH継続率は100%未満で指定してください")
+    # 割合の誤りは、プロセスに分ける前にここで ValueError にする
+    _with_blank(spec.normal_rounds, spec.normal_ratios)
+    _with_blank(spec.rush_rounds, spec.rush_ratios)
+    sizes = [CHUNK_TRIALS] * (n_trials // CHUNK_TRIALS)
+    if n_trials % CHUNK_TRIALS:
+        sizes.append(n_trials % CHUNK_TRIALS)
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(sizes) == 1:
+        chunks = [_simulate_chunk(spec, size, s) for size, s in zip(sizes, seeds)]
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(sizes))) as pool:
+            chunks = list(pool.map(_simulate_chunk, [spec] * len(sizes), sizes, seeds))
+    return np.concatenate(chunks) if chunks else np.zeros(0)
+
+
+def summarize(net: np.ndarray) -> dict:
+    """差玉の分布から、平均・標準偏差・負ける確率・パーセンタイルをまとめる"""
+    if net.size == 0:
+        return {}
+    summary = {
+        "平均": float(net.mean()),
+        "標準偏差": float(net.std()),
+        "負ける確率": float((net < 0).mean()),
+    }
+    for q, value in zip(PERCENTILES, np.percentile(net, PERCENTILES)):
+        summary[f"{q}%点"] = float(value)
+    return summary
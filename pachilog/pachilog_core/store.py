@@ -0,0 +1,570 @@
+"""SQLite による実践データの保存（全セッション・全記録行の履歴を保持）
+
+Journal と同じ load / save / append のインターフェースを持つため、
+アプリ側はどちらのバックエンドでも同じように呼び出せる。
+行の追加や投資額の更新は、それぞれ1回の小さなトランザクションで書き込む。
+セッションはプレイヤーごとに分け、同時に書き込む複数のタブ・プロセスは BEGIN IMMEDIATE で直列化する。
+セッションが終了したときは、同じトランザクションで店名・台番号・年月ごとの集計（rollups）も更新する。
+
+events モジュールの型付きイベント（投資・貸し玉・行確定など）は events テーブルに追記するだけにし、
+SNAPSHOT_EVERY 件ごとにセッションの machine_info・下書き・記録行（スナップショット）へ畳み込む。
+読み込みはスナップショットに、まだ畳み込んでいない末尾のイベントだけを適用して復元する。
+記録行は復元時には読まず、表示するページの行だけをそのつど records テーブルから読む。
+"""
+import json
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from itertools import islice
+from typing import Iterable, Iterator, List, Optional, Union
+
+from . import events as session_events
+from . import rollups
+from .aggregates import apply_row
+
+# 取り込み時に1回の executemany で書き込む行数
+IMPORT_CHUNK_ROWS = 5000
+# 復元した記録行を先頭から順に読むときに1回の SELECT で読む行数
+READ_CHUNK_ROWS = 500
+
+# 記録行のキー（アプリ側の表示名）と SQLite のカラム名の対応
+RECORD_COLUMNS = [
+    ("時間", "time"),
+    ("使用玉数", "used_balls"),
+    ("打ち始め", "start_rot"),
+    ("打ち終わり", "end_rot"),
+    ("通常回転", "spins"),
+    ("回転率", "rotation_rate"),
+    ("獲得玉数", "payout_balls"),
+    ("ラウンド数", "rounds"),
+    ("1Rあたり獲得出玉", "payout_per_round"),
+]
+
+# 履歴のエクスポートで返す列（セッションの列 + 記録行の列）
+HISTORY_COLUMNS = ["日付", "店名", "台番号", "交換率"] + [key for key, _ in RECORD_COLUMNS]
+
+# 他の接続が書き込み中のとき、ロックが外れるまで待つ時間（秒）
+BUSY_TIMEOUT = 30
+# 型付きイベントがこの件数たまったらスナップショットへ畳み込む
+SNAPSHOT_EVERY = 100
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id            INTEGER PRIMARY KEY AUTOINCREMENT,
+    player        TEXT NOT NULL DEFAULT '',
+    date          TEXT NOT NULL,
+    shop          TEXT NOT NULL DEFAULT '',
+    machine_no    INTEGER NOT NULL DEFAULT 0,
+    rate          TEXT,
+    started_at    TEXT,
+    ended_at      TEXT,
+    is_active     INTEGER NOT NULL DEFAULT 0,
+    machine_info  TEXT NOT NULL DEFAULT '{}',
+    draft         TEXT,
+    snapshot_seq  INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS records (
+    session_id        INTEGER NOT NULL REFERENCES sessions(id) ON DELETE CASCADE,
+    row_no            INTEGER NOT NULL,
+    time              TEXT,
+    used_balls        INTEGER,
+    start_rot         INTEGER,
+    end_rot           INTEGER,
+    spins             INTEGER,
+    rotation_rate     REAL,
+    payout_balls      REAL,
+    rounds            REAL,
+    payout_per_round  REAL,
+    PRIMARY KEY (session_id, row_no)
+);
+
+CREATE TABLE IF NOT EXISTS events (
+    session_id  INTEGER NOT NULL REFERENCES sessions(id) ON DELETE CASCADE,
+    seq         INTEGER NOT NULL,
+    type        TEXT NOT NULL,
+    event       TEXT NOT NULL,
+    PRIMARY KEY (session_id, seq)
+);
+"""
+
+# 古いファイルの sessions に足す列
+MIGRATIONS = {
+    "player": "TEXT NOT NULL DEFAULT ''",
+    "draft": "TEXT",
+    "snapshot_seq": "INTEGER NOT NULL DEFAULT 0",
+}
+
+INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_sessions_date ON sessions(date);
+CREATE INDEX IF NOT EXISTS idx_sessions_shop ON sessions(shop, date);
+CREATE INDEX IF NOT EXISTS idx_sessions_machine ON sessions(shop, machine_no, date);
+DROP INDEX IF EXISTS idx_sessions_active;
+CREATE INDEX IF NOT EXISTS idx_sessions_player_active ON sessions(player) WHERE is_active = 1;
+CREATE INDEX IF NOT EXISTS idx_sessions_player_date ON sessions(player, date);
+"""
+
+
+def _py(value):
+    """numpy のスカラーなどを sqlite3 が扱える Python の値に変換する"""
+    return value.item() if hasattr(value, "item") else value
+
+
+def _record_params(record: dict) -> list:
+    return [_py(record.get(key)) for key, _ in RECORD_COLUMNS]
+
+
+# セッションの次の行番号（行番号の最大 + 1。削除などで行番号が飛んでいても既存の行と重ならない）
+NEXT_ROW_NO = "SELECT COALESCE(MAX(row_no) + 1, 0) FROM records WHERE session_id = ?"
+
+
+def _next_row_no(conn, session_id: int) -> int:
+    return conn.execute(NEXT_ROW_NO, (session_id,)).fetchone()[0]
+
+
+def _draft_json(draft: Optional[dict]) -> Optional[str]:
+    return json.dumps(session_events.dump_draft(draft), ensure_ascii=False, default=_py) if draft else None
+
+
+def _draft_from_json(text: Optional[str]) -> Optional[dict]:
+    return session_events.load_draft(json.loads(text)) if text else None
+
+
+def _row_to_record(row) -> dict:
+    return {key: row[col] for key, col in RECORD_COLUMNS}
+
+
+class _RecordRows:
+    """セッションの記録行を list のように扱う（len / [] / append）。アクセスした行だけを SQL で読み書きする"""
+
+    def __init__(self, store: "SessionStore", conn, session_id: int):
+        self._store, self._conn, self._session_id = store, conn, session_id
+
+    def __len__(self) -> int:
+        return _next_row_no(self._conn, self._session_id)
+
+    def __getitem__(self, index: int) -> dict:
+        row = self._conn.execute(
+            "SELECT * FROM records WHERE session_id = ? AND row_no = ?", (self._session_id, index)
+        ).fetchone()
+        if row is None:
+            raise IndexError(index)
+        return _row_to_record(row)
+
+    def __setitem__(self, index: int, record: dict) -> None:
+        self._store._apply(self._conn, self._session_id, {"op": "replace", "index": index, "record": record})
+
+    def append(self, record: dict) -> None:
+        self._store._insert_records(self._conn, self._session_id, len(self), [record])
+
+
+class _RecordPages:
+    """復元した実行中のセッションの記録行（len / [] / スライス / append / 反復）
+
+    records テーブルの行は参照された範囲だけを読み、画面での置き換え・追記は手元に持つ。
+    変更は同じイベントとしてストアにも書き込まれるため、ここからは書き込まない（終了時の save で書き切る）。
+    """
+
+    def __init__(self, store: "SessionStore", session_id: int, stored: int):
+        self._store, self.session_id = store, session_id
+        self._stored = stored  # 復元した時点で records テーブルにあった行数
+        self._changed = {}  # 行番号 -> 置き換えた行（復元時点の行のみ）
+        self._appended = []
+
+    def __len__(self) -> int:
+        return self._stored + len(self._appended)
+
+    def _index(self, index: int) -> int:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        return index
+
+    def _rows(self, start: int, stop: int) -> List[dict]:
+        rows = []
+        if start < self._stored:
+            rows = self._store.session_records(self.session_id, start, min(stop, self._stored))
+            rows = [self._changed.get(start + i, row) for i, row in enumerate(rows)]
+        return rows + self._appended[max(start - self._stored, 0):max(stop - self._stored, 0)]
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step != 1:
+                return [self[i] for i in range(start, stop, step)]
+            return self._rows(start, stop)
+        index = self._index(index)
+        return self._rows(index, index + 1)[0]
+
+    def __setitem__(self, index: int, record: dict) -> None:
+        index = self._index(index)
+        if index < self._stored:
+            self._changed[index] = record
+        else:
+            self._appended[index - self._stored] = record
+
+    def append(self, record: dict) -> None:
+        self._appended.append(record)
+
+    def __iter__(self) -> Iterator[dict]:
+        for start in range(0, len(self), READ_CHUNK_ROWS):
+            yield from self._rows(start, start + READ_CHUNK_ROWS)
+
+
+class SessionStore:
+    """SQLite ファイル1つに全セッションを保存するストア
+
+    player ごとに実行中のセッションと履歴を分ける（同じファイルを複数のプレイヤーで共有できる）。
+    """
+
+    def __init__(self, path: str, player: str = ""):
+        self.path = path
+        self.player = player
+        self._local = threading.local()
+        conn = self._conn()
+        has_rollups = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'rollups'"
+        ).fetchone() is not None
+        conn.executescript(SCHEMA)
+        conn.executescript(rollups.SCHEMA)
+        # 列が足りない古いファイルには列を足す（既存のセッションは player = ''）
+        columns = {row["name"] for row in conn.execute("PRAGMA table_info(sessions)")}
+        for name, definition in MIGRATIONS.items():
+            if name in columns:
+                continue
+            try:
+                conn.execute(f"ALTER TABLE sessions ADD COLUMN {name} {definition}")
+            except sqlite3.OperationalError as e:
+                # 別のプロセスが先に列を足した場合
+                if "duplicate column" not in str(e):
+                    raise
+        conn.executescript(INDEXES)
+        if not has_rollups:
+            # 集計テーブルが無かった古いファイルは、終了済みのセッションから一度だけ作る
+            with self._transaction() as conn:
+                if conn.execute("SELECT 1 FROM rollups LIMIT 1").fetchone() is None:
+                    rollups.rebuild(conn)
+
+    def _conn(self) -> sqlite3.Connection:
+        # Streamlit はスクリプトを別スレッドで実行するため、接続はスレッドごとに持つ
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # トランザクションは _transaction() で明示的に始める
+            conn = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        """書き込み用のトランザクション
+
+        BEGIN IMMEDIATE で最初に書き込みロックを取るため、読んでから書く処理（行番号の採番など）の間に
+        別の接続の書き込みが割り込まず、更新が失われない。
+        """
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def _active_id(self, conn) -> Optional[int]:
+        row = conn.execute(
+            "SELECT id FROM sessions WHERE player = ? AND is_active = 1 ORDER BY id DESC LIMIT 1",
+            (self.player,),
+        ).fetchone()
+        return row["id"] if row else None
+
+    # --- Journal と共通のインターフェース ---
+
+    def load(self) -> Optional[dict]:
+        """実行中のセッションを復元する（スナップショット + 末尾のイベント）。無ければ None
+
+        records は記録行を読まずに返す _RecordPages（参照した範囲だけを records テーブルから読む）。
+        """
+        conn = self._conn()
+        session_id = self._active_id(conn)
+        if session_id is None:
+            return None
+        # 行数とスナップショットを1つの SELECT で読み、途中で畳み込まれても食い違わないようにする
+        row = conn.execute(
+            "SELECT machine_info, draft, snapshot_seq,"
+            f" ({NEXT_ROW_NO}) AS n_records"
+            " FROM sessions WHERE id = ?",
+            (session_id, session_id),
+        ).fetchone()
+        state = {
+            "records": _RecordPages(self, session_id, row["n_records"]),
+            "machine_info": json.loads(row["machine_info"]),
+            "is_active": True,
+            "draft": _draft_from_json(row["draft"]),
+        }
+        for event in self._tail(conn, session_id, row["snapshot_seq"]):
+            session_events.apply(state, event)
+        return state
+
+    def save(self, state: dict) -> None:
+        """状態全体を保存する（実践開始時は新しいセッションを作り、終了時は閉じる）"""
+        with self._transaction() as conn:
+            self._save(conn, state)
+
+    def _save(self, conn, state: dict) -> None:
+        info = state.get("machine_info", {})
+        records = state.get("records", [])
+        is_active = bool(state.get("is_active", False))
+        now = datetime.now()
+        session_id = self._active_id(conn)
+        if session_id is None:
+            if not is_active:
+                return
+            session_id = conn.execute(
+                "INSERT INTO sessions (player, date, shop, machine_no, rate, started_at, is_active, machine_info)"
+                " VALUES (?, ?, ?, ?, ?, ?, 1, ?)",
+                (self.player, now.strftime("%Y-%m-%d"), info.get("店名", ""), _py(info.get("台番号", 0)),
+                 info.get("交換率"), now.isoformat(timespec="seconds"),
+                 json.dumps(info, ensure_ascii=False, default=_py)),
+            ).lastrowid
+        else:
+            conn.execute(
+                "UPDATE sessions SET shop = ?, machine_no = ?, rate = ?, is_active = ?, ended_at = ?,"
+                " machine_info = ? WHERE id = ?",
+                (info.get("店名", ""), _py(info.get("台番号", 0)), info.get("交換率"), int(is_active),
+                 None if is_active else now.isoformat(timespec="seconds"),
+                 json.dumps(info, ensure_ascii=False, default=_py), session_id),
+            )
+            # 渡された状態は記録済みのイベントを反映済みなので、ここまでをスナップショットとする
+            conn.execute(
+                "UPDATE sessions SET draft = ?, snapshot_seq = ? WHERE id = ?",
+                (_draft_json(state.get("draft")),
+                 self._last_seq(conn, session_id), session_id),
+            )
+            if self._owns(records, session_id):
+                # 復元した記録行は、置き換えた行と追記した行だけを書き込む
+                self._save_pages(conn, session_id, records)
+                records = []
+            else:
+                conn.execute("DELETE FROM records WHERE session_id = ?", (session_id,))
+        self._insert_records(conn, session_id, 0, records)
+        if not is_active:
+            rollups.add_session(conn, self.player, session_id)
+
+    def _owns(self, records, session_id: int) -> bool:
+        """records がこのファイルの session_id から復元した _RecordPages か"""
+        return (isinstance(records, _RecordPages)
+                and (records._store.path, records.session_id) == (self.path, session_id))
+
+    def _save_pages(self, conn, session_id: int, pages: _RecordPages) -> None:
+        """復元後に置き換えた行・追記した行だけを records テーブルに書き込む"""
+        conn.execute("DELETE FROM records WHERE session_id = ? AND row_no >= ?", (session_id, pages._stored))
+        for index, record in pages._changed.items():
+            self._apply(conn, session_id, {"op": "replace", "index": index, "record": record})
+        self._insert_records(conn, session_id, pages._stored, pages._appended)
+
+    def append(self, *events: dict) -> None:
+        """変更イベントを実行中のセッションに適用する（1回のトランザクション）
+
+        型付きイベントは events テーブルに追記し、それ以外（info / append など）はその場で適用する。
+        """
+        with self._transaction() as conn:
+            session_id = self._active_id(conn)
+            if session_id is None:
+                return
+            for event in events:
+                if event.get("op") in session_events.TYPES:
+                    self._log(conn, session_id, event)
+                else:
+                    # 畳み込んでいないイベントより後に適用されるよう、先にスナップショットへ畳み込む
+                    self._fold(conn, session_id)
+                    self._apply(conn, session_id, event)
+
+    # --- 型付きイベントの記録とスナップショット ---
+
+    def _last_seq(self, conn, session_id: int) -> int:
+        return conn.execute(
+            "SELECT COALESCE(MAX(seq), 0) FROM events WHERE session_id = ?", (session_id,)
+        ).fetchone()[0]
+
+    def _tail(self, conn, session_id: int, snapshot_seq: int) -> Iterator[dict]:
+        rows = conn.execute(
+            "SELECT event FROM events WHERE session_id = ? AND seq > ? ORDER BY seq", (session_id, snapshot_seq)
+        ).fetchall()
+        return (json.loads(row["event"]) for row in rows)
+
+    def _log(self, conn, session_id: int, event: dict) -> None:
+        seq = self._last_seq(conn, session_id) + 1
+        conn.execute(
+            "INSERT INTO events (session_id, seq, type, event) VALUES (?, ?, ?, ?)",
+            (session_id, seq, event["op"], json.dumps(event, ensure_ascii=False, default=_py)),
+        )
+        snapshot_seq = conn.execute("SELECT snapshot_seq FROM sessions WHERE id = ?", (session_id,)).fetchone()[0]
+        if seq - snapshot_seq >= SNAPSHOT_EVERY:
+            self._fold(conn, session_id)
+
+    def _fold(self, conn, session_id: int) -> None:
+        """末尾のイベントをスナップショット（machine_info・下書き・記録行）に畳み込む
+
+        記録行は _RecordRows 経由で、イベントが触った行だけを読み書きする。
+        """
+        row = conn.execute(
+            "SELECT machine_info, draft, snapshot_seq FROM sessions WHERE id = ?", (session_id,)
+        ).fetchone()
+        tail = list(self._tail(conn, session_id, row["snapshot_seq"]))
+        if not tail:
+            return
+        state = {
+            "records": _RecordRows(self, conn, session_id),
+            "machine_info": json.loads(row["machine_info"]),
+            "is_active": True,
+            "draft": _draft_from_json(row["draft"]),
+        }
+        for event in tail:
+            session_events.apply(state, event)
+        conn.execute(
+            "UPDATE sessions SET machine_info = ?, draft = ?, snapshot_seq = ? WHERE id = ?",
+            (json.dumps(state["machine_info"], ensure_ascii=False, default=_py),
+             _draft_json(state["draft"]),
+             row["snapshot_seq"] + len(tail), session_id),
+        )
+
+    def _apply(self, conn, session_id: int, event: dict) -> None:
+        op = event.get("op")
+        if op == "info":
+            conn.execute(
+                "UPDATE sessions SET machine_info = json_patch(machine_info, ?) WHERE id = ?",
+                (json.dumps(event.get("values", {}), ensure_ascii=False, default=_py), session_id),
+            )
+        elif op == "append":
+            self._insert_records(conn, session_id, _next_row_no(conn, session_id), [event["record"]])
+        elif op == "replace":
+            assignments = ", ".join(f"{col} = ?" for _, col in RECORD_COLUMNS)
+            conn.execute(
+                f"UPDATE records SET {assignments} WHERE session_id = ? AND row_no = ?",
+                _record_params(event["record"]) + [session_id, event["index"]],
+            )
+        elif op == "reset":
+            self._save(conn, event.get("state", {}))
+        elif op == "active":
+            conn.execute(
+                "UPDATE sessions SET is_active = ?, machine_info = json_set(machine_info, '$.is_active', json(?))"
+                " WHERE id = ?",
+                (int(bool(event.get("value"))), "true" if event.get("value") else "false", session_id),
+            )
+            if not event.get("value"):
+                conn.execute("UPDATE sessions SET ended_at = ? WHERE id = ?",
+                             (datetime.now().isoformat(timespec="seconds"), session_id))
+                rollups.add_session(conn, self.player, session_id)
+
+    def _insert_records(self, conn, session_id: int, first_row_no: int, records: List[dict]) -> None:
+        columns = ", ".join(col for _, col in RECORD_COLUMNS)
+        placeholders = ", ".join("?" for _ in range(len(RECORD_COLUMNS) + 2))
+        conn.executemany(
+            f"INSERT INTO records (session_id, row_no, {columns}) VALUES ({placeholders})",
+            [[session_id, first_row_no + i] + _record_params(r) for i, r in enumerate(records)],
+        )
+
+    def import_session(self, date: str, info: dict, records: Iterable[dict],
+                       chunk_rows: int = IMPORT_CHUNK_ROWS) -> int:
+        """終了済みのセッションとして記録行を一括で書き込み、書き込んだ行数を返す
+
+        records はイテレータのまま chunk_rows 行ずつ書き込むため、全行をメモリに載せない。
+        合計値は書き込みながら info に積み上げ、最後に machine_info として保存する。
+        セッション1つを1回のトランザクションで書き込む。
+        """
+        info = dict(info, is_active=False)
+        info.setdefault("記録行数", 0)
+        records = iter(records)
+        with self._transaction() as conn:
+            session_id = conn.execute(
+                "INSERT INTO sessions (player, date, shop, machine_no, rate, started_at, is_active)"
+                " VALUES (?, ?, ?, ?, ?, ?, 0)",
+                (self.player, date, info.get("店名", ""), _py(info.get("台番号", 0)), info.get("交換率"),
+                 info.get("実践開始時間")),
+            ).lastrowid
+            row_no = 0
+            while True:
+                chunk = list(islice(records, chunk_rows))
+                if not chunk:
+                    break
+                for record in chunk:
+                    apply_row(info, record)
+                self._insert_records(conn, session_id, row_no, chunk)
+                row_no += len(chunk)
+            conn.execute(
+                "UPDATE sessions SET machine_info = ? WHERE id = ?",
+                (json.dumps(info, ensure_ascii=False, default=_py), session_id),
+            )
+            rollups.add_session(conn, self.player, session_id)
+        return row_no
+
+    # --- 履歴の参照 ---
+
+    def _session_where(self, date_from, date_to, shop, machine_no, prefix=""):
+        # 履歴はこのストアのプレイヤーの分だけを返す
+        where, params = [f"{prefix}player = ?"], [self.player]
+        if date_from:
+            where.append(f"{prefix}date >= ?")
+            params.append(date_from)
+        if date_to:
+            where.append(f"{prefix}date <= ?")
+            params.append(date_to)
+        if isinstance(shop, str):
+            shop = [shop]
+        if shop:
+            where.append(f"{prefix}shop IN ({', '.join('?' for _ in shop)})")
+            params.extend(shop)
+        if machine_no is not None:
+            where.append(f"{prefix}machine_no = ?")
+            params.append(machine_no)
+        return " WHERE " + " AND ".join(where), params
+
+    def find_sessions(self, date_from: Optional[str] = None, date_to: Optional[str] = None,
+                      shop: Optional[str] = None, machine_no: Optional[int] = None,
+                      limit: int = 100) -> List[dict]:
+        """日付・店名・台番号で過去のセッションを検索する（新しい順）"""
+        where, params = self._session_where(date_from, date_to, shop, machine_no)
+        sql = ("SELECT id, date, shop, machine_no, rate, started_at, ended_at, is_active, machine_info FROM sessions"
+               + where + " ORDER BY date DESC, id DESC LIMIT ?")
+        params.append(limit)
+        rows = self._conn().execute(sql, params).fetchall()
+        return [dict(row, machine_info=json.loads(row["machine_info"])) for row in rows]
+
+    def iter_history(self, date_from: Optional[str] = None, date_to: Optional[str] = None,
+                     shop: Union[str, List[str], None] = None, machine_no: Optional[int] = None,
+                     batch_size: int = IMPORT_CHUNK_ROWS) -> Iterator[List[tuple]]:
+        """条件に合うセッションの記録行を、カーソルから batch_size 行ずつ返す（列は HISTORY_COLUMNS）"""
+        where, params = self._session_where(date_from, date_to, shop, machine_no, prefix="s.")
+        columns = ", ".join(f"r.{col}" for _, col in RECORD_COLUMNS)
+        cursor = self._conn().execute(
+            f"SELECT s.date, s.shop, s.machine_no, s.rate, {columns}"
+            " FROM sessions s JOIN records r ON r.session_id = s.id"
+            + where + " ORDER BY s.date, s.id, r.row_no",
+            params,
+        )
+        try:
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield [tuple(row) for row in rows]
+        finally:
+            cursor.close()
+
+    def rollups(self, dim: str) -> List[dict]:
+        """店名（shop）・台番号（machine）・年月（month）ごとの平均値。集計済みの行を読むだけで履歴は走査しない"""
+        return rollups.fetch(self._conn(), self.player, dim)
+
+    def session_records(self, session_id: int, start: int = 0, stop: Optional[int] = None) -> List[dict]:
+        """セッションの記録行を行番号順に返す（start 行目から stop 行目の手前まで。stop が None なら最後まで）"""
+        rows = self._conn().execute(
+            "SELECT * FROM records WHERE session_id = ? AND row_no >= ? AND row_no < ? ORDER BY row_no",
+            (session_id, start, stop if stop is not None else 2 ** 63 - 1),
+        ).fetchall()
+        return [_row_to_record(row) for row in rows]
@@ -0,0 +1,72 @@
+"""pachilog_app.py と pachi_app/pachilog.py で共通の Streamlit 部品"""
+import functools
+
+import pandas as pd
+import streamlit as st
+
+from pachilog_core.paging import PAGE_SIZES, Page, page_bounds
+from pachilog_core.profiling import TOTAL, Profiler, enabled_by_env
+
+
+def profiler(app: str) -> Profiler:
+    """このセッションの Profiler を返し、rerun の計測を始める
+
+    環境変数 PACHILOG_PROFILE=1 か、URL に ?profile=1 を付けたときだけ計測する。
+    """
+    prof = st.session_state.get("_profiler")
+    if prof is None:
+        prof = st.session_state["_profiler"] = Profiler(app)
+    prof.begin(enabled_by_env() or st.query_params.get("profile", "") in ("1", "true"))
+    return prof
+
+
+def fragment(prof: Profiler, name: str):
+    """st.fragment にする関数のデコレーター。その部分だけの rerun も計測する
+
+    フラグメント内の操作ではスクリプトの先頭（profiler()）も末尾（profiling_panel()）も実行されないため、
+    全体の rerun の計測中でなければ、ここで部分的な rerun として begin() / finish() する。
+    """
+    def decorate(func):
+        @st.fragment
+        @functools.wraps(func)
+        def run(*args, **kwargs):
+            own = prof.enabled and not prof.running
+            if own:
+                prof.begin(True, fragment=name)
+            with prof.stage(name):
+                func(*args, **kwargs)
+            if own:
+                prof.finish()
+        return run
+    return decorate
+
+
+def profiling_panel(prof: Profiler) -> None:
+    """rerun の末尾で計測を締め、サイドバーに内訳と直近の p50/p95 を表示する"""
+    if not prof.enabled:
+        return
+    last = prof.finish()
+    with st.sidebar.expander("⏱ 処理時間", expanded=True):
+        st.metric("今回の rerun", f"{last[TOTAL]:.1f} ms")
+        if last["stages"]:
+            st.bar_chart(pd.Series(last["stages"], name="ms"), horizontal=True)
+        rows = [
+            {"段階": name, "p50 (ms)": round(p50, 1), "p95 (ms)": round(p95, 1), "回数": count}
+            for name, (p50, p95, count) in prof.percentiles().items()
+        ]
+        st.dataframe(pd.DataFrame(rows), hide_index=True, use_container_width=True)
+        st.caption(f"直近 {len(prof.samples)} 回分 / 記録先: {prof.log_path}")
+
+
+def pager(key: str, total: int) -> Page:
+    """表の上に置くページ送り。表示するページの範囲を返す"""
+    col_page, col_size, col_info = st.columns([1, 1, 2])
+    size = col_size.selectbox("表示件数", PAGE_SIZES, key=f"{key}_size")
+    pages = page_bounds(total, 1, size).pages
+    # 件数が減ったり表示件数を増やしたりしてページが範囲外になったら、最後のページに寄せる
+    if st.session_state.get(f"{key}_page", 1) > pages:
+        st.session_state[f"{key}_page"] = pages
+    page = col_page.number_input("ページ", min_value=1, max_value=pages, step=1, key=f"{key}_page")
+    bounds = page_bounds(total, page, size)
+    col_info.caption(f"全 {total:,} 件中 {bounds.start + 1:,}〜{bounds.stop:,} 件目（{bounds.page}/{bounds.pages} ページ）")
+    return bounds
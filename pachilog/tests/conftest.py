@@ -0,0 +1,5 @@
+import os
+import sys
+
+# pachilog_core パッケージ（一つ上のディレクトリ）を読み込めるようにする（アプリと同じ）
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,38 @@
+import pytest
+
+from pachilog_core import aggregates
+
+ROWS = [{"使用玉数": 250, "通常回転": 20, "獲得玉数": 0}, {"使用玉数": 500, "通常回転": 35, "獲得玉数": 1400}]
+
+
+def test_apply_row_accumulates_and_counts_rows():
+    info = {"交換率": "4円"}
+    for row in ROWS:
+        aggregates.apply_row(info, row)
+    assert (info["総使用玉数"], info["総通常回転"], info["総獲得玉数"], info["記録行数"]) == (750, 55, 1400, 2)
+    assert aggregates.average_rotation(info) == pytest.approx(55 / 750 * 250)
+
+
+def test_editing_a_row_applies_only_the_difference():
+    info = {}
+    aggregates.rebuild(info, ROWS)
+    changes = aggregates.apply_row(info, dict(ROWS[1], 通常回転=40), old=ROWS[1])
+    assert changes == {"総使用玉数": 750, "総通常回転": 60, "総獲得玉数": 1400}
+    assert info["記録行数"] == 2
+
+
+def test_rebuild_matches_incremental_totals_and_handles_missing_values():
+    rows = ROWS + [{"使用玉数": None, "通常回転": 5}]
+    incremental = {}
+    for row in rows:
+        aggregates.apply_row(incremental, row)
+    rebuilt = {"総使用玉数": 999}
+    aggregates.rebuild(rebuilt, rows)
+    assert rebuilt == incremental
+    assert aggregates.has_totals(rebuilt) and not aggregates.has_totals({"総使用玉数": 0})
+
+
+def test_average_rotation_uses_the_rate_unit():
+    info = {"総使用玉数": 1000, "総通常回転": 20, "交換率": "1円"}
+    assert aggregates.average_rotation(info) == pytest.approx(20)
+    assert aggregates.average_rotation({"総使用玉数": 0}) == 0
@@ -0,0 +1,73 @@
+import os
+
+import pytest
+
+from pachilog_core import archive
+
+
+def _session(i, shop="A店", date="2024-05-01"):
+    return {"日付": date, "店名": shop, "台番号": i, "総回転数": 100 + i, "現金投資総額": 1000 * i, "レート": "4円"}
+
+
+def _files(base_dir):
+    return sorted(f for _, _, files in os.walk(base_dir) for f in files if f.endswith(".parquet"))
+
+
+def test_scan_filters_by_partition_and_date(tmp_path):
+    base = str(tmp_path)
+    archive.append_sessions([_session(1), _session(2, shop="B店"), _session(3, date="2024-06-02")], base)
+    assert archive.list_shops(base) == ["A店", "B店"]
+    table = archive.scan(base, columns=["台番号"], date_from="2024-05-01", date_to="2024-05-31", shops=["A店"])
+    assert table.column("台番号").to_pylist() == [1]
+    # 一時ファイルは残らない
+    assert not [f for f in _files(base) if f.startswith(".")]
+
+
+def test_compaction_merges_parts(tmp_path, monkeypatch):
+    monkeypatch.setattr(archive, "COMPACT_FILES", 3)
+    base = str(tmp_path)
+    for i in range(5):
+        archive.append_session(_session(i), base)
+    assert len(_files(base)) < 5
+    assert sorted(archive.scan(base).column("台番号").to_pylist()) == list(range(5))
+
+
+def test_crash_during_compaction_is_completed_without_duplicates(tmp_path, monkeypatch):
+    monkeypatch.setattr(archive, "COMPACT_FILES", 3)
+    base = str(tmp_path)
+    for i in range(3):
+        archive.append_session(_session(i), base)
+
+    # まとめたファイルと目印を書いた後、元のファイルを1つ消したところで落ちる
+    real_remove = os.remove
+    removed = []
+
+    def crash_after_first_remove(path):
+        if path.endswith(".parquet") and removed:
+            raise SystemExit("crash")
+        removed.append(path)
+        real_remove(path)
+
+    monkeypatch.setattr(archive.os, "remove", crash_after_first_remove)
+    with pytest.raises(SystemExit):
+        archive.append_session(_session(3), base)
+    monkeypatch.setattr(archive.os, "remove", real_remove)
+
+    # 次の書き込みで続きから完了させる
+    archive.append_session(_session(4), base)
+    assert sorted(archive.scan(base).column("台番号").to_pylist()) == list(range(5))
+    assert not [f for f in _files(base) if f.startswith(".")]
+
+
+def test_crash_before_publish_leaves_no_visible_file(tmp_path, monkeypatch):
+    base = str(tmp_path)
+    archive.append_session(_session(1), base)
+    monkeypatch.setattr(archive, "_publish", lambda part_dir, name: (_ for _ in ()).throw(SystemExit("crash")))
+    with pytest.raises(SystemExit):
+        archive.append_session(_session(2), base)
+    assert archive.scan(base).column("台番号").to_pylist() == [1]
+    monkeypatch.undo()
+
+    archive.append_session(_session(3), base)
+    assert sorted(archive.scan(base).column("台番号").to_pylist()) == [1, 3]
+    assert not [f for f in _files(base) if f.startswith(".")]
@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+
+from pachilog_core.border import border_lines, border_table, pad_distributions, sensitivity_grid
+
+SPEC = dict(prob_normal=319.7, rush_entry=50, rush_continue=80, count_num=10, attacker_ball=10)
+LOOP = dict(normal_rounds=[10, 3], normal_ratios=[0.5, 0.5], rush_rounds=[10], rush_ratios=[0.5])
+
+
+def test_border_lines_single_spec():
+    result = border_lines(**SPEC, **LOOP, exchange_money=4, support_reduction=10)
+    assert result.renchan[0] == pytest.approx(5)
+    assert result.normal_payout[0] == pytest.approx(6.5 * 90)
+    assert result.rush_payout[0] == pytest.approx(5 * 90)
+    assert result.total_payout[0] == pytest.approx(585 * 0.5 + (585 + 450 * 5) * 0.5)
+    assert result.border[0] == pytest.approx(319.7 * 250 / result.total_payout[0])
+
+
+def test_border_lines_broadcasts_exchange_rates():
+    rates = np.array([4.0, 3.57, 3.0])
+    batch = border_lines(**SPEC, **LOOP, exchange_money=rates)
+    for rate, border in zip(rates, batch.border):
+        assert border == pytest.approx(border_lines(**SPEC, **LOOP, exchange_money=rate).border[0])
+
+
+def test_border_table_pads_distributions():
+    rounds, ratios = pad_distributions([([10, 3], [0.5, 0.5]), ([10], [1.0])])
+    assert rounds.shape == ratios.shape == (2, 2)
+    assert ratios[1, 1] == 0
+    specs = [dict(SPEC, 機種名="A", **LOOP), dict(SPEC, 機種名="B", normal_rounds=[10], normal_ratios=[1.0],
+                                                rush_rounds=[10], rush_ratios=[1.0])]
+    frame = border_table(specs)
+    assert list(frame["機種名"]) == ["A", "B"]
+    assert frame["border"][0] == pytest.approx(border_lines(**SPEC, **LOOP).border[0])
+
+
+def test_sensitivity_grid_matches_border_lines():
+    grid = sensitivity_grid(**SPEC, **LOOP, exchange_money=[4.0, 3.0], support_reduction=[0, 10],
+                            rotation_rate=[15.0, 20.0, 25.0], spins_per_hour=200, hours=8)
+    assert grid.border.shape == (2, 2)
+    assert grid.unit_value.shape == (2, 2, 3)
+    assert grid.border[1, 1] == pytest.approx(
+        border_lines(**SPEC, **LOOP, exchange_money=3.0, support_reduction=10).border[0])
+    # 回転率がボーダーちょうどなら単価は 0
+    border = grid.border[0, 1]
+    at_border = sensitivity_grid(**SPEC, **LOOP, exchange_money=[4.0], support_reduction=[10],
+                                 rotation_rate=[border])
+    assert at_border.unit_value[0, 0, 0] == pytest.approx(0, abs=1e-9)
+    # 回転率が上がるほど単価は上がり、仕事量 = 時給 × 時間
+    assert np.all(np.diff(grid.unit_value, axis=-1) > 0)
+    np.testing.assert_allclose(grid.work, grid.hourly * 8)
@@ -0,0 +1,29 @@
+import pytest
+
+from pachilog_core.border import border_lines
+from pachilog_core.catalog import EXCHANGE_RATES, LOOP, SpecCatalog, normalize
+
+ROWS = [{"ラウンド": 10, "割合": 50, "ステータス": "確変"}, {"ラウンド": 3, "割合": 50, "ステータス": "時短"}]
+SPEC = {"prob_normal": 319.7, "rush_entry": 50, "rush_continue": 80, "count_num": 10, "attacker_ball": 10,
+        "mode": LOOP, "support_reduction": 10, "distributions": {"normal_rush": ROWS}}
+
+
+def test_saved_borders_are_border_lines(tmp_path):
+    catalog = SpecCatalog(str(tmp_path / "specs.json"))
+    saved = catalog.save("ｅ新機種 ＸＸ", SPEC)
+    assert [row["換金率"] for row in saved["borders"]] == list(EXCHANGE_RATES)
+    assert set(saved["borders"][0]) == {"換金率", "ボーダー"}
+    result = border_lines(319.7, 50, 80, 10, 10, [10, 3], [0.5, 0.5], [10], [0.5], exchange_money=4)
+    assert saved["borders"][0]["ボーダー"] == pytest.approx(result.border[0], abs=0.01)
+
+
+def test_lookup_and_search(tmp_path):
+    path = str(tmp_path / "specs.json")
+    catalog = SpecCatalog(path)
+    for name in ("P海物語", "P海物語 極", "eエヴァ"):
+        catalog.save(name, SPEC)
+    assert normalize("Ｐ 海物語") == normalize("p海物語")
+    assert SpecCatalog(path).get("ｐ海物語")["機種名"] == "P海物語"
+    assert catalog.search("p海")[:2] == ["P海物語", "P海物語 極"]
+    catalog.delete("eエヴァ")
+    assert SpecCatalog(path).names() == ["P海物語", "P海物語 極"]
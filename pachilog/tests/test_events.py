@@ -0,0 +1,61 @@
+from pachilog_core import aggregates, events, rotation
+from pachilog_core.journal import apply_event, empty_state
+
+
+def _state():
+    state = empty_state()
+    state.update(is_active=True, machine_info={"交換率": "4円", "持ち玉": 0})
+    return state
+
+
+def _play_row(state, balls_after, spins, hits=()):
+    for event in (events.start_row(), events.lend(), events.draft(持ち玉=balls_after, 打ち終わり=spins),
+                  *(events.hit(r, p) for r, p in hits), events.commit_row("10:00")):
+        events.apply(state, event)
+
+
+def test_row_lifecycle_updates_records_and_totals():
+    state = _state()
+    events.apply(state, events.invest(1000))
+    assert state["machine_info"]["貸し玉可能残金"] == 1000
+    _play_row(state, balls_after=25, spins=20, hits=[(10, 1400)])
+    record = state["records"][0]
+    assert record["使用玉数"] == 100  # 0 + 借りた 125 − 25
+    assert record["通常回転"] == 20
+    assert record["獲得玉数"] == 1400 and record["ラウンド数"] == 10
+    assert state["machine_info"]["持ち玉"] == 25 + 1400
+    assert state["machine_info"]["貸し玉可能残金"] == 500
+    assert state["machine_info"]["総使用玉数"] == 100
+    assert state["machine_info"][rotation.STATS_KEY]["n"] == 1
+    assert state["draft"] is None
+
+
+def test_editing_a_row_keeps_its_time_and_totals_stay_consistent():
+    state = _state()
+    events.apply(state, events.invest(1000))
+    _play_row(state, balls_after=25, spins=20)
+    events.apply(state, events.start_row(0))
+    assert state["draft"]["打ち終わり"] == 20
+    events.apply(state, events.draft(打ち終わり=30))
+    events.apply(state, events.commit_row("12:00"))
+    assert len(state["records"]) == 1
+    assert state["records"][0]["時間"] == "10:00"
+    rebuilt = aggregates.rebuild({}, state["records"])
+    assert state["machine_info"]["総通常回転"] == rebuilt["総通常回転"] == 30
+
+
+def test_cancel_and_lend_without_money():
+    state = _state()
+    events.apply(state, events.start_row())
+    events.apply(state, events.lend())  # 残金が無いので何も起きない
+    assert state["draft"]["貸し玉"] == 0
+    events.apply(state, events.cancel_row())
+    assert state["draft"] is None and state["records"] == []
+
+
+def test_journal_apply_event_delegates_typed_events():
+    state = _state()
+    state = apply_event(state, events.invest(500))
+    state = apply_event(state, {"op": "info", "values": {"ボーダー": 18.0}})
+    assert state["machine_info"]["現金投資額"] == 500
+    assert state["machine_info"]["ボーダー"] == 18.0
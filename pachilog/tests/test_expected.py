@@ -0,0 +1,53 @@
+import pytest
+
+from pachilog_core import expected
+from pachilog_core.catalog import LOOP
+
+SPEC = {"機種名": "Pテスト", "prob_normal": 319.7, "rush_entry": 50, "rush_continue": 80, "count_num": 10,
+        "attacker_ball": 10, "mode": LOOP, "support_reduction": 10,
+        "distributions": {"normal_rush": [{"ラウンド": 10, "割合": 50, "ステータス": "確変"},
+                                          {"ラウンド": 3, "割合": 50, "ステータス": "時短"}]}}
+
+
+def _info(exchange_money=4.0):
+    return {"spec": expected.link_spec(SPEC, exchange_money), "rate": "4円"}
+
+
+def test_link_spec_uses_border_lines():
+    link = expected.link_spec(SPEC, 4.0)
+    assert link["初当たり出玉"] == pytest.approx(1710)
+    assert link["回転あたり出玉"] == pytest.approx(1710 / 319.7)
+    assert link["ボーダー"] == pytest.approx(319.7 * 250 / 1710)
+    assert expected.link_spec(dict(SPEC, distributions={}), 4.0) is None
+
+
+def test_row_at_the_border_is_worth_nothing():
+    link = expected.link_spec(SPEC, 4.0)
+    record = {"通常回転": link["ボーダー"], "使用玉数": 250}
+    assert expected.row_value(link, record, "4円") == pytest.approx(0, abs=1e-9)
+
+
+def test_apply_row_accumulates_work_and_expected_value():
+    info = _info()
+    rows = [{"通常回転": 20, "使用玉数": 250}, {"通常回転": 60, "使用玉数": 500}]
+    for row in rows:
+        expected.apply_row(info, row)
+    link = info["spec"]
+    work = sum(r["通常回転"] * link["回転あたり出玉"] * 4 - r["使用玉数"] * 4 for r in rows)
+    assert info["total_spins"] == 80 and info["used_balls_total"] == 750
+    assert info["work_value"] == pytest.approx(work)
+    assert info["expected_value"] == pytest.approx(work / 80)
+
+
+def test_editing_a_row_replaces_its_contribution():
+    edited, direct = _info(), _info()
+    expected.apply_row(edited, {"通常回転": 20, "使用玉数": 250})
+    expected.apply_row(edited, {"通常回転": 30, "使用玉数": 250}, old={"通常回転": 20, "使用玉数": 250})
+    expected.apply_row(direct, {"通常回転": 30, "使用玉数": 250})
+    assert {k: edited[k] for k in expected.TOTAL_KEYS} == pytest.approx({k: direct[k] for k in expected.TOTAL_KEYS})
+
+
+def test_without_a_linked_spec_only_totals_move():
+    info = {"rate": "4円"}
+    expected.apply_row(info, {"通常回転": 20, "使用玉数": 250})
+    assert (info["total_spins"], info["work_value"], info["expected_value"]) == (20, 0.0, 0.0)
@@ -0,0 +1,76 @@
+import csv
+import io
+
+import openpyxl
+import pyarrow.parquet as pq
+import pytest
+
+from pachilog_core import archive, export
+from pachilog_core.store import HISTORY_COLUMNS, SessionStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = SessionStore(str(tmp_path / "p.db"))
+    for day, shop in (("2024-05-01", "A店"), ("2024-05-02", "B店")):
+        info = {"店名": shop, "台番号": 1, "交換率": "4円"}
+        store.import_session(day, info, ({"時間": "10:00", "使用玉数": 250, "通常回転": i} for i in range(25)))
+    return store
+
+
+def test_history_schema_matches_store_columns():
+    assert export.HISTORY_SCHEMA.names == HISTORY_COLUMNS
+
+
+@pytest.mark.parametrize("fmt", ["csv", "xlsx", "parquet"])
+def test_store_history_round_trips(store, fmt):
+    sink = io.BytesIO()
+    rows = export.export(export.store_batches(store, batch_size=10), export.HISTORY_SCHEMA, fmt, sink)
+    assert rows == 50
+    sink.seek(0)
+    if fmt == "csv":
+        lines = list(csv.reader(io.TextIOWrapper(sink, encoding="utf-8-sig")))
+        assert lines[0] == export.HISTORY_SCHEMA.names and len(lines) == 51
+    elif fmt == "xlsx":
+        sheet = openpyxl.load_workbook(sink, read_only=True).active
+        assert sum(1 for _ in sheet.iter_rows()) == 51
+    else:
+        table = pq.read_table(sink)
+        assert table.schema == export.HISTORY_SCHEMA and table.num_rows == 50
+
+
+def test_store_batches_filter_by_date(store):
+    batches = list(export.store_batches(store, date_from="2024-05-02"))
+    assert sum(b.num_rows for b in batches) == 25
+
+
+def test_db_source_filters_on_every_shop(tmp_path, store):
+    for shops, rows in (([], 50), (["A店"], 25), (["A店", "B店"], 50), (["C店"], 0)):
+        out = tmp_path / "out.csv"
+        export.main([str(out), "--source", "db", "--db", store.path] + [f"--shop={shop}" for shop in shops])
+        assert len(out.read_text(encoding="utf-8-sig").splitlines()) == rows + 1
+
+
+def test_archive_export_selects_columns(tmp_path):
+    base = str(tmp_path / "archive")
+    archive.append_sessions([{"日付": "2024-05-01", "店名": "A店", "台番号": i} for i in range(3)], base)
+    sink = io.BytesIO()
+    columns = ["日付", "台番号"]
+    rows = export.export(export.archive_batches(columns, base_dir=base), export.archive_schema(columns), "parquet", sink)
+    assert rows == 3
+    sink.seek(0)
+    assert pq.read_table(sink).column_names == columns
+
+
+def test_unknown_format_is_rejected(store):
+    with pytest.raises(ValueError):
+        export.export(iter(()), export.HISTORY_SCHEMA, "json", io.BytesIO())
+
+
+@pytest.mark.parametrize("fmt", ["csv", "xlsx", "parquet"])
+def test_limited_sink_stops_oversized_exports(store, fmt):
+    sink = io.BytesIO()
+    export.export(export.store_batches(store), export.HISTORY_SCHEMA, fmt, export.LimitedSink(sink, 10**6))
+    limit = len(sink.getvalue()) - 1
+    with pytest.raises(ValueError, match="python -m pachilog_core.export"):
+        export.export(export.store_batches(store), export.HISTORY_SCHEMA, fmt, export.LimitedSink(io.BytesIO(), limit))
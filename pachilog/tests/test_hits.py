@@ -0,0 +1,41 @@
+import json
+
+from pachilog_core import events
+from pachilog_core.hits import HitLedger
+from pachilog_core.journal import Journal
+
+
+def test_ledger_keeps_running_totals():
+    ledger = HitLedger()
+    assert ledger.payout_per_round == 0
+    ledger.add(10, 1400)
+    ledger.add(3.0, 420)
+    assert len(ledger) == 2
+    assert (ledger.total_round, ledger.total_payout) == (13, 1820)
+    assert ledger.payout_per_round == 140
+    assert ledger.columns() == {"ラウンド": [10, 3], "獲得出玉": [1400, 420]}
+    assert HitLedger.from_entries(ledger.entries()) == ledger
+
+
+def test_draft_round_trips_through_json():
+    state = {"records": [], "machine_info": {"持ち玉": 0}, "is_active": True, "draft": None}
+    for event in (events.start_row(), events.hit(10, 1400), events.hit(5, 700)):
+        events.apply(state, event)
+    data = json.loads(json.dumps(events.dump_draft(state["draft"])))
+    assert data["大当たり"] == [[10, 1400], [5, 700]]
+    restored = events.load_draft(data)
+    assert restored == state["draft"] and restored["大当たり"].total_payout == 2100
+
+
+def test_old_drafts_with_list_hits_are_loaded(tmp_path):
+    journal = Journal(str(tmp_path / "data.json"))
+    draft = {"index": None, "行開始持ち玉": 0, "持ち玉": 0, "打ち始め": 0, "打ち終わり": 0, "貸し玉": 0,
+             "大当たり": [[10, 1400]], "総ラウンド": 10, "総出玉": 1400}
+    (tmp_path / "data.json").write_text(json.dumps({"records": [], "machine_info": {"持ち玉": 0},
+                                                    "is_active": True, "draft": draft}), encoding="utf-8")
+    state = journal.load()
+    assert state["draft"]["大当たり"].total_round == 10 and "総出玉" not in state["draft"]
+    events.apply(state, events.commit_row("10:00"))
+    assert state["records"][0]["獲得玉数"] == 1400 and state["machine_info"]["持ち玉"] == 1400
+    journal.save(state)
+    assert journal.load() == state
@@ -0,0 +1,51 @@
+import io
+
+import openpyxl
+import pytest
+
+from pachilog_core.importer import import_file, map_columns
+from pachilog_core.store import SessionStore
+
+CSV = """日付,ホール,台番,レート,時刻,使用玉,開始回転,終了回転,出玉,R
+2024/05/01,A店,12,4円,10:00,"1,000 玉",0,80,1400,10
+2024/05/01,A店,12,4円,11:00,500,80,120,,
+2024/05/02,B店,3,4円,12:00,250,0,20,,
+2024/05/02,B店,3,4円,13:00,250,20,38,,
+"""
+
+
+def _store(tmp_path):
+    return SessionStore(str(tmp_path / "p.db"))
+
+
+def test_csv_in_shift_jis_groups_rows_into_sessions(tmp_path):
+    store = _store(tmp_path)
+    result = import_file(store, io.BytesIO(CSV.encode("cp932")), name="log.csv")
+    assert (result.sessions, result.rows, result.skipped) == (2, 4, 0)
+    sessions = {s["shop"]: s for s in store.find_sessions()}
+    assert sessions["A店"]["date"] == "2024-05-01" and sessions["A店"]["machine_no"] == 12
+    records = store.session_records(sessions["A店"]["id"])
+    assert records[0]["使用玉数"] == 1000 and records[0]["通常回転"] == 80
+    assert records[0]["回転率"] == pytest.approx(20.0)
+    assert records[0]["1Rあたり獲得出玉"] == pytest.approx(140)
+    assert sessions["B店"]["machine_info"]["総通常回転"] == 38
+
+
+def test_xlsx_with_defaults_for_missing_session_columns(tmp_path):
+    path = tmp_path / "log.xlsx"
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.append(["時間", "使用玉数", "打ち始め", "打ち終わり"])
+    sheet.append(["10:00", 250, 0, 18])
+    sheet.append([None, None, None, None])
+    sheet.append(["11:00", 250, 18, 40])
+    workbook.save(path)
+    store = _store(tmp_path)
+    result = import_file(store, str(path), defaults={"日付": "2024-06-01", "店名": "C店", "台番号": 7})
+    assert (result.sessions, result.rows) == (1, 2)
+    assert store.find_sessions()[0]["shop"] == "C店"
+
+
+def test_missing_required_columns_are_rejected():
+    with pytest.raises(ValueError):
+        map_columns(["時間", "使用玉数"])
@@ -0,0 +1,99 @@
+import json
+import os
+
+import pytest
+
+from pachilog_core import journal as journal_module
+from pachilog_core.journal import Journal
+
+
+def _journal(tmp_path, **kwargs):
+    return Journal(str(tmp_path / "data.json"), **kwargs)
+
+
+def test_load_replays_snapshot_and_journal(tmp_path):
+    journal = _journal(tmp_path)
+    journal.save({"records": [], "machine_info": {"店名": "A"}, "is_active": True})
+    journal.append({"op": "info", "values": {"持ち玉": 100}}, {"op": "append", "record": {"時間": "10:00"}})
+    state = _journal(tmp_path).load()
+    assert state["machine_info"] == {"店名": "A", "持ち玉": 100}
+    assert state["records"] == [{"時間": "10:00"}]
+    assert state["is_active"] is True
+
+
+def test_compaction_keeps_state(tmp_path):
+    journal = _journal(tmp_path, compact_every=3)
+    journal.save({"records": [], "machine_info": {}, "is_active": True})
+    for i in range(7):
+        journal.append({"op": "append", "record": {"i": i}})
+    assert [r["i"] for r in _journal(tmp_path).load()["records"]] == list(range(7))
+
+
+def test_torn_last_line_does_not_swallow_later_events(tmp_path):
+    journal = _journal(tmp_path)
+    journal.save({"records": [], "machine_info": {}, "is_active": True})
+    journal.append({"op": "info", "values": {"持ち玉": 1}})
+    # 書き込み途中で落ちた末尾行
+    with open(journal.journal_path, "a", encoding="utf-8") as f:
+        f.write('{"op":"append","rec')
+
+    restarted = _journal(tmp_path)
+    assert restarted.load()["machine_info"] == {"持ち玉": 1}
+    restarted.append({"op": "info", "values": {"持ち玉": 2}}, {"op": "append", "record": {"時間": "11:00"}})
+
+    state = _journal(tmp_path).load()
+    assert state["machine_info"] == {"持ち玉": 2}
+    assert state["records"] == [{"時間": "11:00"}]
+    # 壊れた行は切り詰められ、残りはすべて読める JSON
+    with open(journal.journal_path, encoding="utf-8") as f:
+        assert [json.loads(line)["op"] for line in f] == [journal_module.HEADER_OP, "info", "info", "append"]
+
+
+def test_append_after_torn_line_without_reload(tmp_path):
+    # 別のプロセスが行の途中で落ちた後、読み直さずに追記しても後のイベントは失われない
+    journal = _journal(tmp_path)
+    journal.save({"records": [], "machine_info": {}, "is_active": True})
+    with open(journal.journal_path, "a", encoding="utf-8") as f:
+        f.write('{"op":"info","val')
+    journal.append({"op": "info", "values": {"持ち玉": 3}})
+
+    journal.compact()
+    assert _journal(tmp_path).load()["machine_info"] == {"持ち玉": 3}
+
+
+def test_crash_between_snapshot_and_journal_removal_does_not_replay_twice(tmp_path, monkeypatch):
+    journal = _journal(tmp_path)
+    journal.save({"records": [], "machine_info": {}, "is_active": True})
+    for i in range(3):
+        journal.append({"op": "append", "record": {"i": i}})
+
+    def crash(path):
+        raise OSError("crash")
+
+    # スナップショットを書いた後、ジャーナルを消す前に落ちる
+    monkeypatch.setattr(journal_module.os, "remove", crash)
+    with pytest.raises(OSError):
+        journal.compact()
+    monkeypatch.undo()
+    assert os.path.exists(journal.journal_path)
+
+    restarted = _journal(tmp_path)
+    assert [r["i"] for r in restarted.load()["records"]] == [0, 1, 2]
+    assert not os.path.exists(journal.journal_path)
+    restarted.append({"op": "append", "record": {"i": 3}})
+    assert [r["i"] for r in _journal(tmp_path).load()["records"]] == [0, 1, 2, 3]
+
+
+def test_crash_before_snapshot_keeps_journal_events(tmp_path, monkeypatch):
+    journal = _journal(tmp_path)
+    journal.save({"records": [], "machine_info": {}, "is_active": True})
+    journal.append({"op": "append", "record": {"i": 0}})
+
+    def crash(path, data, encoding="utf-8"):
+        raise OSError("crash")
+
+    monkeypatch.setattr(journal_module, "atomic_write", crash)
+    with pytest.raises(OSError):
+        journal.compact()
+    monkeypatch.undo()
+    assert [r["i"] for r in _journal(tmp_path).load()["records"]] == [0]
@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+from pachilog_core.markov import LOOP, ST, markov_border, solve_chain
+
+
+@pytest.mark.parametrize("cont", [50, 75, 80])
+def test_pure_st_mean_renchan_is_geometric(cont):
+    c = cont / 100
+    first = [(3, 0.5, "確変"), (3, 0.5, "時短")]
+    rush = [(10, 0.4, "確変"), (4, 0.6, "確変")]
+    chain = solve_chain(ST, first, rush, rush_continue=cont)
+    assert chain.entry_rate == pytest.approx(0.5)
+    assert chain.mean_rush_hits == pytest.approx(1 / (1 - c))
+    assert chain.mean_hits == pytest.approx(1 + 0.5 * c / (1 - c))
+    assert chain.expected_rounds == pytest.approx(3 + 0.5 * c / (1 - c) * 6.4)
+    pmf = chain.renchan_pmf
+    assert pmf.sum() == pytest.approx(1, abs=1e-8)
+    assert np.dot(np.arange(1, len(pmf) + 1), pmf) == pytest.approx(chain.mean_hits, rel=1e-6)
+
+
+def test_loop_continues_with_kakuhen_share():
+    rows = [(10, 0.5, "確変"), (3, 0.5, "時短")]
+    chain = solve_chain(LOOP, rows, rows)
+    # 確変ループでは確変中の次の当たりが確定し、その当たりで確変に残る確率は振り分けの確変の割合
+    assert chain.entry_rate == pytest.approx(0.5)
+    assert chain.mean_rush_hits == pytest.approx(1 + 1 / (1 - 0.5))
+    assert chain.mean_hits == pytest.approx(2)
+    assert chain.expected_rounds == pytest.approx(6.5 * chain.mean_hits)
+
+
+def test_jitan_pullback_adds_hits():
+    rows = [(10, 0.5, "確変"), (3, 0.5, "時短")]
+    without = solve_chain(LOOP, rows, rows, jitan_continue=0)
+    with_pullback = solve_chain(LOOP, rows, rows, jitan_continue=20)
+    assert with_pullback.mean_hits > without.mean_hits
+
+
+def test_never_ending_chain_is_rejected():
+    rows = [(10, 1.0, "確変")]
+    with pytest.raises(ValueError):
+        solve_chain(LOOP, rows, rows)
+
+
+def test_markov_border():
+    rows = [(10, 0.5, "確変"), (3, 0.5, "時短")]
+    result = markov_border(solve_chain(LOOP, rows, rows), 319.7, 100, support_reduction=10, exchange_money=4)
+    assert result.total_payout == pytest.approx(13 * 90)
+    assert result.border == pytest.approx(319.7 * 250 / result.total_payout)
@@ -0,0 +1,44 @@
+import pyarrow as pa
+import pytest
+
+from pachilog_core.archive import sort_page
+from pachilog_core.paging import Page, list_page, page_bounds
+
+
+@pytest.mark.parametrize("total, page, expected", [
+    (0, 1, Page(1, 1, 0, 0, 0)),
+    (45, 1, Page(1, 3, 0, 20, 45)),
+    (45, 3, Page(3, 3, 40, 45, 45)),
+    (45, 9, Page(3, 3, 40, 45, 45)),
+    (45, 0, Page(1, 3, 0, 20, 45)),
+    (40, 2, Page(2, 2, 20, 40, 40)),
+])
+def test_page_bounds_clamps_to_existing_pages(total, page, expected):
+    assert page_bounds(total, page, 20) == expected
+
+
+@pytest.mark.parametrize("items", [list(range(45)), range(45)])
+def test_list_page_in_both_orders(items):
+    last = page_bounds(45, 3, 20)
+    assert list_page(items, page_bounds(45, 1, 20)) == list(range(20))
+    assert list_page(items, last) == list(range(40, 45))
+    assert list_page(items, page_bounds(45, 1, 20), newest_first=True) == list(range(44, 24, -1))
+    assert list_page(items, last, newest_first=True) == list(range(4, -1, -1))
+
+
+TABLE = pa.table({"店名": [f"S{i}" for i in range(10)], "収支": [3, -1, 7, 0, 5, -4, 9, 2, 8, 6]})
+
+
+@pytest.mark.parametrize("descending", [False, True])
+def test_sort_page_matches_a_full_sort(descending):
+    full = sorted(TABLE.column("収支").to_pylist(), reverse=descending)
+    for offset in range(0, 10, 3):
+        page = sort_page(TABLE, offset, 3, "収支", descending)
+        assert page.column("収支").to_pylist() == full[offset:offset + 3]
+
+
+def test_sort_page_bounds():
+    assert sort_page(TABLE, 8, 5, "収支").column("収支").to_pylist() == [8, 9]
+    assert sort_page(TABLE, 20, 5, "収支").num_rows == 0
+    assert sort_page(TABLE.slice(0, 0), 0, 5, "収支").num_rows == 0
+    assert sort_page(TABLE, 2, 3).column("店名").to_pylist() == ["S2", "S3", "S4"]
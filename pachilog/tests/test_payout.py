@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+
+from pachilog_core.border import border_lines
+from pachilog_core.payout import first_hit_distribution, first_hit_rounds_pmf, session_distribution
+from pachilog_core.rounds import RoundDistribution
+
+# タブ1の初期値の機種（確変ループ、10R確変 50% / 3R時短 50%）
+LOOP_ROWS = [{"ラウンド": 10, "割合": 50, "ステータス": "確変"}, {"ラウンド": 3, "割合": 50, "ステータス": "時短"}]
+SPEC = dict(prob_normal=319.7, rush_entry=50, rush_continue=80, count_num=10, attacker_ball=10)
+
+
+def _loop():
+    dist = RoundDistribution.from_entries(LOOP_ROWS)
+    return dist, dist.kakuhen_only()
+
+
+def test_fft_mean_matches_border_lines():
+    first, rush = _loop()
+    result = border_lines(**SPEC, normal_rounds=first.rounds, normal_ratios=first.ratios,
+                          rush_rounds=rush.rounds, rush_ratios=rush.ratios, support_reduction=10)
+    dist = first_hit_distribution(first.rounds, first.ratios, rush.rounds, rush.ratios,
+                                  SPEC["rush_entry"], SPEC["rush_continue"], round_ball=100, support_reduction=10)
+    assert dist.pmf.sum() == pytest.approx(1, abs=1e-8)
+    assert dist.mean() == pytest.approx(result.total_payout[0], rel=1e-6)
+    assert result.total_payout[0] == pytest.approx(1710)
+
+
+def test_fft_mean_matches_border_lines_for_st():
+    first = RoundDistribution.from_entries([{"ラウンド": 3, "割合": 100, "ステータス": "確変"}])
+    rush = RoundDistribution.from_entries([{"ラウンド": 10, "割合": 30, "ステータス": "確変"},
+                                           {"ラウンド": 4, "割合": 70, "ステータス": "確変"}])
+    result = border_lines(199.8, 100, 75, 10, 15, first.rounds, first.ratios, rush.rounds, rush.ratios)
+    dist = first_hit_distribution(first.rounds, first.ratios, rush.rounds, rush.ratios, 100, 75, round_ball=150)
+    assert dist.mean() == pytest.approx(result.total_payout[0], rel=1e-6)
+
+
+def test_session_distribution_mean():
+    first, rush = _loop()
+    pmf = first_hit_rounds_pmf(first.rounds, first.ratios, rush.rounds, rush.ratios, 50, 80)
+    dist = session_distribution(pmf, 319.7, 3000, 100, support_reduction=10, rotation_rate=18.0)
+    per_hit = np.dot(np.arange(len(pmf)), pmf) * 90
+    assert dist.mean() == pytest.approx(3000 / 319.7 * per_hit - 3000 * 250 / 18.0, rel=1e-6)
+    assert 0 < dist.prob_below(0) < 1
+    assert dist.quantile(0.05) <= dist.quantile(0.5) <= dist.quantile(0.95)
+
+
+def test_ratios_over_100_percent_are_rejected():
+    with pytest.raises(ValueError):
+        first_hit_rounds_pmf([10], [0.6], [10, 3], [0.6, 0.6], 50, 80)
@@ -0,0 +1,93 @@
+import json
+
+import pytest
+
+from pachilog_core import persister
+from pachilog_core.persister import WriteBehind, coalesce
+
+
+class FlakyStore:
+    """poison を含むまとまりは必ず、それ以外は最初の fail_times 回だけ書き込みに失敗するストア"""
+
+    def __init__(self, fail_times=None):
+        self.written = []
+        self.attempts = 0
+        self.fail_times = fail_times
+
+    def append(self, *events):
+        self.attempts += 1
+        if any(e.get("poison") for e in events):
+            raise OSError("disk error")
+        if self.fail_times:
+            self.fail_times -= 1
+            raise OSError("busy")
+        self.written.extend(events)
+
+    def save(self, state):
+        self.saved = state
+
+
+@pytest.fixture(autouse=True)
+def fast_retry(monkeypatch):
+    monkeypatch.setattr(persister, "RETRY_SECONDS", 0.001)
+
+
+def test_coalesce_merges_info_and_drops_events_before_reset():
+    events = [{"op": "append", "record": 1}, {"op": "reset", "state": {}},
+              {"op": "info", "values": {"a": 1}}, {"op": "append", "record": 2}, {"op": "info", "values": {"b": 2}}]
+    assert coalesce(events) == [{"op": "reset", "state": {}}, {"op": "info", "values": {"a": 1, "b": 2}},
+                                {"op": "append", "record": 2}]
+
+
+def test_transient_failure_is_retried_without_surfacing_an_error():
+    store = FlakyStore(fail_times=2)
+    writer = WriteBehind(store, delay=0)
+    writer.append({"op": "info", "values": {"a": 1}})
+    # flush は再試行中に例外を出さず、書き終わるまで待つ
+    writer.flush(timeout=5)
+    assert store.attempts == 3
+    assert store.written == [{"op": "info", "values": {"a": 1}}]
+    writer.append({"op": "info", "values": {"b": 2}})
+    writer.save({"is_active": False})
+    assert store.saved == {"is_active": False} and len(store.written) == 2
+    writer.close()
+
+
+def test_poison_batch_goes_to_dead_letter_and_later_events_are_written(tmp_path):
+    path = tmp_path / "dead.jsonl"
+    store = FlakyStore()
+    writer = WriteBehind(store, delay=0, dead_letter_path=str(path))
+    writer.append({"op": "append", "record": {}, "poison": True})
+    with pytest.raises(RuntimeError, match="退避"):
+        writer.flush(timeout=5)
+    assert store.attempts == persister.MAX_RETRIES
+
+    writer.append({"op": "info", "values": {"a": 1}})
+    writer.flush(timeout=5)
+    writer.close()
+    assert store.written == [{"op": "info", "values": {"a": 1}}]
+    entries = [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+    assert len(entries) == 1 and entries[0]["events"][0]["poison"] is True
+
+
+def test_writer_pool_closes_least_recently_used_writers():
+    created = []
+
+    def factory(key):
+        writer = WriteBehind(FlakyStore(), delay=0)
+        created.append((key, writer))
+        return writer
+
+    pool = persister.WriterPool(factory, max_writers=2)
+    a = pool.get("a")
+    pool.get("b")
+    assert pool.get("a") is a
+    pool.get("c")
+    assert len(pool) == 2 and [key for key, _ in created] == ["a", "b", "c"]
+    # 最も長く使われていない b が書き切って止められる
+    closed = {key: writer._closed for key, writer in created}
+    assert closed == {"a": False, "b": True, "c": False}
+    with pytest.raises(RuntimeError):
+        created[1][1].append({"op": "info", "values": {}})
+    for _, writer in created:
+        writer.close()
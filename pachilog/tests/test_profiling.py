@@ -0,0 +1,48 @@
+import json
+
+import pytest
+
+from pachilog_core.profiling import TOTAL, Profiler
+
+
+def test_disabled_profiler_records_nothing(tmp_path):
+    profiler = Profiler("app", log_path=str(tmp_path / "p.jsonl"))
+    profiler.begin(False)
+    with profiler.stage("load_data"):
+        pass
+    assert profiler.finish() is None and not profiler.running
+    assert not (tmp_path / "p.jsonl").exists()
+
+
+def test_stages_are_summed_and_exported(tmp_path):
+    path = tmp_path / "p.jsonl"
+    profiler = Profiler("app", log_path=str(path))
+    profiler.begin(True, fragment="invest")
+    for _ in range(2):
+        with profiler.stage("table"):
+            pass
+    sample = profiler.finish()
+    assert set(sample["stages"]) == {"table"} and sample["fragment"] == "invest"
+    assert sample[TOTAL] >= sample["stages"]["table"]
+    assert json.loads(path.read_text(encoding="utf-8")) == sample
+
+
+def test_rerun_interrupted_by_st_rerun_is_committed_on_next_begin(tmp_path):
+    profiler = Profiler("app", log_path=str(tmp_path / "p.jsonl"))
+    profiler.begin(True)
+    with profiler.stage("save_data"):
+        pass
+    profiler.begin(True)
+    assert len(profiler.samples) == 1 and profiler.samples[0]["rerun"] is True
+    profiler.finish()
+    assert len(profiler.samples) == 2
+
+
+def test_percentiles_over_a_bounded_window(tmp_path):
+    profiler = Profiler("app", log_path=str(tmp_path / "p.jsonl"), window=20)
+    for ms in range(1, 31):
+        profiler.samples.append({TOTAL: float(ms), "stages": {"table": float(ms) / 2}})
+    result = profiler.percentiles()
+    p50, p95, n = result[TOTAL]
+    assert n == 20 and p50 == pytest.approx(20.5) and p95 == pytest.approx(29.05)
+    assert result["table"][0] == pytest.approx(10.25)
@@ -0,0 +1,49 @@
+import pytest
+
+from pachilog_core import rollups
+from pachilog_core.store import SessionStore
+
+ROW = {"時間": "10:00", "使用玉数": 250, "通常回転": 20, "獲得玉数": None, "ラウンド数": None}
+
+
+def _finish(store, shop, machine_no, rows, invest):
+    info = {"店名": shop, "台番号": machine_no, "交換率": "4円", "持ち玉": 0, "is_active": True,
+            "現金投資額": invest}
+    store.save({"records": rows, "machine_info": info, "is_active": True})
+    store.save(dict(store.load(), is_active=False))
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = SessionStore(str(tmp_path / "p.db"), "alice")
+    _finish(store, "A店", 1, [dict(ROW)] * 4, 5000)
+    _finish(store, "A店", 2, [dict(ROW, 獲得玉数=1400, ラウンド数=10)] * 2, 3000)
+    _finish(store, "B店", 1, [dict(ROW)] * 2, 1000)
+    return store
+
+
+def test_closing_a_session_updates_every_dimension(store):
+    shops = {row["店名"]: row for row in store.rollups("shop")}
+    assert list(shops) == ["A店", "B店"]
+    assert shops["A店"]["セッション数"] == 2 and shops["A店"]["総投資"] == 8000
+    assert shops["A店"]["平均投資"] == 4000
+    # 1000 円あたりの回転数: 120 回転 / 6 行 × 250 玉 × 4 円
+    assert shops["A店"]["平均回転率"] == 20.0
+    assert shops["A店"]["1R出玉"] == 140.0
+    assert {row["台番号"] for row in store.rollups("machine")} == {"A店 #1", "A店 #2", "B店 #1"}
+    months = store.rollups("month")
+    assert len(months) == 1 and months[0]["セッション数"] == 3
+
+
+def test_active_sessions_and_other_players_are_not_counted(store, tmp_path):
+    store.save({"records": [dict(ROW)], "machine_info": {"店名": "C店", "台番号": 3, "交換率": "4円"},
+                "is_active": True})
+    assert "C店" not in {row["店名"] for row in store.rollups("shop")}
+    assert SessionStore(str(tmp_path / "p.db"), "bob").rollups("shop") == []
+
+
+def test_rebuild_matches_incremental_upkeep(store):
+    conn = store._conn()
+    incremental = {dim: store.rollups(dim) for dim in rollups.DIMENSIONS}
+    rollups.rebuild(conn)
+    assert {dim: store.rollups(dim) for dim in rollups.DIMENSIONS} == incremental
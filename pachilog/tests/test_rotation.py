@@ -0,0 +1,43 @@
+import random
+
+import pytest
+
+from pachilog_core import rotation
+
+
+def _record(spins, used=250):
+    return {"通常回転": spins, "使用玉数": used}
+
+
+def test_weighted_mean_matches_total_rotation_rate():
+    records = [_record(20, 250), _record(45, 500), _record(10, 125), _record(0, 0)]
+    info = {"交換率": "4円"}
+    stats = rotation.rebuild(info, records)[rotation.STATS_KEY]
+    assert stats["n"] == 3  # 使用玉数 0 の行は数えない
+    assert stats["mean"] == pytest.approx(75 / 875 * 250)
+
+
+def test_edit_removes_old_row():
+    random.seed(0)
+    records = [_record(random.randint(15, 25)) for _ in range(20)]
+    info = {"交換率": "4円"}
+    rotation.rebuild(info, records)
+    edited = _record(40)
+    rotation.apply_row(info, edited, records[5])
+    records[5] = edited
+    expected = rotation.rebuild({"交換率": "4円"}, records)[rotation.STATS_KEY]
+    for key in ("n", "weight", "mean", "m2"):
+        assert info[rotation.STATS_KEY][key] == pytest.approx(expected[key])
+
+
+def test_confidence_interval_and_sprt():
+    assert rotation.summarize(None).low is None
+    random.seed(1)
+    records = [_record(round(random.gauss(22, 3))) for _ in range(40)]
+    stats = rotation.rebuild({"交換率": "4円"}, records)[rotation.STATS_KEY]
+    summary = rotation.summarize(stats, border=18.0)
+    assert summary.low < summary.mean < summary.high
+    assert summary.decision == "above"
+    assert rotation.summarize(stats, border=26.0).decision == "below"
+    assert rotation.summarize(stats, border=summary.mean).decision is None
+    assert rotation.summarize(stats).llr is None
@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+
+from pachilog_core.rounds import JITAN, KAKUHEN, RoundDistribution
+
+ENTRIES = [{"ラウンド": 10, "割合": 50.0, "ステータス": KAKUHEN}, {"ラウンド": 3, "割合": 30.0, "ステータス": JITAN},
+           {"ラウンド": 4, "割合": 20.0}]
+
+
+def test_from_entries_keeps_typed_values():
+    dist = RoundDistribution.from_entries(ENTRIES)
+    assert len(dist) == 3
+    assert dist.rounds.dtype == np.int16 and dist.rounds.tolist() == [10, 3, 4]
+    np.testing.assert_allclose(dist.ratios, [0.5, 0.3, 0.2])
+    assert dist.total_ratio == pytest.approx(1.0)
+    # ステータスが無い行は確変
+    assert dist.data["kakuhen"].tolist() == [True, False, True]
+
+
+def test_data_is_read_only():
+    dist = RoundDistribution.from_entries(ENTRIES)
+    with pytest.raises(ValueError):
+        dist.data["ratio"][0] = 1.0
+
+
+def test_kakuhen_only_keeps_missing_mass():
+    rush = RoundDistribution.from_entries(ENTRIES).kakuhen_only()
+    assert rush.rounds.tolist() == [10, 4]
+    assert rush.total_ratio == pytest.approx(0.7)
+
+
+def test_rows_and_display_format_only_at_the_edges():
+    dist = RoundDistribution.from_entries(ENTRIES[:2])
+    assert dist.rows() == [(10, 0.5, KAKUHEN), (3, 0.3, JITAN)]
+    assert dist.display() == {"ラウンド (R)": ["10R", "3R"], "割合 (%)": ["50.0%", "30.0%"],
+                              "ステータス": [KAKUHEN, JITAN]}
+
+
+def test_empty_distribution():
+    dist = RoundDistribution.from_entries([])
+    assert len(dist) == 0 and dist.total_ratio == 0 and dist.rows() == []
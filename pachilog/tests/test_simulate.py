@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+
+from pachilog_core.border import border_lines
+from pachilog_core.rounds import RoundDistribution
+from pachilog_core.simulate import SimulationSpec, simulate, summarize
+
+# タブ1の初期値の機種（確変ループ、10R確変 50% / 3R時短 50%）
+LOOP = RoundDistribution.from_entries([{"ラウンド": 10, "割合": 50, "ステータス": "確変"},
+                                       {"ラウンド": 3, "割合": 50, "ステータス": "時短"}])
+
+
+def _spec(**kwargs):
+    rush = LOOP.kakuhen_only()
+    values = dict(prob_normal=319.7, rush_entry=50, rush_continue=80, round_ball=100,
+                  normal_rounds=LOOP.rounds, normal_ratios=LOOP.ratios,
+                  rush_rounds=rush.rounds, rush_ratios=rush.ratios,
+                  support_reduction=10, n_spins=3000, rotation_rate=18.0)
+    values.update(kwargs)
+    return SimulationSpec(**values)
+
+
+def test_mean_matches_border_lines():
+    spec = _spec()
+    result = border_lines(spec.prob_normal, spec.rush_entry, spec.rush_continue, 10, 10,
+                          spec.normal_rounds, spec.normal_ratios, spec.rush_rounds, spec.rush_ratios,
+                          support_reduction=spec.support_reduction)
+    expected = (spec.n_spins / spec.prob_normal * result.total_payout[0]
+                - spec.n_spins * spec.lend_balls / spec.rotation_rate)
+    net = simulate(spec, n_trials=200_000, seed=1, workers=1)
+    stderr = net.std() / np.sqrt(net.size)
+    assert net.mean() == pytest.approx(expected, abs=4 * stderr)
+
+
+def test_seed_is_reproducible_across_workers():
+    spec = _spec(n_spins=500)
+    a = simulate(spec, n_trials=250_000, seed=7, workers=1)
+    b = simulate(spec, n_trials=250_000, seed=7, workers=2)
+    np.testing.assert_array_equal(a, b)
+
+
+def test_summarize():
+    summary = summarize(np.array([-100.0, 0.0, 100.0, 200.0]))
+    assert summary["平均"] == pytest.approx(50)
+    assert summary["負ける確率"] == pytest.approx(0.25)
+    assert summary["5%点"] <= summary["50%点"] <= summary["95%点"]
+    assert summarize(np.zeros(0)) == {}
+
+
+def test_invalid_spec_is_rejected():
+    with pytest.raises(ValueError):
+        simulate(_spec(rush_continue=100), n_trials=10)
+    with pytest.raises(ValueError):
+        simulate(_spec(rush_ratios=[0.8], rush_rounds=[10], normal_ratios=[0.7, 0.7]), n_trials=10)
@@ -0,0 +1,147 @@
+import random
+
+import pytest
+
+from pachilog_core import events, store as store_module
+from pachilog_core.journal import empty_state
+from pachilog_core.paging import list_page, page_bounds
+from pachilog_core.store import SessionStore
+
+BLANK_ROW = {key: None for key, _ in store_module.RECORD_COLUMNS}
+INFO = {"店名": "A店", "台番号": 12, "交換率": "4円", "持ち玉": 0, "is_active": True}
+
+
+def _start(path, player=""):
+    store = SessionStore(path, player)
+    store.save({"records": [], "machine_info": dict(INFO), "is_active": True})
+    return store
+
+
+def _random_events(n, seed=0):
+    rng = random.Random(seed)
+    out = [events.invest(10000)]
+    for _ in range(n):
+        out += [events.start_row(), events.lend(), events.draft(持ち玉=rng.randint(0, 100), 打ち終わり=rng.randint(10, 30))]
+        if rng.random() < 0.3:
+            out.append(events.hit(10, 1400))
+        out.append(events.commit_row("10:00") if rng.random() < 0.9 else events.cancel_row())
+    return out
+
+
+def _replay(evs):
+    state = empty_state()
+    state.update(is_active=True, machine_info=dict(INFO))
+    for event in evs:
+        events.apply(state, event)
+    return state
+
+
+def test_restore_matches_replay_across_snapshots(tmp_path, monkeypatch):
+    monkeypatch.setattr(store_module, "SNAPSHOT_EVERY", 7)
+    path = str(tmp_path / "p.db")
+    store = _start(path)
+    evs = _random_events(30)
+    for event in evs:
+        store.append(event)
+    # 入力途中の行も復元される
+    store.append(events.start_row(), events.hit(3, 300))
+    expected = _replay(evs + [events.start_row(), events.hit(3, 300)])
+
+    restored = SessionStore(path).load()
+    assert list(restored["records"]) == expected["records"]
+    assert restored["machine_info"] == expected["machine_info"]
+    assert restored["draft"] == expected["draft"]
+    # 末尾のイベントは SNAPSHOT_EVERY 件未満しか残らない
+    conn = store._conn()
+    seq, snapshot_seq = conn.execute(
+        "SELECT MAX(e.seq), s.snapshot_seq FROM events e JOIN sessions s ON s.id = e.session_id").fetchone()
+    assert seq - snapshot_seq < 7
+
+
+def test_restore_reads_only_the_requested_page(tmp_path):
+    path = str(tmp_path / "p.db")
+    store = SessionStore(path)
+    rows = [dict(BLANK_ROW, 時間="10:00", 使用玉数=250, 通常回転=i) for i in range(300)]
+    store.save({"records": rows, "machine_info": dict(INFO), "is_active": True})
+    store.append(events.start_row(), events.commit_row("11:00"))
+    expected = rows + [_replay([events.start_row(), events.commit_row("11:00")])["records"][0]]
+
+    restored = SessionStore(path)
+    statements = []
+    restored._conn().set_trace_callback(statements.append)
+    records = restored.load()["records"]
+    assert not any("SELECT * FROM records" in sql for sql in statements)
+    assert len(records) == 301 and records[-1] == expected[-1]
+
+    statements.clear()
+    page = page_bounds(len(records), 2, 20)
+    assert list_page(records, page, newest_first=True) == list_page(expected, page, newest_first=True)
+    assert sum("SELECT * FROM records" in sql for sql in statements) == 1
+
+
+def test_end_of_session_save_writes_restored_changes(tmp_path):
+    path = str(tmp_path / "p.db")
+    store = SessionStore(path)
+    rows = [{"時間": "10:00", "使用玉数": 250, "通常回転": i} for i in range(10)]
+    store.save({"records": rows, "machine_info": dict(INFO), "is_active": True})
+
+    state = SessionStore(path).load()
+    state["records"][3] = dict(rows[3], 通常回転=99)
+    state["records"].append(dict(rows[0], 時間="12:00"))
+    state["records"][-1] = dict(rows[0], 時間="12:30")
+    SessionStore(path).save(dict(state, is_active=False))
+
+    session = store.find_sessions()[0]
+    saved = store.session_records(session["id"])
+    assert len(saved) == 11 and saved[3]["通常回転"] == 99 and saved[-1]["時間"] == "12:30"
+    assert saved[:3] == store.session_records(session["id"], 0, 3)
+
+
+def test_untyped_events_apply_after_pending_typed_events(tmp_path):
+    path = str(tmp_path / "p.db")
+    store = _start(path)
+    store.append(events.invest(1000))
+    store.append({"op": "info", "values": {"ボーダー": 18.5}})
+    info = SessionStore(path).load()["machine_info"]
+    assert info["現金投資額"] == 1000 and info["ボーダー"] == 18.5
+
+
+def test_players_are_separate_and_finished_sessions_roll_up(tmp_path):
+    path = str(tmp_path / "p.db")
+    alice, bob = _start(path, "alice"), _start(path, "bob")
+    for event in _random_events(5):
+        alice.append(event)
+    assert len(bob.load()["records"]) == 0
+
+    state = alice.load()
+    alice.save(dict(state, is_active=False))
+    assert alice.load() is None
+    sessions = alice.find_sessions(shop="A店")
+    assert len(sessions) == 1 and sessions[0]["is_active"] == 0
+    rows = alice.rollups("shop")
+    assert rows[0]["店名"] == "A店" and rows[0]["セッション数"] == 1
+    history = [row for batch in alice.iter_history(batch_size=2) for row in batch]
+    assert len(history) == len(state["records"])
+    assert bob.find_sessions() != [] and bob.rollups("shop") == []
+
+
+def test_import_session_counts_rows(tmp_path):
+    store = SessionStore(str(tmp_path / "p.db"))
+    records = ({"時間": "10:00", "使用玉数": 250, "通常回転": 20} for _ in range(12))
+    assert store.import_session("2024-05-01", dict(INFO), records, chunk_rows=5) == 12
+    session = store.find_sessions()[0]
+    assert session["machine_info"]["総使用玉数"] == 3000
+    assert len(store.session_records(session["id"])) == 12
+
+
+def test_untyped_append_after_a_gap_in_row_numbers_does_not_collide(tmp_path):
+    path = str(tmp_path / "p.db")
+    store = _start(path)
+    for i in range(3):
+        store.append({"op": "append", "record": dict(BLANK_ROW, 通常回転=i)})
+    conn = store._conn()
+    conn.execute("DELETE FROM records WHERE row_no = 1")
+    store.append({"op": "append", "record": dict(BLANK_ROW, 通常回転=3)})
+    rows = conn.execute("SELECT row_no, spins FROM records ORDER BY row_no").fetchall()
+    assert [tuple(row) for row in rows] == [(0, 0), (2, 2), (3, 3)]
+    assert len(SessionStore(path).load()["records"]) == 4